@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of analysis results shared by the engines and the background indexer
+Loudness envelopes and Whisper transcripts are stored per media fingerprint, so a
+clip that was pre-analyzed (or analyzed before) skips decoding and transcription
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+import loudness
+
+CACHE_DIR = os.environ.get('OPENJUMPCUT_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.openjumpcut', 'cache'))
+
+# Envelopes, waveforms and transcripts beyond this size are removed, least recently used
+# first (audio proxies have their own limit, see proxy_cache.py)
+MAX_CACHE_MB = float(os.environ.get('OPENJUMPCUT_CACHE_MB', 2000))
+RESULT_SUFFIXES = ('.envelope.npz', '.pyramid.npz', '.transcript.json')
+
+# Bytes hashed from the start and end of a file for its fingerprint
+FINGERPRINT_SAMPLE = 1 << 16
+
+# Whisper speech segment in seconds, plus the confidence values Whisper reports; words
+# are (start, end, probability) triples when word timestamps were requested
+Segment = namedtuple('Segment', ['start', 'end', 'text', 'avg_logprob', 'no_speech_prob', 'compression_ratio',
+                                 'words'],
+                     defaults=('', 0.0, 0.0, 0.0, ()))
+
+
+def fingerprint(path):
+    """
+    Cheap content fingerprint: size, modification time and the first/last 64 KB.
+
+    Independent of the path, so the same file on shared storage maps to the same
+    entry from every workstation.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update(f"{stat.st_size}:{int(stat.st_mtime)}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(FINGERPRINT_SAMPLE))
+        if stat.st_size > FINGERPRINT_SAMPLE:
+            f.seek(max(FINGERPRINT_SAMPLE, stat.st_size - FINGERPRINT_SAMPLE))
+            digest.update(f.read(FINGERPRINT_SAMPLE))
+    return digest.hexdigest()
+
+
+def _entry(path, suffix, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{fingerprint(path)}.{suffix}")
+
+
+def _atomic_write(target, write):
+    """Write through a temp file in the cache directory so readers never see partial entries"""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temp_path, target)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _store(target, write, cache_dir=None):
+    """Write a result entry, then keep the results within MAX_CACHE_MB"""
+    _atomic_write(target, write)
+    prune(cache_dir)
+
+
+def _touch(entry):
+    # Loads refresh the modification time that prune() orders entries by
+    try:
+        os.utime(entry)
+    except OSError:
+        pass
+
+
+def prune(cache_dir=None, max_mb=None):
+    """Remove the least recently used results until they fit in max_mb"""
+    directory = cache_dir or CACHE_DIR
+    limit = (MAX_CACHE_MB if max_mb is None else max_mb) * 1024 * 1024
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(RESULT_SUFFIXES):
+            entry = os.path.join(directory, name)
+            try:
+                entries.append((os.path.getmtime(entry), entry, os.path.getsize(entry)))
+            except OSError:
+                continue
+    total = sum(size for _, _, size in entries)
+    for _, entry, size in sorted(entries):
+        if total <= limit:
+            break
+        try:
+            os.remove(entry)
+            logging.debug(f"Removed cached result {entry}")
+        except OSError:
+            pass
+        total -= size
+
+
+def load_envelope(path, cache_dir=None):
+    """Cached loudness.Envelope for the whole file, or None"""
+    try:
+        entry = _entry(path, 'envelope.npz', cache_dir)
+        if not os.path.exists(entry):
+            return None
+        _touch(entry)
+        with np.load(entry) as data:
+            return loudness.Envelope(data['energy'], data['bounds'], int(data['channels']),
+                                     float(data['max_possible_amplitude']), int(data['frame_rate']))
+    except Exception as e:
+        logging.debug(f"Envelope cache miss for {path}: {e}")
+        return None
+
+
+def save_envelope(path, envelope, cache_dir=None):
+    """Store the envelope of a complete file (not of an in/out window)"""
+    _store(_entry(path, 'envelope.npz', cache_dir), lambda f: np.savez(
+        f, energy=envelope.energy, bounds=envelope.bounds, channels=envelope.channels,
+        max_possible_amplitude=envelope.max_possible_amplitude, frame_rate=envelope.frame_rate), cache_dir)
+
+
+def load_pyramid(path, cache_dir=None):
+    """Cached waveform.EnvelopePyramid for the whole file, or None"""
+    import waveform
+    try:
+        entry = _entry(path, 'pyramid.npz', cache_dir)
+        if not os.path.exists(entry):
+            return None
+        _touch(entry)
+        with np.load(entry) as data:
+            return waveform.EnvelopePyramid.from_arrays(dict(data))
+    except Exception as e:
+        logging.debug(f"Waveform cache miss for {path}: {e}")
+        return None
+
+
+def save_pyramid(path, pyramid, cache_dir=None):
+    _store(_entry(path, 'pyramid.npz', cache_dir), lambda f: np.savez(f, **pyramid.to_arrays()), cache_dir)
+
+
+def _transcript_suffix(model_size, language):
+    return f"{model_size}.{language or 'auto'}.transcript.json"
+
+
+def load_transcript(path, model_size, language=None, cache_dir=None):
+    """Cached (segments, duration) of the whole file, or None"""
+    try:
+        entry = _entry(path, _transcript_suffix(model_size, language), cache_dir)
+        if not os.path.exists(entry):
+            return None
+        _touch(entry)
+        with open(entry, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return [from_record(segment) for segment in data['segments']], data.get('duration')
+    except Exception as e:
+        logging.debug(f"Transcript cache miss for {path}: {e}")
+        return None
+
+
+def save_transcript(path, model_size, language, segments, duration=None, cache_dir=None):
+    """Store Whisper segments (faster-whisper segments or Segment tuples) for the whole file"""
+    records = [to_segment(segment)._asdict() for segment in segments]
+    payload = json.dumps({'model': model_size, 'language': language, 'duration': duration,
+                          'segments': records}).encode('utf-8')
+    _store(_entry(path, _transcript_suffix(model_size, language), cache_dir), lambda f: f.write(payload), cache_dir)
+
+
+def to_segment(segment):
+    """Keep only the fields the engines use from a faster-whisper segment"""
+    if isinstance(segment, Segment):
+        return segment
+    words = tuple((float(word.start), float(word.end), float(word.probability))
+                  for word in getattr(segment, 'words', None) or ())
+    return Segment(float(segment.start), float(segment.end), getattr(segment, 'text', ''),
+                   float(getattr(segment, 'avg_logprob', 0.0)),
+                   float(getattr(segment, 'no_speech_prob', 0.0)),
+                   float(getattr(segment, 'compression_ratio', 0.0)), words)
+
+
+def from_record(record):
+    """Segment from its JSON record (to_segment(...)._asdict())"""
+    words = tuple(tuple(word) for word in record.pop('words', ()))
+    return Segment(words=words, **record)
+
+
+def shift_segment(segment, seconds):
+    """Segment (and its words) moved later by `seconds`"""
+    return segment._replace(start=segment.start + seconds, end=segment.end + seconds,
+                            words=tuple((start + seconds, end + seconds, probability)
+                                        for start, end, probability in segment.words))
+
+
+def clip_segments(segments, start=None, end=None):
+    """Segments overlapping [start, end) seconds, trimmed and shifted so start becomes 0"""
+    start = start or 0.0
+    clipped = []
+    for segment in segments:
+        if segment.end <= start or (end is not None and segment.start >= end):
+            continue
+        seg_end = segment.end if end is None else min(segment.end, end)
+        words = tuple(word for word in segment.words if word[1] > start and (end is None or word[0] < end))
+        segment = shift_segment(segment._replace(words=words), -start)
+        clipped.append(segment._replace(start=max(segment.start, 0.0), end=seg_end - start))
+    return clipped
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+HTTP analysis service
+Runs the jumpcut engines as a small local-network service so one machine can serve
+a whole team: Whisper models are loaded once and shared by all requests, repeated
+requests are answered from a result cache, and at most `workers` analyses (waveform
+pyramid builds included) run at once
+
+Endpoints:
+    POST   /analyze         {"path", "params", "deadline", "priority"} -> engine JSON output
+    DELETE /jobs/<client>   cancel the running/queued analyses of the calling panel
+    GET    /status          queue, loaded models and cache statistics
+    GET    /envelope?path=&start=&end=&pixels=   waveform columns for the panel preview
+    GET    /health
+
+Only loopback addresses are served unless media roots and a shared token are set.
+With a token, every request but /health must carry it in the X-Service-Token header.
+Browsers may call the service only from the origins given with --allow-origin
+"""
+
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import analysis_cache
+import job_scheduler
+import waveform
+import whisper_jumpcut
+
+DEFAULT_PORT = 8765
+
+# Completed analyses kept in memory (least recently used entries are dropped)
+RESULT_CACHE_SIZE = 256
+
+# Largest request body accepted
+MAX_BODY_BYTES = 1 << 20
+
+# Widest waveform the panel may request
+MAX_ENVELOPE_PIXELS = 8192
+
+# Shared secret the panels send in the X-Service-Token header
+DEFAULT_TOKEN = os.environ.get('OPENJUMPCUT_SERVICE_TOKEN') or None
+
+
+class ServiceError(Exception):
+    """Request that cannot be served; carries the HTTP status to answer with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class AnalysisService:
+    """
+    Shared state of the service: scheduler, result cache and path translation.
+
+    Jobs are keyed by (client, path), so a panel re-running a clip supersedes its
+    own earlier request without touching other editors' work on the same media.
+    """
+
+    def __init__(self, workers=2, path_map=None, media_roots=None, cache_size=RESULT_CACHE_SIZE, token=None,
+                 allowed_origins=None):
+        self.scheduler = job_scheduler.JobScheduler(max_workers=workers, supersede_running=True)
+        self.path_map = [parse_path_map(entry) for entry in path_map or []]
+        self.media_roots = [os.path.realpath(root) for root in media_roots or []]
+        self.token = token
+        self.allowed_origins = list(allowed_origins or [])
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve_path(self, path):
+        """Translate a workstation path to a local one and check it may be served"""
+        if not path:
+            raise ServiceError(400, "Missing media path")
+        for client_prefix, server_prefix in self.path_map:
+            if path.lower().startswith(client_prefix.lower()):
+                rest = path[len(client_prefix):].replace('\\', '/').lstrip('/')
+                path = os.path.join(server_prefix, rest)
+                break
+
+        real_path = os.path.realpath(path)
+        if self.media_roots and not any(os.path.commonpath([root, real_path]) == root
+                                        for root in self.media_roots):
+            raise ServiceError(403, f"Media outside the served folders: {path}")
+        if not os.path.isfile(real_path):
+            raise ServiceError(404, f"Media not found: {path}")
+        return real_path
+
+    def authorize(self, token):
+        """
+        Raises:
+            ServiceError: 401 if a token is configured and `token` does not match it
+        """
+        if self.token and not hmac.compare_digest((token or '').encode('utf-8'), self.token.encode('utf-8')):
+            raise ServiceError(401, "Missing or wrong service token")
+
+    def analyze(self, request, client):
+        """
+        Run (or answer from cache) one analysis request
+
+        Returns:
+            (status, body) for the HTTP response
+        """
+        path = self.resolve_path(request.get('path'))
+        try:
+            params = whisper_jumpcut.parse_jumpcut_params(request.get('params') or {})
+        except (TypeError, ValueError) as e:
+            raise ServiceError(400, f"Invalid parameters: {e}")
+
+        cache_key = (analysis_cache.fingerprint(path), json.dumps(params, sort_keys=True))
+        with self._lock:
+            if cache_key in self._results:
+                self._results.move_to_end(cache_key)
+                self.hits += 1
+                return 200, dict(self._results[cache_key], cached=True)
+            self.misses += 1
+
+        priority = (job_scheduler.PRIORITY_BATCH if request.get('priority') == 'batch'
+                    else job_scheduler.PRIORITY_INTERACTIVE)
+        job = self.scheduler.submit((client, path), self._run, path, params, request.get('deadline'),
+                                    priority=priority)
+        job.wait()
+
+        if job.state == job_scheduler.FAILED:
+            return 500, {"error": str(job.error)}
+        result = job.result or {"silences": [0], "partial": True, "processedUntil": 0.0}
+        if job.state != job_scheduler.DONE:
+            # Cancelled or superseded while queued or running
+            return 409, dict(result, partial=True, reason=job.state)
+        if 'error' in result:
+            return 500, result
+        if not result.get('partial'):
+            self._store(cache_key, result)
+        return 200, result
+
+    def _run(self, path, params, deadline=None, cancel_event=None):
+        control = whisper_jumpcut.RunControl(deadline=deadline, cancel_event=cancel_event)
+        return whisper_jumpcut.analyze(path, params, control)
+
+    def _store(self, cache_key, result):
+        with self._lock:
+            self._results[cache_key] = result
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+
+    def envelope(self, query, client):
+        """
+        Waveform columns for GET /envelope (seconds; end defaults to the clip end).
+        Pyramids not cached yet are built by a scheduler worker like any analysis.
+        """
+        path = self.resolve_path((query.get('path') or [None])[0])
+        try:
+            start = float((query.get('start') or [0])[0])
+            end = float((query.get('end') or [float('inf')])[0])
+            pixels = int((query.get('pixels') or [1000])[0])
+        except ValueError:
+            raise ServiceError(400, "Invalid envelope range")
+        if not 0 < pixels <= MAX_ENVELOPE_PIXELS:
+            raise ServiceError(400, f"pixels must be between 1 and {MAX_ENVELOPE_PIXELS}")
+        pyramid = waveform.cached_pyramid(path)
+        if pyramid is None:
+            job = self.scheduler.submit((client, 'envelope', path), self._build_pyramid, path)
+            job.wait()
+            if job.state == job_scheduler.FAILED:
+                raise job.error
+            if job.state != job_scheduler.DONE:
+                raise ServiceError(409, f"Waveform request {job.state}")
+            pyramid = job.result
+        return waveform.envelope(path, start, end, pixels, pyramid)
+
+    def _build_pyramid(self, path, cancel_event=None):
+        pyramid = waveform.load_pyramid(path, should_stop=lambda position_ms: cancel_event.is_set())
+        if pyramid is None:
+            raise job_scheduler.JobCancelled()
+        return pyramid
+
+    def cancel(self, client):
+        """Cancel every unfinished job of a client; returns how many were cancelled"""
+        cancelled = 0
+        for job in self.scheduler.active_jobs():
+            if job.key[0] == client and self.scheduler.cancel(job.id):
+                cancelled += 1
+        return cancelled
+
+    def status(self):
+        with self._lock:
+            cache = {'entries': len(self._results), 'hits': self.hits, 'misses': self.misses}
+        return {'queue': self.scheduler.stats(), 'models': whisper_jumpcut.loaded_models(), 'cache': cache}
+
+    def shutdown(self):
+        self.scheduler.shutdown(wait=True, cancel_running=True)
+
+
+def is_loopback(host):
+    """Whether a listen address is only reachable from this machine"""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+def parse_path_map(entry):
+    """'Z:\\Media=/mnt/media' -> ('Z:\\Media', '/mnt/media')"""
+    client_prefix, sep, server_prefix = entry.partition('=')
+    if not sep or not client_prefix or not server_prefix:
+        raise ValueError(f"Path map must look like CLIENT_PREFIX=SERVER_PREFIX: {entry}")
+    return client_prefix, server_prefix
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """JSON request handler; `self.server.service` is the shared AnalysisService"""
+
+    def log_message(self, format, *args):
+        logging.info(f"{self.client_address[0]} {format % args}")
+
+    def _client(self, body=None):
+        return self.headers.get('X-Client-Id') or (body or {}).get('client') or self.client_address[0]
+
+    def _cors(self):
+        # Only the configured origins (e.g. the panel's) may call the service from a browser
+        origin = self.headers.get('Origin')
+        allowed = self.server.service.allowed_origins
+        if origin and (origin in allowed or '*' in allowed):
+            self.send_header('Access-Control-Allow-Origin', origin)
+            self.send_header('Vary', 'Origin')
+
+    def _authorize(self):
+        """Answer 401 and return False unless the request carries the service token"""
+        try:
+            self.server.service.authorize(self.headers.get('X-Service-Token'))
+            return True
+        except ServiceError as e:
+            self._send(e.status, {"error": str(e)})
+            return False
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self._cors()
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self._cors()
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, DELETE, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-Client-Id, X-Service-Token')
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {"status": "ok"})
+        elif not self._authorize():
+            return
+        elif self.path == '/status':
+            self._send(200, self.server.service.status())
+        elif urlsplit(self.path).path == '/envelope':
+            try:
+                status, result = 200, self.server.service.envelope(parse_qs(urlsplit(self.path).query), self._client())
+            except ServiceError as e:
+                status, result = e.status, {"error": str(e)}
+            except Exception as e:
+                logging.error(f"Envelope request failed: {e}")
+                status, result = 500, {"error": str(e)}
+            self._send(status, result)
+        else:
+            self._send(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self.path != '/analyze':
+            self._send(404, {"error": "Not found"})
+            return
+        if not self._authorize():
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY_BYTES:
+                raise ServiceError(413, "Request too large")
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if not isinstance(body, dict):
+                raise ServiceError(400, "Request body must be a JSON object")
+            status, result = self.server.service.analyze(body, self._client(body))
+        except ServiceError as e:
+            status, result = e.status, {"error": str(e)}
+        except json.JSONDecodeError:
+            status, result = 400, {"error": "Invalid parameters"}
+        except Exception as e:
+            logging.error(f"Analysis request failed: {e}")
+            status, result = 500, {"error": str(e)}
+        self._send(status, result)
+
+    def do_DELETE(self):
+        if not self.path.startswith('/jobs/'):
+            self._send(404, {"error": "Not found"})
+            return
+        if not self._authorize():
+            return
+        client = unquote(self.path[len('/jobs/'):])
+        if client != self._client():
+            # The token is shared by every panel; each may only cancel its own work
+            self._send(403, {"error": "Only the calling client's jobs can be cancelled"})
+            return
+        self._send(200, {"cancelled": self.server.service.cancel(client)})
+
+
+def make_server(host='127.0.0.1', port=DEFAULT_PORT, workers=2, path_map=None, media_roots=None, token=DEFAULT_TOKEN,
+                allowed_origins=None):
+    """
+    Create (but do not start) the HTTP server; port 0 picks a free port
+
+    Raises:
+        ValueError: If a non-loopback host is given without media roots and a token
+    """
+    if not is_loopback(host) and not (media_roots and token):
+        raise ValueError(f"Serving on {host} needs --media-root and a service token (--token or "
+                         f"OPENJUMPCUT_SERVICE_TOKEN)")
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    server.daemon_threads = True
+    server.service = AnalysisService(workers, path_map, media_roots, token=token, allowed_origins=allowed_origins)
+    return server
+
+
+def serve(host='127.0.0.1', port=DEFAULT_PORT, workers=2, path_map=None, media_roots=None, token=DEFAULT_TOKEN,
+          allowed_origins=None):
+    """Serve until interrupted"""
+    server = make_server(host, port, workers, path_map, media_roots, token, allowed_origins)
+    print(f"OpenJumpCut analysis service listening on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
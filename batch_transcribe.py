@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Batched Whisper analysis of many short clips
+One model.transcribe() call per 20-60 s clip keeps the model busy with batches of
+one. Here the speech chunks of many clips (Silero VAD, as vad_filter=True finds
+them) are packed end to end and transcribed together by faster-whisper's
+BatchedInferencePipeline on one shared model; every segment is then mapped back to
+its clip and offset, and each clip gets the same JSON output as whisper_jumpcut.py
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import sys
+import time
+
+import numpy as np
+
+import analysis_cache
+import confidence_filter
+import transcribe_pipeline
+import whisper_jumpcut
+
+WHISPER_RATE = transcribe_pipeline.WHISPER_RATE
+
+# Chunks transcribed per forward pass
+BATCH_SIZE = 16
+# Audio (s) packed into one batched call; bounds the samples held in memory (~3.8 MB per minute)
+GROUP_SECONDS = 600
+# A chunk never exceeds Whisper's window
+CHUNK_SECONDS = 30
+
+_pipelines = {}
+
+
+def load_pipeline(model_size, cpu_threads=0):
+    """
+    BatchedInferencePipeline around the shared model (faster-whisper 1.1 or later)
+
+    Raises:
+        ImportError: If the installed faster-whisper has no batched pipeline
+    """
+    from faster_whisper import BatchedInferencePipeline
+
+    key = (model_size, cpu_threads)
+    if key not in _pipelines:
+        _pipelines[key] = BatchedInferencePipeline(model=whisper_jumpcut.load_model(model_size, cpu_threads))
+    return _pipelines[key]
+
+
+def speech_spans(samples):
+    """Speech regions of 16 kHz samples as [[start, end], ...] sample indices (Silero VAD)"""
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    return [[span['start'], span['end']] for span in get_speech_timestamps(samples, VadOptions())]
+
+
+def pack_spans(spans, max_samples):
+    """Merge consecutive speech spans into chunks of at most max_samples, splitting longer spans"""
+    chunks = []
+    for start, end in spans:
+        if chunks and end - chunks[-1][0] <= max_samples:
+            chunks[-1][1] = end
+            continue
+        while end - start > max_samples:
+            chunks.append([start, start + max_samples])
+            start += max_samples
+        chunks.append([start, end])
+    return chunks
+
+
+class BatchClip:
+    """One clip of a batch: its parameters, decoded in/out range and speech chunks"""
+
+    def __init__(self, index, path, jumpcut_params):
+        self.index = index
+        self.path = path
+        self.params = jumpcut_params
+        self.samples = None
+        self.duration = None
+        self.chunks = []
+        self.segments = []
+
+    def load(self, control):
+        in_ms = int(self.params.get('in') or 0)
+        out_ms = int(self.params.get('out') or 0) or None
+        windows = [samples for _, samples in transcribe_pipeline.decode_windows(self.path, in_ms, out_ms, control)]
+        self.samples = np.concatenate(windows) if windows else np.zeros(0, dtype=np.float32)
+        self.duration = len(self.samples) / WHISPER_RATE
+        self.chunks = pack_spans(speech_spans(self.samples), CHUNK_SECONDS * WHISPER_RATE)
+
+    def release(self):
+        self.samples = None
+
+    def result(self):
+        """Engine output for the clip (see whisper_jumpcut.format_result)"""
+        silences, report = [], {}
+        segments = self.segments
+        confidence = confidence_filter.ConfidenceFilter.from_params(self.params)
+        if confidence is not None:
+            segments = confidence.apply(segments)
+            report['confidenceFilter'] = confidence.report()
+        if segments:
+            silences = whisper_jumpcut.speech_gaps_to_silences(
+                segments, self.duration, self.params.get('removeOver', 1000) / 1000.0,
+                self.params.get('padding', 500) / 1000.0)
+        return whisper_jumpcut.format_result(silences, self.params, report)
+
+
+def transcribe_group(pipeline, clips, language=None, batch_size=BATCH_SIZE):
+    """
+    Transcribe the speech chunks of several loaded clips in one batched call and
+    store each clip's segments (seconds from its in point) in clip.segments
+    """
+    pieces, timestamps, placed = [], [], []
+    position = 0
+    for clip in clips:
+        for start, end in clip.chunks:
+            pieces.append(clip.samples[start:end])
+            timestamps.append({'start': position, 'end': position + end - start})
+            # Packed start (s), clip, offset of the chunk in the clip (s), chunk length (s)
+            placed.append((position / WHISPER_RATE, clip, start / WHISPER_RATE, (end - start) / WHISPER_RATE))
+            position += end - start
+    if not pieces:
+        return
+
+    segments, _ = pipeline.transcribe(np.concatenate(pieces), language=language, batch_size=batch_size,
+                                      clip_timestamps=timestamps, vad_filter=False, word_timestamps=True)
+    packed_starts = [chunk[0] for chunk in placed]
+    for segment in segments:
+        segment = analysis_cache.to_segment(segment)
+        # Chunks are transcribed independently, so a segment never spans two of them
+        index = max(0, bisect.bisect_right(packed_starts, segment.start + 1e-6) - 1)
+        packed_start, clip, offset, length = placed[index]
+        start = min(max(segment.start - packed_start, 0.0), length) + offset
+        end = min(max(segment.end - packed_start, 0.0), length) + offset
+        clip.segments.append(analysis_cache.shift_segment(segment, offset - packed_start)._replace(start=start, end=end))
+    for clip in clips:
+        clip.segments.sort(key=lambda segment: segment.start)
+
+
+def _groups(clips, results, control, group_seconds):
+    """Load clips and yield them in groups of about group_seconds of speech; clips that fail to decode get an error"""
+    group, speech = [], 0.0
+    for clip in clips:
+        if control.stopped:
+            break
+        try:
+            clip.load(control)
+        except Exception as e:
+            logging.error(f"Could not decode {clip.path}: {e}")
+            results[clip.index] = {"error": str(e)}
+            continue
+        group.append(clip)
+        speech += sum(end - start for start, end in clip.chunks) / WHISPER_RATE
+        if speech >= group_seconds:
+            yield group
+            group, speech = [], 0.0
+    if group and not control.stopped:
+        yield group
+
+
+def analyze_batch(items, model_size="base", language=None, batch_size=BATCH_SIZE, group_seconds=GROUP_SECONDS,
+                  control=None, cpu_threads=0):
+    """
+    Jump cut analysis of many clips with batched inference.
+
+    Args:
+        items: (path, jumpcut_params) pairs, parameters as from whisper_jumpcut.parse_jumpcut_params()
+        language: Language code; None detects it once per group, so give it for mixed-language batches
+
+    Returns:
+        One result per item, in order: the engine output, or {"error": ...}. Clips not
+        reached when the run stopped get {"error": "Not analyzed (<reason>)"}
+    """
+    control = control or whisper_jumpcut.RunControl()
+    clips = [BatchClip(index, path, params) for index, (path, params) in enumerate(items)]
+    results = [None] * len(clips)
+    with control.stage('model'):
+        try:
+            pipeline = load_pipeline(model_size, cpu_threads)
+        except ImportError as e:
+            logging.warning(f"Batched pipeline unavailable, transcribing clips one at a time: {e}")
+            pipeline = None
+    if pipeline is None:
+        return analyze_sequential(items, model_size, language, control, cpu_threads)
+
+    done = 0
+    for group in _groups(clips, results, control, group_seconds):
+        with control.stage('transcribe'):
+            transcribe_group(pipeline, group, language, batch_size)
+        for clip in group:
+            clip.release()
+            results[clip.index] = clip.result()
+        done += len(group)
+        print(f"Transcribed {done}/{len(clips)} clips")
+
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = {"error": f"Not analyzed ({control.reason or 'failed'})"}
+    return results
+
+
+def analyze_sequential(items, model_size="base", language=None, control=None, cpu_threads=0):
+    """The same analysis one model.transcribe() call per clip (the benchmark baseline)"""
+    control = control or whisper_jumpcut.RunControl()
+    model = whisper_jumpcut.load_model(model_size, cpu_threads)
+    results = []
+    for index, (path, params) in enumerate(items):
+        if control.stopped:
+            results.append({"error": f"Not analyzed ({control.reason})"})
+            continue
+        clip = BatchClip(index, path, params)
+        try:
+            in_ms = int(params.get('in') or 0)
+            out_ms = int(params.get('out') or 0) or None
+            windows = [samples for _, samples in transcribe_pipeline.decode_windows(path, in_ms, out_ms, control)]
+            samples = np.concatenate(windows) if windows else np.zeros(0, dtype=np.float32)
+            clip.duration = len(samples) / WHISPER_RATE
+            segments, _ = transcribe_pipeline.transcribe_window(model, samples, 0.0, language)
+            clip.segments = list(segments)
+        except Exception as e:
+            logging.error(f"Could not transcribe {path}: {e}")
+            results.append({"error": str(e)})
+            continue
+        results.append(clip.result())
+    return results
+
+
+def benchmark(items, model_size="base", language=None, batch_size=BATCH_SIZE, group_seconds=GROUP_SECONDS):
+    """
+    Clips per minute of the sequential and batched paths over the same clips
+
+    Returns:
+        Dict with both throughputs, the speedup and the clips whose silences differ
+        by more than 0.1 s between the two paths. Without a batched pipeline only the
+        sequential path runs and the batched figures are None
+    """
+    # Load the model first so neither path pays for it
+    try:
+        load_pipeline(model_size)
+    except ImportError as e:
+        logging.warning(f"Batched pipeline unavailable, timing the sequential path only: {e}")
+        whisper_jumpcut.load_model(model_size)
+        batched_available = False
+    else:
+        batched_available = True
+
+    started = time.perf_counter()
+    sequential = analyze_sequential(items, model_size, language)
+    sequential_seconds = time.perf_counter() - started
+
+    batched, batched_seconds = sequential, None
+    if batched_available:
+        started = time.perf_counter()
+        batched = analyze_batch(items, model_size, language, batch_size, group_seconds)
+        batched_seconds = time.perf_counter() - started
+
+    differing = []
+    for (path, _), a, b in zip(items, sequential, batched):
+        a, b = a.get('silences', []), b.get('silences', [])
+        if len(a) != len(b) or not np.allclose(np.array(a[:-1]).reshape(-1, 2), np.array(b[:-1]).reshape(-1, 2),
+                                               atol=0.1):
+            differing.append(path)
+
+    clips = len(items)
+    return {
+        'clips': clips,
+        'sequentialClipsPerMinute': round(clips * 60 / sequential_seconds, 1) if sequential_seconds else None,
+        'batchedClipsPerMinute': round(clips * 60 / batched_seconds, 1) if batched_seconds else None,
+        'speedup': round(sequential_seconds / batched_seconds, 2) if batched_seconds else None,
+        'differing': differing,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batched Whisper jump cut analysis of many short clips')
+    parser.add_argument("paths", nargs='*', help="Media files")
+    parser.add_argument("--paths-file", default=None, help="Text file with one media path per line")
+    parser.add_argument("--params", default=None, help="JSON jump cut parameters applied to every clip")
+    parser.add_argument("--model", default="base", choices=["tiny", "base", "small", "medium", "large"],
+                        help="Whisper model size")
+    parser.add_argument("--language", default=None, help="Language code (detected once per group if not given)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks per forward pass")
+    parser.add_argument("--group-seconds", type=float, default=GROUP_SECONDS,
+                        help="Speech (s) packed into one batched call")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Stop after this many seconds; clips not reached are reported as not analyzed")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Also run the clips one at a time and report clips per minute for both paths")
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    if args.paths_file:
+        with open(args.paths_file) as f:
+            paths += [line.strip() for line in f if line.strip()]
+    if not paths:
+        parser.error("give media paths or a --paths-file")
+
+    params = whisper_jumpcut.parse_jumpcut_params(json.loads(args.params) if args.params else None)
+    items = [(path, params) for path in paths]
+
+    try:
+        if args.benchmark:
+            print(json.dumps(benchmark(items, args.model, args.language, args.batch_size, args.group_seconds)))
+            return 0
+        control = whisper_jumpcut.RunControl(deadline=args.deadline)
+        control.install_signal_handlers()
+        results = analyze_batch(items, args.model, args.language, args.batch_size, args.group_seconds, control)
+    except ImportError as e:
+        logging.error(f"faster-whisper not available: {e}")
+        print(json.dumps({"error": "faster-whisper not available"}))
+        return 1
+    print(json.dumps({'clips': [dict(path=path, **result) for path, result in zip(paths, results)]}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Resumable long transcriptions
+While Whisper works through a file, the segments completed so far and the audio
+position they cover are written to a job file in the analysis cache, keyed by the
+media fingerprint. A later run of the same file with the same parameters continues
+from that position instead of starting over; a finished run removes the job file
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+
+import analysis_cache
+
+# Minimum wall-clock time between two job file writes
+CHECKPOINT_SECONDS = 30
+
+
+class Checkpoint:
+    """
+    Job file of one transcription. Positions are in seconds of the audio the engine
+    reads, so params must include everything that changes what that audio is (model,
+    language, in/out range, engine).
+    """
+
+    def __init__(self, media_path, params, cache_dir=None, interval=CHECKPOINT_SECONDS):
+        # Compared after a JSON round trip, the same way they are read back
+        self.params = json.loads(json.dumps(params))
+        # One job file per media and parameters, so runs with other settings (another
+        # in/out range, model, the preview) never overwrite or clear this one
+        key = hashlib.sha1(json.dumps(self.params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self.path = analysis_cache._entry(media_path, f'job-{key}.json', cache_dir)
+        self.interval = interval
+        self.resumed_from = None
+        self._saved = time.monotonic()
+
+    def load(self):
+        """
+        Returns:
+            (position, segments, language) left by an earlier run with the same
+            parameters, or None
+        """
+        try:
+            if not os.path.exists(self.path):
+                return None
+            with open(self.path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+            if job['params'] != self.params:
+                logging.debug(f"Ignoring job file with other parameters: {job['params']}")
+                return None
+            segments = [analysis_cache.from_record(segment) for segment in job['segments']]
+            self.resumed_from = job['position']
+            return job['position'], segments, job.get('language')
+        except Exception as e:
+            logging.debug(f"Unreadable job file {self.path}: {e}")
+            return None
+
+    def update(self, segments, position, language=None, force=False):
+        """Record segments completed up to position (s); at most once per interval unless forced"""
+        now = time.monotonic()
+        if not force and now - self._saved < self.interval:
+            return
+        self._saved = now
+        payload = json.dumps({'params': self.params, 'position': position, 'language': language,
+                              'segments': [analysis_cache.to_segment(s)._asdict() for s in segments]})
+        try:
+            analysis_cache._atomic_write(self.path, lambda f: f.write(payload.encode('utf-8')))
+        except OSError as e:
+            logging.warning(f"Could not write job file: {e}")
+
+    def clear(self):
+        """Remove the job file once the transcription is complete"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -18,12 +18,40 @@ if (operating_system == "WIN")
   EXE_NAME = "jumpcut";
   WHISPER_EXE_NAME = "whisper_jumpcut";
 }
+// Engine process (or service request) of the run in progress, so it can be cancelled or superseded
+var activeJob = null;
+// Identifies this panel to a shared analysis service, so cancelling only affects its own jobs
+var CLIENT_ID = localStorage.getItem('clientId') || ('panel-' + Math.random().toString(36).slice(2));
+localStorage.setItem('clientId', CLIENT_ID);
+
 var EXE_PATH = path.join(path.normalize(csInterface.getSystemPath(SystemPath.EXTENSION)), "/dist/" + EXE_NAME);
 var WHISPER_EXE_PATH = path.join(path.normalize(csInterface.getSystemPath(SystemPath.EXTENSION)), "/dist/" + WHISPER_EXE_NAME);
 
 async function init() {
   operating_system = await getOS();
   setupDetectionMethodToggle();
+  setupServiceUrl();
+}
+
+// Remember the analysis server and its token between sessions
+function setupServiceUrl() {
+  ['serviceUrl', 'serviceToken'].forEach(function (id) {
+    const input = document.getElementById(id);
+    input.value = localStorage.getItem(id) || '';
+    input.addEventListener('change', function () {
+      localStorage.setItem(id, input.value.trim());
+    });
+  });
+}
+
+function getServiceUrl() {
+  return document.getElementById('serviceUrl').value.trim().replace(/\/+$/, '');
+}
+
+// Headers of every analysis server request (the token, when the server requires one)
+function serviceHeaders(headers) {
+  const token = document.getElementById('serviceToken').value.trim();
+  return token ? Object.assign({ 'X-Service-Token': token }, headers) : (headers || {});
 }
 
 function setupDetectionMethodToggle() {
@@ -33,13 +61,8 @@ function setupDetectionMethodToggle() {
   const cutoffNote = document.getElementById('cutoffNote');
   
   function toggleOptions() {
-    if (detectionMethod.value === 'whisper') {
-      whisperOptions.style.display = 'block';
-      cutoffNote.style.display = 'inline';
-    } else {
-      whisperOptions.style.display = 'none';  
-      cutoffNote.style.display = 'none';
-    }
+    whisperOptions.style.display = detectionMethod.value === 'whisper' ? 'block' : 'none';
+    cutoffNote.style.display = detectionMethod.value === 'loudness' ? 'none' : 'inline';
   }
   
   detectionMethod.addEventListener('change', toggleOptions);
@@ -96,22 +119,32 @@ async function runJumpCut() {
     
     // Determine which executable to use
     const detectionMethod = document.getElementById('detectionMethod').value;
-    const exePath = detectionMethod === 'whisper' ? WHISPER_EXE_PATH : EXE_PATH;
-    const progressText = detectionMethod === 'whisper' ? "Running AI speech detection..." : "Running loudness detection...";
+    const exePath = detectionMethod === 'loudness' ? EXE_PATH : WHISPER_EXE_PATH;
+    const progressText = {
+      whisper: "Running AI speech detection...",
+      vad: "Running spectral speech detection...",
+      loudness: "Running loudness detection..."
+    }[detectionMethod];
     
     updateProgress(40, progressText);
   
     // Run the Python script to calculate jump cut locations.
     try {
-      if (detectionMethod === 'whisper') {
-        jumpcutData = await asyncCallWhisperJumpcut(exePath, mediaPath, jumpcutParams);
+      const serviceUrl = getServiceUrl();
+      if (serviceUrl) {
+        updateProgress(50, "Waiting for analysis server...");
+        jumpcutData = await asyncCallAnalysisService(serviceUrl, mediaPath, jumpcutParams);
+      } else if (detectionMethod !== 'loudness') {
+        jumpcutData = await asyncCallWhisperJumpcut(exePath, mediaPath, jumpcutParams, detectionMethod);
       } else {
         jumpcutData = await asyncCallPythonJumpcut(exePath, mediaPath, jumpcutParams);
       }
       updateProgress(80, "Analysis complete!");
     } catch (error) {
       showProgress(false);
-      alert("Failure executing script: " + error);
+      if (error !== JOB_CANCELLED) {
+        alert("Failure executing script: " + error);
+      }
       return;
     }
 
@@ -122,13 +155,22 @@ async function runJumpCut() {
       // Parse just the JSON part if there are multiple lines
       const lines = jumpcutData.trim().split('\n');
       let jsonLine = null;
+      let preview = null;
       for (const line of lines) {
         if (line.trim().startsWith('{')) {
           jsonLine = line.trim();
+          if (preview === null && JSON.parse(jsonLine)['phase'] === 'preview') {
+            preview = JSON.parse(jsonLine);
+            jsonLine = null;
+            continue;
+          }
           break;
         }
       }
       dataJSON = JSON.parse(jsonLine || jumpcutData);
+      if (preview && dataJSON['changes']) {
+        dataJSON['silences'] = applyPreviewChanges(preview['silences'], dataJSON['changes'], dataJSON['flag']);
+      }
     } catch (error) {
       showProgress(false);
       alert("Error parsing results: " + error);
@@ -142,6 +184,11 @@ async function runJumpCut() {
       return;
     }
   
+    // Show the cutoff chosen in auto mode so it can be reused or fine-tuned
+    if (dataJSON['threshold'] !== undefined) {
+      showEstimatedCutoff(dataJSON['threshold']);
+    }
+
     updateProgress(90, "Applying cuts to timeline...");
     let silences = JSON.stringify(dataJSON['silences']);
   
@@ -152,7 +199,13 @@ async function runJumpCut() {
       await runPremiereJumpCut(silences, checked);
       updateProgress(100, "Complete!");
       setTimeout(() => showProgress(false), 1000);
-      alert("Success! Applied " + (dataJSON['silences'].length - 1) + " cuts.");
+      let message = "Success! Applied " + (dataJSON['silences'].length - 1) + " cuts.";
+      const budget = dataJSON['cutBudget'];
+      if (budget && budget.cutsDropped > 0) {
+        message += " Skipped " + budget.cutsDropped + " short silences (" + budget.droppedSeconds +
+                   " s) to stay within the cut budget; " + budget.savedSeconds + " s removed.";
+      }
+      alert(message);
     } catch (error) {
       showProgress(false);
       alert("Failure executing jump cuts in Premiere: " + error);
@@ -163,6 +216,151 @@ async function runJumpCut() {
   }
 }
 
+const JOB_CANCELLED = "cancelled";
+
+// Track the spawned engine. A newer run for any clip supersedes the old one,
+// whose process is terminated instead of being left to burn every core.
+function trackJob(mediaPath, process) {
+  // SIGTERM lets the engine kill its ffmpeg children and remove temp files
+  let job = startJob(mediaPath, function () { process.kill('SIGTERM'); });
+  process.on('exit', function () { finishJob(job); });
+  return job;
+}
+
+function startJob(mediaPath, cancel) {
+  if (activeJob) {
+    cancelActiveJob();
+  }
+  let job = { mediaPath: mediaPath, cancel: cancel, cancelled: false, startedAt: Date.now() };
+  activeJob = job;
+  return job;
+}
+
+function finishJob(job) {
+  if (activeJob === job) {
+    activeJob = null;
+  }
+}
+
+function cancelActiveJob() {
+  if (!activeJob) {
+    return;
+  }
+  activeJob.cancelled = true;
+  activeJob.cancel();
+  activeJob = null;
+}
+
+function cancelJumpCut() {
+  cancelActiveJob();
+  showProgress(false);
+}
+
+// Waveform of the clip in/out range, shaded where the current settings would cut.
+// Columns come at exactly the canvas width, so redrawing on every slider move is cheap.
+var waveformData = null;
+
+async function previewWaveform() {
+  const canvas = document.getElementById('waveform');
+  const pixels = canvas.width;
+  try {
+    let mediaPath = await asyncGetMediaPath();
+    let inoutpoints = JSON.parse(await asyncGetInOutStartPoints());
+    const serviceUrl = getServiceUrl();
+    let body;
+    if (serviceUrl) {
+      const query = 'path=' + encodeURIComponent(mediaPath) + '&start=' + (inoutpoints["in"] || 0) +
+                    (inoutpoints["out"] ? '&end=' + inoutpoints["out"] : '') + '&pixels=' + pixels;
+      const response = await fetch(serviceUrl + '/envelope?' + query, { headers: serviceHeaders() });
+      body = await response.text();
+      if (!response.ok) {
+        throw `Analysis server answered ${response.status}: ${body}`;
+      }
+    } else {
+      body = await asyncCallWaveform(WHISPER_EXE_PATH, mediaPath, inoutpoints, pixels);
+    }
+    const lines = body.trim().split('\n');
+    const data = JSON.parse(lines[lines.length - 1]);
+    if (data['error']) {
+      throw data['error'];
+    }
+    waveformData = data;
+    drawWaveform();
+  } catch (error) {
+    alert("Failure loading waveform: " + error);
+  }
+}
+
+async function asyncCallWaveform(exe_path, media_path, inoutpoints, pixels) {
+  return new Promise((resolve, reject) => {
+    exe_path = path.normalize(exe_path);
+    let params = JSON.stringify({ "in": inoutpoints["in"], "out": inoutpoints["out"] });
+    let command_prompt;
+    try {
+      command_prompt = child_process.spawn(exe_path, [path.normalize(media_path), params, '--waveform', String(pixels)],
+                                           { cwd: path.dirname(exe_path) });
+    } catch (error) {
+      reject(error);
+      return;
+    }
+    let outputData = "";
+    command_prompt.stdout.on('data', function (data) {
+      outputData += data.toString();
+    });
+    command_prompt.on('exit', function (code) {
+      if (code === 0) {
+        resolve(outputData);
+      } else {
+        reject(`Process exited with code ${code}`);
+      }
+    });
+  });
+}
+
+// Runs of columns quieter than the cutoff and longer than the minimum silence length
+function previewSilentColumns(data, cutoff, removeOver) {
+  const secondsPerPixel = (data.end - data.start) / data.pixels;
+  const minColumns = Math.max(1, Math.ceil(removeOver / secondsPerPixel));
+  let runs = [];
+  let runStart = -1;
+  for (let i = 0; i <= data.rms.length; i++) {
+    const quiet = i < data.rms.length && data.rms[i] < cutoff;
+    if (quiet && runStart < 0) {
+      runStart = i;
+    } else if (!quiet && runStart >= 0) {
+      if (i - runStart >= minColumns) {
+        runs.push([runStart, i]);
+      }
+      runStart = -1;
+    }
+  }
+  return runs;
+}
+
+function drawWaveform() {
+  const canvas = document.getElementById('waveform');
+  const context = canvas.getContext('2d');
+  context.clearRect(0, 0, canvas.width, canvas.height);
+  if (!waveformData) {
+    return;
+  }
+  const middle = canvas.height / 2;
+
+  const cutoff = parseFloat(document.getElementById('silenceCutoff').value);
+  const removeOver = parseFloat(document.getElementById('removeOver').value);
+  context.fillStyle = 'rgba(200, 60, 60, 0.35)';
+  previewSilentColumns(waveformData, cutoff, removeOver).forEach(function (run) {
+    context.fillRect(run[0], 0, run[1] - run[0], canvas.height);
+  });
+
+  context.fillStyle = '#7fb2e5';
+  for (let i = 0; i < waveformData.min.length; i++) {
+    const top = middle - waveformData.max[i] * middle;
+    const bottom = middle - waveformData.min[i] * middle;
+    context.fillRect(i, top, 1, Math.max(1, bottom - top));
+  }
+}
+
 async function runPremiereJumpCut(silences, backup) {
   return new Promise((resolve, reject) => {
     csInterface.evalScript(`jumpCutActiveSequence("${silences}", "${backup}")`, (result) => {
@@ -209,8 +407,19 @@ async function asyncGetInOutStartPoints()
   });
 }
 
-// Enhanced Whisper jumpcut caller with progress feedback
-async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
+// Enhanced Whisper jumpcut caller with progress feedback (also runs the spectral VAD method)
+// Two-phase runs print a preview first and then only the silences that changed;
+// rebuild the refined list (with its trailing clip start flag) from the two.
+function applyPreviewChanges(previewSilences, changes, flag) {
+  const key = (s) => s[0].toFixed(3) + ',' + s[1].toFixed(3);
+  const removed = new Set(changes['removed'].map(key));
+  const kept = previewSilences.slice(0, -1).filter((s) => !removed.has(key(s)));
+  const silences = kept.concat(changes['added']).sort((a, b) => a[0] - b[0] || a[1] - b[1]);
+  silences.push(flag);
+  return silences;
+}
+
+async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams, method = 'whisper') {
   return new Promise((resolve, reject) => {
     let command_prompt;
   
@@ -224,7 +433,7 @@ async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
     const whisperModel = document.getElementById('whisperModel').value;
     const whisperLanguage = document.getElementById('whisperLanguage').value;
     
-    params.method = 'whisper';
+    params.method = method;
     params.model = whisperModel;
     if (whisperLanguage) {
       params.language = whisperLanguage;
@@ -237,13 +446,15 @@ async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
       command_prompt = child_process.spawn(exe_path, [
         media_path, 
         enhancedParams,
-        '--method', 'whisper',
+        '--method', method,
         '--model', whisperModel
-      ], { cwd });
+      ].concat(method === 'whisper' && document.getElementById('quickPreview').checked
+        ? ['--preview', 'loudness'] : []), { cwd });
     } catch (error) {
       reject(error);
       return;
     }
+    let job = trackJob(media_path, command_prompt);
 
     let outputData = "";
     let progressCounter = 40;
@@ -253,7 +464,15 @@ async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
       outputData += output;
       
       // Update progress based on output keywords
-      if (output.includes('Loading Whisper model')) {
+      if (output.includes('"phase": "preview"')) {
+        const line = output.split('\n').find((l) => l.includes('"phase": "preview"'));
+        try {
+          const count = JSON.parse(line)['silences'].length - 1;
+          updateProgress(55, "Preview: " + count + " silences found, refining with Whisper...");
+        } catch (error) {
+          // A preview split across chunks is only shown in the final result
+        }
+      } else if (output.includes('Loading Whisper model')) {
         updateProgress(50, "Loading AI model...");
       } else if (output.includes('Transcribing audio')) {
         updateProgress(60, "Transcribing speech...");
@@ -263,11 +482,15 @@ async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
     });
   
     command_prompt.stderr.on('data', function (data) {
-      reject(data.toString());
+      if (!job.cancelled) {
+        reject(data.toString());
+      }
     });
   
     command_prompt.on('exit', function (code) {
-      if (code === 0) {
+      if (job.cancelled) {
+        reject(JOB_CANCELLED);
+      } else if (code === 0) {
         resolve(outputData);
       } else {
         reject(`Process exited with code ${code}`);
@@ -277,6 +500,34 @@ async function asyncCallWhisperJumpcut(exe_path, media_path, jumpcutParams) {
   });
 }
 
+// Shared analysis service caller (whisper_jumpcut.py --serve on another machine).
+// Resolves with the same JSON text the local executables print.
+async function asyncCallAnalysisService(service_url, media_path, jumpcutParams) {
+  let params = JSON.parse(jumpcutParams);
+  let job = startJob(media_path, function () {
+    fetch(service_url + '/jobs/' + encodeURIComponent(CLIENT_ID), { method: 'DELETE', headers: serviceHeaders({ 'X-Client-Id': CLIENT_ID }) })
+      .catch(function () {});
+  });
+
+  try {
+    const response = await fetch(service_url + '/analyze', {
+      method: 'POST',
+      headers: serviceHeaders({ 'Content-Type': 'application/json', 'X-Client-Id': CLIENT_ID }),
+      body: JSON.stringify({ path: media_path, params: params })
+    });
+    const body = await response.text();
+    if (job.cancelled) {
+      throw JOB_CANCELLED;
+    }
+    if (!response.ok) {
+      throw `Analysis server answered ${response.status}: ${body}`;
+    }
+    return body;
+  } finally {
+    finishJob(job);
+  }
+}
+
 // Original jumpcut caller (for loudness-based detection)
 async function asyncCallPythonJumpcut(exe_path, media_path, jumpcutParams) {
   return new Promise((resolve, reject) => {
@@ -294,6 +545,7 @@ async function asyncCallPythonJumpcut(exe_path, media_path, jumpcutParams) {
       reject(error);
       return;
     }
+    let job = trackJob(media_path, command_prompt);
 
     let outputData = "";
 
@@ -303,11 +555,15 @@ async function asyncCallPythonJumpcut(exe_path, media_path, jumpcutParams) {
     });
   
     command_prompt.stderr.on('data', function (data) {
-      reject(data.toString());
+      if (!job.cancelled) {
+        reject(data.toString());
+      }
     });
   
     command_prompt.on('exit', function (code) {
-      if (code === 0) {
+      if (job.cancelled) {
+        reject(JOB_CANCELLED);
+      } else if (code === 0) {
         resolve(outputData);
       } else {
         reject(`Process exited with code ${code}`);
@@ -353,16 +609,25 @@ function initFrontend() {
   
       slider.oninput = function() {
           numberInput.value = slider.value;
+          drawWaveform();
       };
   
       numberInput.oninput = function() {
           slider.value = numberInput.value;
+          drawWaveform();
       };
     });
   }); 
 
 }
 
+function showEstimatedCutoff(threshold) {
+  let slider = document.getElementById('silenceCutoff');
+  let numberInput = slider.nextElementSibling;
+  slider.value = Math.round(threshold);
+  numberInput.value = Math.round(threshold);
+}
+
 function getJumpcutParams() {
   let sliderIds = ['silenceCutoff', 'removeOver', 'keepOver', 'padding'];
   let jumpcutParams = {};
@@ -373,6 +638,19 @@ function getJumpcutParams() {
     jumpcutParams[id] = numberInput.value;
   });
 
+  // Let the analysis pick the cutoff from the clip's own noise floor
+  if (document.getElementById('autoCutoff').checked) {
+    jumpcutParams['silenceCutoff'] = 'auto';
+  }
+
+  // Optional budget: keep only the cuts that remove the most time
+  ['maxCuts', 'minSavedSeconds'].forEach(function(id) {
+    const value = document.getElementById(id).value;
+    if (value !== '') {
+      jumpcutParams[id] = value;
+    }
+  });
+
   // Add detection method and Whisper parameters
   const detectionMethod = document.getElementById('detectionMethod').value;
   jumpcutParams['method'] = detectionMethod;
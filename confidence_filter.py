@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Confidence post-filter for Whisper speech segments
+The small models (tiny, base) transcribe noise bursts, breaths and room tone as short
+bogus phrases. Whisper reports how unsure it was for every segment: the probability
+that it holds no speech, the average token log probability and the compression
+ratio of its text (repeated hallucinations compress well). Segments that look
+unreliable are turned back into silence, and optionally low-probability words at a
+segment's edges are trimmed off. Tune the thresholds with engine_harness.py --whisper
+"""
+
+# faster-whisper already drops segments with no_speech_prob > 0.6 and avg_logprob < -1.0;
+# these defaults are stricter so the filter removes what the small models still let through
+NO_SPEECH_PROB = 0.4
+AVG_LOGPROB = -0.7
+COMPRESSION_RATIO = 2.4
+# Edge words below this probability are trimmed when word trimming is enabled
+WORD_PROBABILITY = 0.4
+
+# Parameter names (panel/CLI JSON) of the thresholds
+PARAMS = {'noSpeechProb': 'no_speech_prob', 'avgLogprob': 'avg_logprob',
+          'compressionRatio': 'compression_ratio', 'wordProbability': 'word_probability'}
+
+
+class ConfidenceFilter:
+    """
+    Callable returning a segment, trimmed to its confident words, or None when the
+    segment should count as silence. Keeps totals for the run's report.
+    """
+
+    def __init__(self, no_speech_prob=NO_SPEECH_PROB, avg_logprob=AVG_LOGPROB, compression_ratio=COMPRESSION_RATIO,
+                 word_probability=None):
+        """
+        Args:
+            no_speech_prob, avg_logprob: A segment at or above no_speech_prob whose
+                avg_logprob is at or below avg_logprob is silence (None disables)
+            compression_ratio: A segment at or above this compression ratio is silence
+                (None disables)
+            word_probability: Trim edge words below this probability (None disables)
+        """
+        self.no_speech_prob = no_speech_prob
+        self.avg_logprob = avg_logprob
+        self.compression_ratio = compression_ratio
+        self.word_probability = word_probability
+        self.dropped = 0
+        self.dropped_seconds = 0.0
+        self.trimmed_seconds = 0.0
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Filter configured by jump cut parameters, or None when it is off. It is on with
+        'confidenceFilter' or once any threshold is given; word trimming needs
+        'wordProbability' (true for the default threshold).
+        """
+        given = {key: params.get(key) for key in PARAMS if params.get(key) is not None}
+        if not params.get('confidenceFilter') and not given:
+            return None
+        word_probability = given.pop('wordProbability', None)
+        if word_probability is True:
+            word_probability = WORD_PROBABILITY
+        kwargs = {PARAMS[key]: float(value) for key, value in given.items()}
+        return cls(word_probability=float(word_probability) if word_probability else None, **kwargs)
+
+    def unreliable(self, segment):
+        if (self.no_speech_prob is not None and segment.no_speech_prob >= self.no_speech_prob
+                and (self.avg_logprob is None or segment.avg_logprob <= self.avg_logprob)):
+            return True
+        return self.compression_ratio is not None and segment.compression_ratio >= self.compression_ratio
+
+    def _trim(self, segment):
+        words = list(segment.words)
+        while words and words[0][2] < self.word_probability:
+            words.pop(0)
+        while words and words[-1][2] < self.word_probability:
+            words.pop()
+        if not words:
+            return None
+        start, end = max(segment.start, words[0][0]), min(segment.end, words[-1][1])
+        if end <= start:
+            return None
+        return segment._replace(start=start, end=end, words=tuple(words))
+
+    def __call__(self, segment):
+        kept = None if self.unreliable(segment) else segment
+        if kept is not None and self.word_probability is not None and segment.words:
+            kept = self._trim(segment)
+        length = segment.end - segment.start
+        if kept is None:
+            self.dropped += 1
+            self.dropped_seconds += length
+        else:
+            self.trimmed_seconds += length - (kept.end - kept.start)
+        return kept
+
+    def apply(self, segments):
+        """The segments that still count as speech"""
+        return [kept for kept in map(self, segments) if kept is not None]
+
+    def report(self):
+        return {'segmentsDropped': self.dropped, 'droppedSeconds': round(self.dropped_seconds, 2),
+                'trimmedSeconds': round(self.trimmed_seconds, 2)}
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Cut budget
+Limits how many silences are sent to the timeline, keeping the ones that remove the
+most time, so noisy material does not turn into thousands of tiny razor cuts
+"""
+
+import heapq
+
+
+def select_cuts(silences, max_cuts=None, min_saved=None):
+    """
+    Choose the silences to remove within a budget.
+
+    Silences do not overlap, so every removal saves its own length independently of
+    the others; the subset of at most max_cuts silences that removes the most time is
+    therefore the max_cuts longest ones, picked with a heap in O(n log max_cuts).
+
+    Args:
+        silences: [[start, end], ...] in seconds, sorted by start
+        max_cuts: Keep at most this many silences (None for no limit)
+        min_saved: Drop silences shorter than this many seconds (None for no minimum)
+
+    Returns:
+        (kept, report) with the kept silences in timeline order and a dict with
+        cutsKept, cutsDropped, savedSeconds and droppedSeconds
+    """
+    candidates = [s for s in silences if min_saved is None or s[1] - s[0] >= min_saved]
+    if max_cuts is not None and len(candidates) > max_cuts:
+        candidates = heapq.nlargest(max(0, int(max_cuts)), candidates, key=lambda s: s[1] - s[0])
+    kept = sorted(candidates)
+
+    saved = sum(end - start for start, end in kept)
+    total = sum(end - start for start, end in silences)
+    report = {
+        'cutsKept': len(kept),
+        'cutsDropped': len(silences) - len(kept),
+        'savedSeconds': round(saved, 3),
+        'droppedSeconds': round(total - saved, 3),
+    }
+    return kept, report
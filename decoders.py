@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Audio decoding backends for compressed media
+PyAV decodes in-process: it demuxes only the audio stream, seeks to the in point and
+hands out NumPy frames, with no process spawn, pipe copy or temporary file. The ffmpeg
+subprocess reading raw samples from a pipe remains the fallback when PyAV is not
+installed, and when PyAV fails on a file it was picked for automatically (a codec
+missing from the wheel, a container it cannot open). Both produce 16-bit samples, as
+pydub does for the common codecs
+
+Usage: python decoders.py --benchmark <media files> compares the backends
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import pcm_reader
+
+BACKENDS = ('pyav', 'ffmpeg')
+# 'auto' prefers PyAV; set OPENJUMPCUT_DECODER=ffmpeg to force the subprocess path
+DEFAULT_BACKEND = os.environ.get('OPENJUMPCUT_DECODER', 'auto')
+
+# Bytes read from the ffmpeg pipe per step
+PIPE_READ_BYTES = 1 << 20
+
+_LAYOUTS = {1: 'mono', 2: 'stereo'}
+
+
+def available_backends():
+    """Backends usable on this machine, preferred first"""
+    backends = []
+    try:
+        import av  # noqa: F401
+        backends.append('pyav')
+    except ImportError:
+        pass
+    if shutil.which('ffmpeg'):
+        backends.append('ffmpeg')
+    return backends
+
+
+def pick_backend(backend=None):
+    """
+    Raises:
+        ValueError: If the requested backend is unknown or no backend is available
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend != 'auto':
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown decoder {backend!r}; choose from {', '.join(BACKENDS)}")
+        return backend
+    backends = available_backends()
+    if not backends:
+        raise ValueError("No audio decoder available: install PyAV (pip install av) or ffmpeg")
+    return backends[0]
+
+
+def pyav_errors():
+    """Exceptions by which PyAV reports a file it cannot open or decode"""
+    import av
+    error = getattr(av, 'FFmpegError', None) or getattr(av, 'AVError', None)
+    return tuple(e for e in (error, IndexError, OSError) if e is not None)
+
+
+def _falls_back(backend):
+    """Whether a PyAV failure may be retried with ffmpeg (PyAV picked automatically, ffmpeg present)"""
+    return (backend or DEFAULT_BACKEND) == 'auto' and 'ffmpeg' in available_backends()
+
+
+def use_pyav():
+    """Whether decoding runs in-process (PyAV available and not overridden)"""
+    try:
+        return pick_backend() == 'pyav'
+    except ValueError:
+        return False
+
+
+def _control(control):
+    if control is None:
+        import whisper_jumpcut
+        control = whisper_jumpcut.RunControl()
+    return control
+
+
+def probe(path, backend=None, control=None):
+    """
+    Format of the first audio stream
+
+    Returns:
+        Dict with rate, channels and duration (seconds, None if unknown)
+    """
+    if pick_backend(backend) == 'pyav':
+        import av
+        try:
+            with av.open(path) as container:
+                stream = container.streams.audio[0]
+                duration = float(container.duration) / av.time_base if container.duration else None
+                return {'rate': stream.rate, 'channels': len(stream.layout.channels), 'duration': duration}
+        except pyav_errors() as e:
+            if not _falls_back(backend):
+                raise
+            logging.warning(f"PyAV could not open {path} ({e}), probing with ffprobe")
+
+    result = _control(control).run(['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries',
+                                    'stream=sample_rate,channels:format=duration', '-of', 'json', path])
+    if result.returncode != 0:
+        raise Exception(f"FFprobe failed: {result.stderr}")
+    info = json.loads(result.stdout)
+    stream = info['streams'][0]
+    duration = info.get('format', {}).get('duration')
+    return {'rate': int(stream['sample_rate']), 'channels': int(stream['channels']),
+            'duration': float(duration) if duration else None}
+
+
+def _pyav_chunks(path, in_ms, out_ms, rate, channels, control):
+    import av
+
+    with av.open(path) as container:
+        stream = container.streams.audio[0]
+        rate = rate or stream.rate
+        layout = _LAYOUTS.get(channels) if channels else stream.layout.name
+        channels = channels or len(stream.layout.channels)
+        resampler = av.AudioResampler(format='s16', layout=layout, rate=rate)
+
+        start = (in_ms or 0) / 1000.0
+        if start:
+            # Lands on the packet at or before the in point; the samples before it are dropped
+            container.seek(int(start / stream.time_base), stream=stream)
+        wanted = int(round((out_ms - (in_ms or 0)) / 1000.0 * rate)) if out_ms else None
+        first_time = []
+
+        def resampled():
+            for packet in container.demux(stream):
+                if control.stopped:
+                    return
+                for frame in packet.decode():
+                    if not first_time:
+                        first_time.append(frame.time if frame.time is not None else start)
+                    for out in resampler.resample(frame):
+                        yield out.to_ndarray().reshape(-1, channels)
+            for out in resampler.resample(None):
+                yield out.to_ndarray().reshape(-1, channels)
+
+        skip = None
+        for samples in resampled():
+            if skip is None:
+                skip = max(0, int(round((start - first_time[0]) * rate)))
+            if skip:
+                dropped = min(skip, len(samples))
+                samples, skip = samples[dropped:], skip - dropped
+            if wanted is not None:
+                samples = samples[:wanted]
+                wanted -= len(samples)
+            if len(samples):
+                yield samples
+            if wanted == 0:
+                return
+
+
+def _pyav_or_ffmpeg_chunks(path, in_ms, out_ms, rate, channels, control):
+    """PyAV decoding that continues with ffmpeg from where PyAV failed"""
+    frames = 0
+    try:
+        for samples in _pyav_chunks(path, in_ms, out_ms, rate, channels, control):
+            frames += len(samples)
+            yield samples
+    except pyav_errors() as e:
+        if frames and not rate:
+            raise
+        logging.warning(f"PyAV could not decode {path} ({e}), decoding with ffmpeg")
+        resume_ms = (in_ms or 0) + frames * 1000.0 / rate if frames else in_ms
+        yield from _ffmpeg_chunks(path, resume_ms, out_ms, rate, channels, control)
+
+
+def _ffmpeg_chunks(path, in_ms, out_ms, rate, channels, control):
+    if rate is None or channels is None:
+        info = probe(path, 'ffmpeg', control)
+        rate, channels = rate or info['rate'], channels or info['channels']
+    cmd = ['ffmpeg', '-v', 'error']
+    if in_ms:
+        cmd += ['-ss', str(in_ms / 1000.0)]
+    if out_ms:
+        cmd += ['-t', str((out_ms - (in_ms or 0)) / 1000.0)]
+    cmd += ['-i', path, '-vn', '-ac', str(channels), '-ar', str(rate), '-f', 's16le', '-']
+
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    control.processes.append(process)
+    frame_bytes = 2 * channels
+    step = PIPE_READ_BYTES // frame_bytes * frame_bytes
+    decoded = 0
+    try:
+        while True:
+            data = process.stdout.read(step)
+            if not data:
+                break
+            samples = np.frombuffer(data[:len(data) // frame_bytes * frame_bytes], dtype='<i2')
+            decoded += len(samples)
+            yield samples.reshape(-1, channels)
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+        control.processes.remove(process)
+    if process.returncode not in (0, None) and not control.stopped and decoded == 0:
+        raise Exception(f"FFmpeg failed to decode {path}")
+
+
+def _rechunk(chunks, frames):
+    """Regroup arrays into `frames`-long pieces (the last one may be shorter)"""
+    pending, count = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        count += len(chunk)
+        while count >= frames:
+            joined = np.concatenate(pending)
+            yield joined[:frames]
+            pending, count = [joined[frames:]], count - frames
+    if count:
+        yield np.concatenate(pending)
+
+
+def decode_chunks(path, in_ms=0, out_ms=None, rate=None, channels=None, chunk_frames=None, control=None,
+                  backend=None):
+    """
+    Decode the in/out range (ms) of a media file
+
+    Args:
+        rate, channels: Output format; None keeps the stream's own
+        chunk_frames: Size of every yielded array except the last; None yields
+            whatever the decoder produced
+        control: Optional whisper_jumpcut.RunControl; decoding ends when it stops
+        backend: 'pyav', 'ffmpeg' or 'auto' (default: OPENJUMPCUT_DECODER, else auto);
+            with 'auto', ffmpeg takes over when PyAV fails
+
+    Yields:
+        int16 arrays of shape (frames, channels)
+    """
+    control = _control(control)
+    if pick_backend(backend) == 'pyav':
+        decode = _pyav_or_ffmpeg_chunks if _falls_back(backend) else _pyav_chunks
+    else:
+        decode = _ffmpeg_chunks
+    chunks = decode(path, in_ms, out_ms, rate, channels, control)
+    return _rechunk(chunks, chunk_frames) if chunk_frames else chunks
+
+
+def decode_source(path, in_ms=0, out_ms=None, rate=None, channels=None, control=None, backend=None):
+    """The decoded in/out range as an in-memory 16-bit PCMSource"""
+    if rate is None or channels is None:
+        info = probe(path, backend, control)
+        rate, channels = rate or info['rate'], channels or info['channels']
+    chunks = list(decode_chunks(path, in_ms, out_ms, rate, channels, control=control, backend=backend))
+    samples = np.concatenate(chunks) if chunks else np.zeros((0, channels), dtype='<i2')
+    source = pcm_reader.PCMSource(None, rate, channels, 2, 0, len(samples))
+    source._memmap = samples
+    return source
+
+
+def benchmark(paths, in_ms=0, out_ms=None, rate=None, channels=None):
+    """
+    Decode time of every available backend over the same files
+
+    Returns:
+        Dict with the seconds per backend, the PyAV speedup and the largest sample
+        difference between the backends for every file
+    """
+    backends = available_backends()
+    seconds = {backend: 0.0 for backend in backends}
+    differences = {}
+    for path in paths:
+        decoded = {}
+        for backend in backends:
+            started = time.perf_counter()
+            decoded[backend] = decode_source(path, in_ms, out_ms, rate, channels, backend=backend).read()
+            seconds[backend] += time.perf_counter() - started
+        if len(decoded) == 2:
+            a, b = decoded['pyav'], decoded['ffmpeg']
+            frames = min(len(a), len(b))
+            differences[path] = {'frames': [len(a), len(b)],
+                                 'maxDifference': int(np.abs(a[:frames].astype(np.int32) - b[:frames]).max())
+                                 if frames and a.shape[1:] == b.shape[1:] else None}
+    result = {'files': len(paths), 'seconds': {k: round(v, 3) for k, v in seconds.items()},
+              'differences': differences}
+    if len(backends) == 2 and seconds['pyav']:
+        result['speedup'] = round(seconds['ffmpeg'] / seconds['pyav'], 2)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the PyAV and ffmpeg decoding backends')
+    parser.add_argument("paths", nargs='+', help="Media files")
+    parser.add_argument("--benchmark", action="store_true", help="Time every available backend on the files")
+    parser.add_argument("--in", dest="in_point", type=float, default=0, help="In point (seconds)")
+    parser.add_argument("--out", dest="out_point", type=float, default=None, help="Out point (seconds)")
+    parser.add_argument("--rate", type=int, default=None, help="Output sample rate (default: the stream's)")
+    parser.add_argument("--channels", type=int, default=None, help="Output channels (default: the stream's)")
+    args = parser.parse_args()
+
+    in_ms = int(args.in_point * 1000)
+    out_ms = int(args.out_point * 1000) if args.out_point else None
+    if args.benchmark:
+        print(json.dumps(benchmark(args.paths, in_ms, out_ms, args.rate, args.channels)))
+        return 0
+    for path in args.paths:
+        source = decode_source(path, in_ms, out_ms, args.rate, args.channels)
+        print(json.dumps({'path': path, 'backend': pick_backend(), 'rate': source.frame_rate,
+                          'channels': source.channels, 'seconds': source.frame_count / source.frame_rate}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
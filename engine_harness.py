@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Differential correctness harness for the silence detection engines
+Runs the reference pipeline (pydub.silence.detect_silence plus jumpcut.py's padding
+and keep-over loops) and the accelerated engines over a generated corpus, diffs the
+resulting cut lists within a tolerance and reports the speedup of every engine.
+Engines built on a different detection algorithm are not held to the tolerance; their
+measured divergence from the reference is reported in a section of its own
+
+With --whisper <media files>, compares Whisper model sizes instead: the largest model
+given is the reference, and every model is scored with and without the confidence
+post-filter (confidence_filter.py) for speed and speech/silence agreement
+"""
+
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+import confidence_filter
+import decoders
+import loudness
+import pcm_reader
+import silencedetect
+
+# Allowed difference between interval edges (ms)
+DEFAULT_TOLERANCE_MS = 1
+
+# (min_silence_len ms, silence_thresh dB, seek_step ms, padding ms, keep_over ms)
+PARAMETER_SETS = [
+    (1000, -40, 50, 100, 300),
+    (300, -30, 50, 50, 100),
+    (500, -45, 1, 0, 0),
+]
+
+# Chunk length and threads of the threaded engine; short chunks so every clip spans several
+THREADED_CHUNK_MS = 1500
+THREADED_THREADS = 4
+
+# (sample_width, channels, frame_rate) the corpus cycles through
+FORMATS = [(2, 1, 48000), (2, 2, 44100), (3, 2, 48000), (1, 1, 16000), (4, 1, 44100)]
+
+
+def _speech(t, frame_rate, rng):
+    """Harmonic tone with a syllable-rate envelope, like a voice at -12..-6 dBFS"""
+    phase = 2 * np.pi * np.cumsum(130 + 25 * np.sin(2 * np.pi * 0.5 * t)) / frame_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = 0.5 + 0.5 * np.abs(np.sin(2 * np.pi * 3.1 * t + rng.uniform(0, np.pi)))
+    return 0.25 * voice * syllables
+
+
+def _bursts(t, rng, mean_gap=1.2):
+    """0/1 gate with speech bursts separated by random pauses"""
+    gate = np.zeros(len(t))
+    position = rng.uniform(0, 0.5)
+    while position < t[-1]:
+        length = rng.uniform(0.3, 2.0)
+        gate[(t >= position) & (t < position + length)] = 1
+        position += length + rng.exponential(mean_gap)
+    return gate
+
+
+def corpus_signals(seconds, frame_rate, rng):
+    """
+    Named float signals (-1..1) covering the cases that break naive replacements:
+    speech bursts, slow fades across the threshold, DC offset, clipping and noise
+    hovering right at the threshold
+    """
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    speech = _speech(t, frame_rate, rng)
+    hiss = rng.normal(0, 10 ** (-62 / 20), len(t))
+
+    fade = np.clip(np.abs(((t / seconds) * 4) % 2 - 1) * 1.5 - 0.25, 0, 1)
+    near = rng.normal(0, 10 ** (-40 / 20), len(t)) * (1 + 0.08 * np.sin(2 * np.pi * 0.37 * t))
+
+    return {
+        'speech_bursts': speech * _bursts(t, rng) + hiss,
+        'fades': speech * fade ** 3 + hiss,
+        'dc_offset': speech * _bursts(t, rng) + hiss + 0.02,
+        'clipping': np.clip(4 * speech * _bursts(t, rng), -1, 1) + hiss,
+        'near_threshold': near + speech * _bursts(t, rng, mean_gap=3.0) * 0.2,
+    }
+
+
+def write_wav(path, signal, sample_width, channels, frame_rate):
+    """Write a float signal as integer PCM (channels get slightly different gains)"""
+    gains = np.linspace(1.0, 0.8, channels)
+    samples = np.clip(signal[:, None] * gains, -1, 1)
+    scale = 2 ** (8 * sample_width - 1) - 1
+    if sample_width == 1:
+        data = np.round(samples * 127 + 128).astype(np.uint8)
+    elif sample_width == 3:
+        wide = np.round(samples * scale).astype('<i4')
+        data = np.ascontiguousarray(wide.view(np.uint8).reshape(len(signal), channels, 4)[..., :3])
+    else:
+        data = np.round(samples * scale).astype('<i%d' % sample_width)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(frame_rate)
+        w.writeframes(data.tobytes())
+
+
+def generate_corpus(directory, seconds=20, seed=0):
+    """Write the corpus WAVs; returns [(case name, path), ...]"""
+    rng = np.random.default_rng(seed)
+    cases = []
+    for sample_width, channels, frame_rate in FORMATS:
+        for name, signal in corpus_signals(seconds, frame_rate, rng).items():
+            case = f"{name}-{8 * sample_width}bit-{channels}ch-{frame_rate}"
+            path = os.path.join(directory, case + '.wav')
+            write_wav(path, signal, sample_width, channels, frame_rate)
+            cases.append((case, path))
+    return cases
+
+
+def postprocess(silences, clip_length, padding, keep_over):
+    """jumpcut.py's padding and keep-over steps"""
+    return loudness.merge_keep_over(loudness.pad_silences(silences, padding, clip_length), keep_over)
+
+
+def reference_engine(path, in_ms, out_ms, params):
+    """pydub decode and detect_silence, as jumpcut.py did before any acceleration"""
+    from pydub import AudioSegment, silence
+
+    min_len, thresh, seek_step, padding, keep_over = params
+    audio = AudioSegment.from_file(path, 'wav')[in_ms:out_ms]
+    silences = silence.detect_silence(audio, min_silence_len=min_len, silence_thresh=thresh, seek_step=seek_step)
+    return postprocess(silences, len(audio), padding, keep_over)
+
+
+def numpy_engine(path, in_ms, out_ms, params):
+    """Memory-mapped PCM and the vectorized detector"""
+    min_len, thresh, seek_step, padding, keep_over = params
+    audio = pcm_reader.open_pcm(path).window(in_ms, out_ms)
+    silences = loudness.detect_silence(audio, min_silence_len=min_len, silence_thresh=thresh, seek_step=seek_step)
+    return postprocess(silences, len(audio), padding, keep_over)
+
+
+def envelope_engine(path, in_ms, out_ms, params):
+    """Whole-file envelope windowed afterwards, as for pre-analyzed (cached) media"""
+    min_len, thresh, seek_step, padding, keep_over = params
+    envelope = loudness.compute_envelope(pcm_reader.open_pcm(path)).window(in_ms, out_ms)
+    silences = loudness.silences_from_envelope(envelope, min_len, thresh, seek_step)
+    return postprocess(silences, len(envelope), padding, keep_over)
+
+
+class NotApplicable(Exception):
+    """Raised by an engine for a case it does not cover; the comparison is skipped"""
+
+
+def refined_engine(path, in_ms, out_ms, params):
+    """Coarse-to-fine millisecond edges (jumpcut.py --boundaries ms), without snapping"""
+    min_len, thresh, seek_step, padding, keep_over = params
+    envelope = loudness.compute_envelope(pcm_reader.open_pcm(path)).window(in_ms, out_ms)
+    silences = loudness.detect_silence_refined(envelope, min_len, thresh, seek_step, snap=None)
+    return postprocess(silences, len(envelope), padding, keep_over)
+
+
+def threaded_engine(path, in_ms, out_ms, params):
+    """Vectorized detector with the block energy split over several threads"""
+    min_len, thresh, seek_step, padding, keep_over = params
+    audio = pcm_reader.open_pcm(path).window(in_ms, out_ms)
+    silences = loudness.detect_silence(audio, min_silence_len=min_len, silence_thresh=thresh, seek_step=seek_step,
+                                       chunk_ms=THREADED_CHUNK_MS, threads=THREADED_THREADS)
+    return postprocess(silences, len(audio), padding, keep_over)
+
+
+def pyav_engine(path, in_ms, out_ms, params):
+    """In-process PyAV decode of the in/out range (seek and trim), then the vectorized detector"""
+    if pcm_reader.open_pcm(path).sample_width != 2:
+        raise NotApplicable("PyAV decodes to 16-bit samples")
+    min_len, thresh, seek_step, padding, keep_over = params
+    audio = decoders.decode_source(path, in_ms, out_ms, backend='pyav')
+    silences = loudness.detect_silence(audio, min_silence_len=min_len, silence_thresh=thresh, seek_step=seek_step)
+    return postprocess(silences, len(audio), padding, keep_over)
+
+
+def silencedetect_engine(path, in_ms, out_ms, params):
+    """ffmpeg's silencedetect filter (jumpcut.py --engine silencedetect)"""
+    min_len, thresh, _, padding, keep_over = params
+    silences, clip_length = silencedetect.detect_silence(path, min_len, thresh, in_ms, out_ms)
+    return postprocess(silences, clip_length if clip_length is not None else out_ms - in_ms, padding, keep_over)
+
+
+# Accelerated engines; register new ones here to have them checked against the reference.
+# The decoder-based ones are only registered where their backend is installed
+ENGINES = {
+    'numpy': numpy_engine,
+    'envelope': envelope_engine,
+    'refined': refined_engine,
+    'threaded': threaded_engine,
+}
+if 'pyav' in decoders.available_backends():
+    ENGINES['pyav'] = pyav_engine
+
+# Engines that only approximate the reference and are measured rather than checked:
+# silencedetect compares sample peaks, not window RMS
+APPROXIMATE_ENGINES = {}
+if shutil.which('ffmpeg'):
+    APPROXIMATE_ENGINES['silencedetect'] = silencedetect_engine
+
+# Engines compared with the reference at another seek step: refined edges equal a 1 ms scan
+REFERENCE_SEEK_STEP = {'refined': 1}
+
+
+def diff_intervals(expected, actual, tolerance_ms=DEFAULT_TOLERANCE_MS):
+    """
+    Compare two interval lists edge by edge.
+
+    Returns:
+        Dict with 'match', 'maxDeviation' (ms) and, on mismatch, the first differing
+        position ('firstDifference')
+    """
+    deviation = 0
+    for index, (a, b) in enumerate(zip(expected, actual)):
+        edge = max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+        deviation = max(deviation, edge)
+        if edge > tolerance_ms:
+            return {'match': False, 'maxDeviation': deviation,
+                    'firstDifference': {'index': index, 'expected': a, 'actual': b}}
+    if len(expected) != len(actual):
+        index = min(len(expected), len(actual))
+        return {'match': False, 'maxDeviation': deviation,
+                'firstDifference': {'index': index,
+                                    'expected': expected[index] if index < len(expected) else None,
+                                    'actual': actual[index] if index < len(actual) else None}}
+    return {'match': True, 'maxDeviation': deviation}
+
+
+def _edges(intervals):
+    return np.array([edge for interval in intervals for edge in interval], dtype=np.int64)
+
+
+def _silent_ms(intervals, length):
+    mask = np.zeros(length, dtype=bool)
+    for start, end in intervals:
+        mask[int(start):int(end)] = True
+    return mask
+
+
+def measure_divergence(expected, actual):
+    """
+    How far an approximate engine's cuts are from the reference's
+
+    Returns:
+        Dict with 'cutDifference' (engine cuts minus reference cuts), 'maxDeviation'
+        (ms from any edge to the nearest edge of the other list; None if either has
+        no cuts) and 'disagreementMs' (ms that only one of them cuts)
+    """
+    expected_edges, actual_edges = _edges(expected), _edges(actual)
+    deviation = None
+    if len(expected_edges) and len(actual_edges):
+        distances = np.abs(expected_edges[:, None] - actual_edges[None, :])
+        deviation = int(max(distances.min(axis=1).max(), distances.min(axis=0).max()))
+    length = int(max(np.concatenate((expected_edges, actual_edges, [0]))))
+    disagreement = int(np.sum(_silent_ms(expected, length) != _silent_ms(actual, length)))
+    return {'cutDifference': len(actual) - len(expected), 'maxDeviation': deviation, 'disagreementMs': disagreement}
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _speedups(totals):
+    for total in totals.values():
+        total['speedup'] = round(total['referenceSeconds'] / total['engineSeconds'], 1) if total['engineSeconds'] else None
+        total['referenceSeconds'] = round(total['referenceSeconds'], 3)
+        total['engineSeconds'] = round(total['engineSeconds'], 3)
+
+
+def run_harness(cases, engines=None, parameter_sets=PARAMETER_SETS, tolerance_ms=DEFAULT_TOLERANCE_MS,
+                approximate=None):
+    """
+    Run every engine against the reference for every case, window and parameter set
+
+    Args:
+        approximate: Engines to measure instead of check (default APPROXIMATE_ENGINES)
+
+    Returns:
+        Dict with one record per comparison ('results'), per-engine totals ('summary')
+        and, under 'approximate', the same for the approximate engines with their
+        divergence in place of a match
+    """
+    engines = engines or ENGINES
+    approximate = APPROXIMATE_ENGINES if approximate is None else approximate
+    results, approximate_results = [], []
+    totals = {name: {'runs': 0, 'mismatches': 0, 'skipped': 0, 'referenceSeconds': 0.0, 'engineSeconds': 0.0}
+              for name in engines}
+    approximate_totals = {name: {'runs': 0, 'skipped': 0, 'maxDeviation': None, 'disagreementMs': 0,
+                                 'clipMs': 0, 'referenceSeconds': 0.0, 'engineSeconds': 0.0}
+                          for name in approximate}
+
+    for case, path in cases:
+        length = len(pcm_reader.open_pcm(path))
+        # Whole clip and an off-grid in/out window
+        for in_ms, out_ms in ((0, length), (length // 7 + 13, length - length // 5 - 7)):
+            for params in parameter_sets:
+                references = {}
+                for name, engine in list(engines.items()) + list(approximate.items()):
+                    measured = name not in engines
+                    total = (approximate_totals if measured else totals)[name]
+                    try:
+                        actual, engine_time = _timed(engine, path, in_ms, out_ms, params)
+                    except NotApplicable:
+                        total['skipped'] += 1
+                        continue
+                    reference_params = params
+                    if name in REFERENCE_SEEK_STEP:
+                        reference_params = params[:2] + (REFERENCE_SEEK_STEP[name],) + params[3:]
+                    if reference_params not in references:
+                        references[reference_params] = _timed(reference_engine, path, in_ms, out_ms,
+                                                              reference_params)
+                    expected, reference_time = references[reference_params]
+                    record = {'case': case, 'engine': name, 'in': in_ms, 'out': out_ms, 'params': list(params),
+                              'cuts': len(expected), 'referenceSeconds': round(reference_time, 4),
+                              'engineSeconds': round(engine_time, 4),
+                              'speedup': round(reference_time / engine_time, 1) if engine_time else None}
+                    total['runs'] += 1
+                    total['referenceSeconds'] += reference_time
+                    total['engineSeconds'] += engine_time
+                    if measured:
+                        record.update(measure_divergence(expected, actual))
+                        approximate_results.append(record)
+                        if record['maxDeviation'] is not None:
+                            total['maxDeviation'] = max(total['maxDeviation'] or 0, record['maxDeviation'])
+                        total['disagreementMs'] += record['disagreementMs']
+                        total['clipMs'] += out_ms - in_ms
+                    else:
+                        record.update(diff_intervals(expected, actual, tolerance_ms))
+                        results.append(record)
+                        total['mismatches'] += 0 if record['match'] else 1
+
+    _speedups(totals)
+    _speedups(approximate_totals)
+    for total in approximate_totals.values():
+        # Share of the analyzed audio the engine cuts differently
+        disagreement_ms, clip_ms = total.pop('disagreementMs'), total.pop('clipMs')
+        total['disagreement'] = round(disagreement_ms / clip_ms, 4) if clip_ms else None
+    return {'results': results, 'summary': totals,
+            'approximate': {'results': approximate_results, 'summary': approximate_totals}}
+
+
+# Model sizes from fastest to most accurate
+WHISPER_MODELS = ['tiny', 'base', 'small', 'medium', 'large']
+# Resolution of the speech masks compared between models (s)
+MASK_STEP = 0.01
+
+
+def speech_mask(segments, duration, step=MASK_STEP):
+    """Boolean speech/silence frames of `step` seconds covering [0, duration)"""
+    mask = np.zeros(int(np.ceil(duration / step)), dtype=bool)
+    for segment in segments:
+        mask[int(segment.start / step):int(np.ceil(segment.end / step))] = True
+    return mask
+
+
+def compare_masks(reference, candidate, step=MASK_STEP):
+    """
+    Returns:
+        Dict with the fraction of frames on which both masks agree and the seconds of
+        speech only the candidate ('falseSpeechSeconds') or only the reference
+        ('missedSpeechSeconds') found
+    """
+    frames = min(len(reference), len(candidate))
+    reference, candidate = reference[:frames], candidate[:frames]
+    return {'agreement': round(float(np.mean(reference == candidate)), 4) if frames else 1.0,
+            'falseSpeechSeconds': round(float(np.sum(candidate & ~reference)) * step, 2),
+            'missedSpeechSeconds': round(float(np.sum(reference & ~candidate)) * step, 2)}
+
+
+def whisper_tradeoff(paths, models, language=None, confidence=None):
+    """
+    Speed and accuracy of Whisper model sizes, with and without the confidence filter
+
+    Args:
+        models: Model sizes; the most accurate one is the reference (unfiltered)
+        confidence: confidence_filter.ConfidenceFilter to score (default thresholds if None)
+
+    Returns:
+        Dict with per-model transcription seconds, speedup over the reference and
+        agreement with the reference's speech, unfiltered and filtered
+    """
+    import whisper_jumpcut
+
+    models = sorted(set(models), key=WHISPER_MODELS.index)
+    reference_model = models[-1]
+    confidence = confidence or confidence_filter.ConfidenceFilter()
+    transcripts = {model: [] for model in models}
+    seconds = {model: 0.0 for model in models}
+    for model in models:
+        # Loading is not part of the comparison
+        whisper_jumpcut.load_model(model)
+        for path in paths:
+            (segments, duration), elapsed = _timed(whisper_jumpcut.transcribe, path, model, language)
+            transcripts[model].append((segments, duration or (segments[-1].end if segments else 0.0)))
+            seconds[model] += elapsed
+
+    summary = {}
+    references = [speech_mask(segments, duration) for segments, duration in transcripts[reference_model]]
+    for model in models:
+        record = {'seconds': round(seconds[model], 3),
+                  'speedup': round(seconds[reference_model] / seconds[model], 1) if seconds[model] else None}
+        # A fresh copy per model so its report counts only this model's segments
+        model_filter = copy.copy(confidence)
+        for variant, keep in (('unfiltered', lambda segments: segments), ('filtered', model_filter.apply)):
+            candidates = [speech_mask(keep(segments), duration) for segments, duration in transcripts[model]]
+            record[variant] = compare_masks(np.concatenate(references), np.concatenate(candidates))
+        record['filtered']['filter'] = model_filter.report()
+        summary[model] = record
+    return {'files': len(paths), 'reference': reference_model, 'models': summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check accelerated silence detection against pydub')
+    parser.add_argument("--seconds", type=float, default=20, help="Length of every corpus clip")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_MS, help="Allowed edge difference (ms)")
+    parser.add_argument("--engines", nargs='*', default=list(ENGINES), choices=list(ENGINES),
+                       help="Engines to compare with the reference")
+    parser.add_argument("--approximate", nargs='*', default=list(APPROXIMATE_ENGINES), choices=list(APPROXIMATE_ENGINES),
+                       help="Approximate engines to measure against the reference (not checked)")
+    parser.add_argument("--json", action="store_true", help="Print every comparison as JSON")
+    parser.add_argument("--whisper", nargs='+', default=None, metavar="MEDIA",
+                       help="Compare Whisper model sizes on these files instead of the loudness engines")
+    parser.add_argument("--models", nargs='+', default=['tiny', 'base', 'small'], choices=WHISPER_MODELS,
+                       help="Model sizes for --whisper; the largest is the reference")
+    parser.add_argument("--language", default=None, help="Language code for --whisper (auto-detect if None)")
+    parser.add_argument("--confidence", default=None, metavar="JSON",
+                       help="Confidence filter thresholds for --whisper, e.g. '{\"noSpeechProb\": 0.5}'")
+    args = parser.parse_args()
+
+    if args.whisper:
+        params = json.loads(args.confidence) if args.confidence else {}
+        confidence = confidence_filter.ConfidenceFilter.from_params(dict(params, confidenceFilter=True))
+        report = whisper_tradeoff(args.whisper, args.models, args.language, confidence)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            for model, record in report['models'].items():
+                for variant in ('unfiltered', 'filtered'):
+                    scores = record[variant]
+                    print(f"{model} {variant}: {scores['agreement']:.1%} agreement with {report['reference']}, "
+                          f"{scores['falseSpeechSeconds']}s false speech, {scores['missedSpeechSeconds']}s missed, "
+                          f"{record['speedup']}x faster ({record['seconds']}s)")
+        return 0
+
+    directory = tempfile.mkdtemp(prefix='jumpcut-harness-')
+    try:
+        cases = generate_corpus(directory, args.seconds, args.seed)
+        report = run_harness(cases, {name: ENGINES[name] for name in args.engines}, tolerance_ms=args.tolerance,
+                             approximate={name: APPROXIMATE_ENGINES[name] for name in args.approximate})
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for record in report['results']:
+            if not record['match']:
+                print(f"MISMATCH {record['engine']} {record['case']} [{record['in']}, {record['out']}] "
+                      f"params={record['params']}: {record['firstDifference']}")
+        for name, total in report['summary'].items():
+            print(f"{name}: {total['runs'] - total['mismatches']}/{total['runs']} identical within "
+                  f"{args.tolerance} ms, {total['speedup']}x faster "
+                  f"({total['referenceSeconds']}s reference, {total['engineSeconds']}s engine)"
+                  + (f", {total['skipped']} cases skipped" if total['skipped'] else ''))
+        if report['approximate']['summary']:
+            print("Approximate engines (different algorithm, not checked):")
+        for name, total in report['approximate']['summary'].items():
+            if not total['runs']:
+                continue
+            print(f"  {name}: {total['disagreement']:.2%} of the audio cut differently, edges up to "
+                  f"{total['maxDeviation']} ms apart over {total['runs']} runs, {total['speedup']}x faster")
+
+    return 1 if any(total['mismatches'] for total in report['summary'].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
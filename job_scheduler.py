@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Job scheduler for the analysis engines
+Bounded worker pool with priorities, explicit cancellation and coalescing of
+queued jobs that a newer request for the same clip makes obsolete. The analysis
+service and the background indexer run their work through it; the panel's local
+runs keep one engine process at a time and cancel it when a new run starts
+(client/index.js startJob), which is the same policy with a single worker
+"""
+
+import heapq
+import itertools
+import logging
+import subprocess
+import threading
+import time
+
+# Lower value runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+SUPERSEDED = 'superseded'
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED, SUPERSEDED)
+
+# How often a running command checks for cancellation
+POLL_INTERVAL = 0.1
+
+# Finished jobs kept around for status queries
+HISTORY_SIZE = 200
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function that notices its cancel event"""
+
+
+class Job:
+    """
+    One unit of analysis work.
+
+    The job function is called as fn(*args, cancel_event=..., **kwargs) and should
+    check cancel_event between segments/chunks to stop early.
+    """
+
+    def __init__(self, job_id, key, priority, fn, args, kwargs):
+        self.id = job_id
+        self.key = key
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.state = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def wait_time(self):
+        """Seconds spent in the queue (so far, if still queued)"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.submitted_at
+
+    @property
+    def run_time(self):
+        if self.started_at is None:
+            return 0.0
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.started_at
+
+    def cancel(self):
+        """Ask the job to stop; queued jobs are dropped, running jobs see cancel_event"""
+        self.cancel_event.set()
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns False on timeout"""
+        return self._done.wait(timeout)
+
+    def _finish(self, state, result=None, error=None):
+        self.state = state
+        self.result = result
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'priority': self.priority,
+            'state': self.state,
+            'waitTime': round(self.wait_time, 3),
+            'runTime': round(self.run_time, 3),
+            'error': str(self.error) if self.error else None,
+        }
+
+
+class JobScheduler:
+    """
+    Priority queue in front of a fixed number of worker threads.
+
+    Submitting a job for a key (usually the media path) that already has a queued
+    job drops the older one as superseded; with supersede_running=True a running
+    job for that key is asked to cancel as well.
+    """
+
+    def __init__(self, max_workers=2, supersede_running=True):
+        self.max_workers = max_workers
+        self.supersede_running = supersede_running
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count(1)
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._completed_waits = []
+        self._workers = []
+        for i in range(max_workers):
+            worker = threading.Thread(target=self._worker, name=f"jumpcut-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, key, fn, *args, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Queue fn for execution and return its Job"""
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Scheduler has been shut down")
+
+            for job in self._jobs.values():
+                if job.key != key or job.state in FINISHED_STATES:
+                    continue
+                if job.state == QUEUED:
+                    logging.debug(f"Job {job.id} for {key} superseded while queued")
+                    job.cancel()
+                    job._finish(SUPERSEDED)
+                elif self.supersede_running:
+                    logging.debug(f"Job {job.id} for {key} superseded while running")
+                    job.cancel()
+
+            self._prune_history()
+            job = Job(next(self._counter), key, priority, fn, args, kwargs)
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (priority, job.id, job))
+            self._condition.notify()
+            return job
+
+    def submit_command(self, key, cmd, priority=PRIORITY_INTERACTIVE, **popen_kwargs):
+        """Queue an engine subprocess; cancelling the job terminates the process"""
+        return self.submit(key, run_command, cmd, priority=priority, **popen_kwargs)
+
+    def cancel(self, job_id):
+        """Cancel a job by id; returns False if it is unknown or already finished"""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.cancel()
+            if job.state == QUEUED:
+                job._finish(CANCELLED)
+            return True
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def active_jobs(self):
+        """Queued and running jobs, oldest first"""
+        with self._condition:
+            return [job for job in self._jobs.values() if job.state not in FINISHED_STATES]
+
+    def stats(self):
+        """Queue depth, running jobs and wait times (seconds) for monitoring"""
+        with self._condition:
+            queued = [job for job in self._jobs.values() if job.state == QUEUED]
+            running = [job for job in self._jobs.values() if job.state == RUNNING]
+            waits = self._completed_waits
+            return {
+                'workers': self.max_workers,
+                'queued': len(queued),
+                'queuedInteractive': sum(1 for job in queued if job.priority <= PRIORITY_INTERACTIVE),
+                'running': len(running),
+                'oldestQueuedWait': round(max((job.wait_time for job in queued), default=0.0), 3),
+                'averageWait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                'maxWait': round(max(waits), 3) if waits else 0.0,
+            }
+
+    def shutdown(self, wait=True, cancel_running=False):
+        """Stop accepting jobs, drop the queue and (optionally) cancel running jobs"""
+        with self._condition:
+            self._shutdown = True
+            for job in self._jobs.values():
+                if job.state == QUEUED:
+                    job.cancel()
+                    job._finish(CANCELLED)
+                elif job.state == RUNNING and cancel_running:
+                    job.cancel()
+            self._condition.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _prune_history(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - HISTORY_SIZE)]:
+            del self._jobs[job_id]
+
+    def _next_job(self):
+        with self._condition:
+            while True:
+                while self._heap and self._heap[0][2].state != QUEUED:
+                    heapq.heappop(self._heap)  # superseded or cancelled while queued
+                if self._heap:
+                    job = heapq.heappop(self._heap)[2]
+                    job.state = RUNNING
+                    job.started_at = time.monotonic()
+                    self._completed_waits = (self._completed_waits + [job.wait_time])[-100:]
+                    return job
+                if self._shutdown:
+                    return None
+                self._condition.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            result, error = None, None
+            try:
+                result = job.fn(*job.args, cancel_event=job.cancel_event, **job.kwargs)
+            except JobCancelled:
+                job.cancel_event.set()
+            except Exception as e:
+                logging.error(f"Job {job.id} for {job.key} failed: {e}")
+                error = e
+            # State and timestamps change under the lock stats() and active_jobs() read them with
+            with self._condition:
+                if error is not None:
+                    job._finish(FAILED, error=error)
+                elif job.cancel_event.is_set():
+                    job._finish(SUPERSEDED if self._is_superseded(job) else CANCELLED, result=result)
+                else:
+                    job._finish(DONE, result=result)
+            logging.debug(f"Job {job.id} {job.state}: waited {job.wait_time:.2f}s, ran {job.run_time:.2f}s")
+
+    def _is_superseded(self, job):
+        with self._condition:
+            return any(other.key == job.key and other.id > job.id for other in self._jobs.values())
+
+
+def run_command(cmd, cancel_event=None, **popen_kwargs):
+    """
+    Run an engine subprocess and return its stdout.
+
+    If cancel_event is set the process gets SIGTERM (so it can clean up and report
+    partial results), then SIGKILL if it does not exit in time.
+    """
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, **popen_kwargs)
+    output = {}
+
+    def collect(stream, name):
+        output[name] = stream.read()
+
+    readers = [threading.Thread(target=collect, args=(process.stdout, 'stdout'), daemon=True),
+               threading.Thread(target=collect, args=(process.stderr, 'stderr'), daemon=True)]
+    for reader in readers:
+        reader.start()
+
+    cancelled = False
+    while process.poll() is None:
+        if cancel_event is not None and cancel_event.wait(POLL_INTERVAL):
+            cancelled = True
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+    for reader in readers:
+        reader.join()
+
+    if cancelled:
+        raise JobCancelled(output.get('stdout', ''))
+    if process.returncode != 0:
+        raise Exception(f"Engine exited with code {process.returncode}: {output.get('stderr', '')}")
+    return output.get('stdout', '')
@@ -1,13 +1,23 @@
 from pydub import AudioSegment, silence
+import pcm_reader
+import loudness
+import analysis_cache
+import cut_budget
+import decoders
+import memory_budget
+import silencedetect
+import tail_mode
 import argparse
+import contextlib
 import os
 import json
 import sys
 import subprocess
 import logging
 
+LOG_FILE = 'jumpcutpy.log'
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s (Line: %(lineno)d)'
-logging.basicConfig(filename='jumpcutpy.log', format=log_format)
+logging.basicConfig(filename=LOG_FILE, format=log_format)
 logging.getLogger().setLevel(logging.DEBUG)
 
 logging.debug("Running Python executable.")
@@ -53,8 +63,46 @@ logging.debug("Running Python executable.")
 parser = argparse.ArgumentParser()
 parser.add_argument("path")
 parser.add_argument("jumpcutparams", default=None)
+parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                    help="Fit the analysis chunk size to this much memory and report peak RSS")
+parser.add_argument("--engine", default="samples", choices=["samples", "silencedetect"],
+                    help="Analyze samples in Python (pydub/NumPy) or let ffmpeg's silencedetect filter decode and detect")
+parser.add_argument("--tail", action="store_true",
+                    help="Follow a WAV/AIFF file that is still being recorded and keep its silence list up to date")
+parser.add_argument("--tail-output", default=None,
+                    help="Silence list kept up to date in tail mode (default: <media>.silences.json)")
+parser.add_argument("--idle", type=float, default=tail_mode.IDLE_SECONDS,
+                    help="Tail mode ends once the file has not grown for this many seconds")
+parser.add_argument("--profile", action="store_true",
+                    help="Profile the run (cProfile, per-stage tracemalloc snapshots) into a zip next to the log")
+parser.add_argument("--boundaries", default="grid", choices=["grid", "ms"] + list(loudness.SNAP_MODES),
+                    help="Cut edges on the seek step grid, refined to 1 ms, or refined and snapped to the quietest "
+                         "millisecond or nearest zero crossing")
+parser.add_argument("--threads", type=int, default=loudness.THREADS,
+                    help="Convert this many chunks of samples at once (default: one per CPU)")
 args = parser.parse_args()
 
+# Per-stage allocation figures (and the chunk size plan) when a memory budget is given
+MEMORY = memory_budget.MemoryTracker(args.memory_budget) if args.memory_budget else None
+CHUNK_MS = loudness.CHUNK_MS
+THREADS = max(1, args.threads)
+
+# cProfile and per-stage memory snapshots, bundled next to the log at the end of the run
+PROFILER = None
+if args.profile:
+    import profiling
+    PROFILER = profiling.Profiler(LOG_FILE)
+    PROFILER.start()
+
+def stage(name):
+    if PROFILER is None:
+        return MEMORY.stage(name) if MEMORY else contextlib.nullcontext()
+    stack = contextlib.ExitStack()
+    stack.enter_context(PROFILER.stage(name))
+    if MEMORY:
+        stack.enter_context(MEMORY.stage(name))
+    return stack
+
 # Values in milliseconds
 jumpcut_params = { # Default parameters based on the Premiere extension GUI sliders.
     'silenceCutoff': -80,
@@ -66,88 +114,227 @@ jumpcut_params = { # Default parameters based on the Premiere extension GUI slid
     'start': None
 }
 
+AUTO_THRESHOLD = False
+# Optional cut budget (count and seconds, not converted to ms)
+MAX_CUTS = None
+MIN_SAVED_SECONDS = None
+
 if args.jumpcutparams: # If parameters are passed, overwrite the defaults.
     input = json.loads(args.jumpcutparams)
-    jumpcut_params.update(input)
+    # A cutoff of 'auto' estimates the threshold from the clip's own noise floor.
+    AUTO_THRESHOLD = str(input.get('silenceCutoff')).lower() == 'auto'
+    if AUTO_THRESHOLD:
+        input.pop('silenceCutoff')
+    if input.get('maxCuts') not in (None, ''):
+        MAX_CUTS = int(input['maxCuts'])
+    if input.get('minSavedSeconds') not in (None, ''):
+        MIN_SAVED_SECONDS = float(input['minSavedSeconds'])
+    # Ignore panel-only keys such as 'method'.
+    jumpcut_params.update({k: v for k, v in input.items() if k in jumpcut_params})
     # Convert to ms
-    jumpcut_params = {k: float(v) * 1000 for k, v in jumpcut_params.items()}
+    jumpcut_params = {k: float(v) * 1000 if v is not None else None for k, v in jumpcut_params.items()}
     jumpcut_params['silenceCutoff'] = int(jumpcut_params['silenceCutoff']) / 1000 # dB
 
 THRESHOLD = int(jumpcut_params['silenceCutoff'])
 PADDING = int(jumpcut_params['padding'])
 MIN_SILENCE_LENGTH = int(jumpcut_params['removeOver'])
 KEEP_OVER = int(jumpcut_params['keepOver'])
-INPOINT = int(jumpcut_params['in'])
-OUTPOINT = int(jumpcut_params['out'])
-START = int(jumpcut_params['start'])
+INPOINT = int(jumpcut_params['in'] or 0)
+OUTPOINT = int(jumpcut_params['out']) if jumpcut_params['out'] is not None else None
+START = int(jumpcut_params['start'] or 0)
 
 # Other parameters not controlled by the GUI
 SEEK_STEP = 50
 
+# Millisecond cut edges for the cost of the SEEK_STEP scan, optionally snapped to a quieter point
+REFINE = args.boundaries != 'grid'
+SNAP = args.boundaries if args.boundaries in loudness.SNAP_MODES else None
+
+# ffmpeg decodes and detects in one pass; the automatic cutoff needs the level histogram, so it keeps the sample engine
+USE_SILENCEDETECT = args.engine == 'silencedetect' and not AUTO_THRESHOLD
+
+# Recordings still being captured: analyze what is appended until the file stops growing.
+if args.tail:
+    if AUTO_THRESHOLD:
+        print(json.dumps({"error": "Tail mode needs a fixed cutoff"}))
+        sys.exit(1)
+    import whisper_jumpcut
+    control = whisper_jumpcut.RunControl(profiler=PROFILER)
+    control.install_signal_handlers()
+    detector = tail_mode.LoudnessTail(MIN_SILENCE_LENGTH, THRESHOLD, SEEK_STEP, PADDING, KEEP_OVER)
+    with stage('tail'):
+        result = tail_mode.follow(args.path, detector, args.tail_output or args.path + '.silences.json',
+                                  START / 1000, idle_seconds=args.idle, control=control)
+    if PROFILER:
+        result['profile'] = PROFILER.finish()
+    print(json.dumps(result))
+    sys.exit(0)
+
 # File path and format config
 file_extension = os.path.splitext(args.path)[1].replace('.', '')
 
 FILE_PATH = args.path
 FILE_TYPE = file_extension
+COMPRESSED = not pcm_reader.is_pcm_file(FILE_PATH)
+
+# Budget the decode of compressed media before it happens: a tight budget decodes at a lower rate.
+DECODE_RATE = None
+if MEMORY and COMPRESSED and not USE_SILENCEDETECT:
+    try:
+        info = decoders.probe(FILE_PATH)
+        end = OUTPOINT / 1000 if OUTPOINT else info['duration']
+        MEMORY.plan = memory_budget.plan_run(args.memory_budget, 'loudness', None,
+                                             end - INPOINT / 1000 if end else None,
+                                             info['rate'], info['channels'], compressed=True)
+        DECODE_RATE = MEMORY.plan['analysisRate']
+    except Exception as e:
+        logging.debug(f"Could not probe {FILE_PATH} for the memory plan: {e}")
 
 try:
-    # Load file
-    audio = AudioSegment.from_file(FILE_PATH, FILE_TYPE)
-    # Crop audio based on in and out points
-    audio = audio[INPOINT:OUTPOINT]
-    CLIP_LENGTH = len(audio)
+    with stage('decode'):
+        audio = None
+        # The source is a window of the memory-mapped file rather than a decode
+        MAPPED = False
+        detect_silence = silence.detect_silence
+        # Media pre-analyzed by the background indexer needs no decoding at all.
+        envelope = analysis_cache.load_envelope(FILE_PATH)
+        if envelope is not None:
+            envelope = envelope.window(INPOINT, OUTPOINT)
+            CLIP_LENGTH = len(envelope)
+        elif not USE_SILENCEDETECT:
+            if pcm_reader.is_pcm_file(FILE_PATH):
+                # Uncompressed source: analyze the in/out window straight from the memory-mapped file
+                try:
+                    audio = pcm_reader.open_pcm(FILE_PATH).window(INPOINT, OUTPOINT)
+                    detect_silence = loudness.detect_silence
+                    MAPPED = True
+                except ValueError as e:
+                    logging.debug(f"PCM fast path unavailable, decoding with ffmpeg: {e}")
+
+            if audio is None and (decoders.use_pyav() or DECODE_RATE):
+                # Decode in-process, seeking straight to the in point; a budgeted decode streams
+                # the in/out range at the planned rate (through ffmpeg without PyAV)
+                try:
+                    audio = decoders.decode_source(FILE_PATH, INPOINT, OUTPOINT, rate=DECODE_RATE)
+                    detect_silence = loudness.detect_silence
+                except Exception as e:
+                    logging.warning(f"Streamed decoding failed, decoding with pydub: {e}")
+
+            if audio is None:
+                if DECODE_RATE:
+                    logging.warning("pydub decodes the whole file at its own rate; the memory budget may be exceeded")
+                # Load file
+                audio = AudioSegment.from_file(FILE_PATH, FILE_TYPE)
+                # Crop audio based on in and out points
+                audio = audio[INPOINT:OUTPOINT]
+                if DECODE_RATE:
+                    audio = audio.set_frame_rate(DECODE_RATE)
+            CLIP_LENGTH = len(audio)
 except Exception as e:
     logging.debug(e)
     raise
 
+# Size the analysis chunks to the memory budget now that the format is known.
+if MEMORY and (envelope is not None or audio is not None):
+    source_format = envelope if envelope is not None else audio
+    if not MEMORY.plan:
+        MEMORY.plan = memory_budget.plan_run(args.memory_budget, 'loudness', None, CLIP_LENGTH / 1000,
+                                             source_format.frame_rate, source_format.channels,
+                                             compressed=COMPRESSED)
+    # Every thread holds one chunk, so they share the planned scratch memory
+    CHUNK_MS = max(memory_budget.MIN_CHUNK_MS, MEMORY.plan['chunkMs'] // THREADS)
+
+def snap_source():
+    """Samples for zero-crossing snapping; without them edges snap to the quietest millisecond"""
+    if SNAP != 'zero-crossing':
+        return None
+    if isinstance(audio, pcm_reader.PCMSource):
+        return audio
+    if pcm_reader.is_pcm_file(FILE_PATH):
+        try:
+            return pcm_reader.open_pcm(FILE_PATH).window(INPOINT, OUTPOINT)
+        except ValueError as e:
+            logging.debug(f"No samples for zero-crossing snapping: {e}")
+    return None
+
+# Whole-file envelopes computed here are stored for later runs (not those of a reduced decode rate).
+# Memory-mapped files are measured whole even when the panel sends in/out points, since the
+# envelope windows exactly; decoded media only when the whole file was decoded anyway.
+CACHE_ENVELOPE = envelope is None and not USE_SILENCEDETECT and not DECODE_RATE and (
+    MAPPED or (not INPOINT and OUTPOINT is None))
+
 silences = []
+threshold_estimate = None
 try:
-    silences = silence.detect_silence(audio, min_silence_len=MIN_SILENCE_LENGTH, seek_step=SEEK_STEP, silence_thresh=THRESHOLD)
+    with stage('detect'):
+        if (AUTO_THRESHOLD or (REFINE and not USE_SILENCEDETECT) or CACHE_ENVELOPE) and envelope is None:
+            # Histogram, threshold and silences all come from one pass over the samples.
+            if not isinstance(audio, pcm_reader.PCMSource):
+                audio = pcm_reader.wrap_audio_segment(audio)
+            measured = pcm_reader.open_pcm(FILE_PATH) if CACHE_ENVELOPE and MAPPED else audio
+            envelope = loudness.compute_envelope(measured, chunk_ms=CHUNK_MS, threads=THREADS)
+            if CACHE_ENVELOPE:
+                try:
+                    analysis_cache.save_envelope(FILE_PATH, envelope)
+                except OSError as e:
+                    logging.warning(f"Could not cache envelope: {e}")
+            if measured is not audio:
+                envelope = envelope.window(INPOINT, OUTPOINT)
+
+        if AUTO_THRESHOLD and REFINE:
+            threshold_estimate = loudness.estimate_threshold(envelope.levels())
+            silences = loudness.detect_silence_refined(envelope, MIN_SILENCE_LENGTH, threshold_estimate['threshold'], SEEK_STEP,
+                                                       SNAP, snap_source())
+            logging.debug(f"Auto threshold: {threshold_estimate}")
+        elif AUTO_THRESHOLD:
+            silences, threshold_estimate = loudness.auto_silences_from_envelope(envelope, min_silence_len=MIN_SILENCE_LENGTH, seek_step=SEEK_STEP)
+            logging.debug(f"Auto threshold: {threshold_estimate}")
+        elif envelope is None and USE_SILENCEDETECT:
+            # silencedetect reports sample-accurate edges already
+            silences, CLIP_LENGTH = silencedetect.detect_silence(FILE_PATH, min_silence_len=MIN_SILENCE_LENGTH, silence_thresh=THRESHOLD,
+                                                                 in_ms=INPOINT, out_ms=OUTPOINT)
+            if CLIP_LENGTH is None and OUTPOINT:
+                CLIP_LENGTH = OUTPOINT - INPOINT
+            elif CLIP_LENGTH is None:
+                # ffmpeg printed no duration; the end padding needs the real end of the clip
+                duration = decoders.probe(FILE_PATH)['duration']
+                if duration is None:
+                    raise Exception(f"Could not determine the duration of {FILE_PATH}")
+                CLIP_LENGTH = max(0, int(round(duration * 1000)) - INPOINT)
+        elif REFINE:
+            silences = loudness.detect_silence_refined(envelope, MIN_SILENCE_LENGTH, THRESHOLD, SEEK_STEP, SNAP, snap_source())
+        elif envelope is not None:
+            silences = loudness.silences_from_envelope(envelope, min_silence_len=MIN_SILENCE_LENGTH, seek_step=SEEK_STEP, silence_thresh=THRESHOLD)
+        elif detect_silence is loudness.detect_silence:
+            silences = detect_silence(audio, min_silence_len=MIN_SILENCE_LENGTH, seek_step=SEEK_STEP, silence_thresh=THRESHOLD, chunk_ms=CHUNK_MS,
+                                       threads=THREADS)
+        else:
+            silences = detect_silence(audio, min_silence_len=MIN_SILENCE_LENGTH, seek_step=SEEK_STEP, silence_thresh=THRESHOLD)
 except Exception as e:
     logging.debug(e)
     raise
 
 # Add padding
-to_remove = []
-for i in range(len(silences)):
-
-    # Check that this silence is not at the beginning of the file
-    if silences[i][0] > 0:
-        silences[i][0] = silences[i][0] + PADDING
-
-    # Check that this silence is not at the end of the file
-    if silences[i][1] < CLIP_LENGTH:
-        silences[i][1] = silences[i][1] - PADDING
-        
-    if silences[i][1] <= silences[i][0]:
-        to_remove.append(i)
-
-# Remove silences that were padded out of existence
-silences = [s for idx, s in enumerate(silences) if idx not in to_remove]
+silences = loudness.pad_silences(silences, PADDING, CLIP_LENGTH)
 
 # Implement 'keep over' functionality. If the kept space between two silences is smaller than the keep over value,
 # combine them into one long silence.
-cleaned_silences = []
-for i in range(0, len(silences), 2):
-    if i + 1 < len(silences):
-        if silences[i+1][0] - silences[i][1] < KEEP_OVER:
-            cleaned_silences.append([silences[i][0], silences[i+1][1]])
-        else:
-            cleaned_silences.append(silences[i])
-            cleaned_silences.append(silences[i+1])
-    else:
-        cleaned_silences.append(silences[i])
-
-silences = cleaned_silences
+silences = loudness.merge_keep_over(silences, KEEP_OVER)
 
 # Convert to seconds for Premiere
 silences = [[s[0]/1000 + START/1000, s[1]/1000 + START/1000] for s in silences]
 
+# Keep only the cuts worth making if the panel set a budget.
+budget_report = None
+if MAX_CUTS is not None or MIN_SAVED_SECONDS is not None:
+    silences, budget_report = cut_budget.select_cuts(silences, MAX_CUTS, MIN_SAVED_SECONDS)
+    logging.debug(f"Cut budget: {budget_report}")
+
 # Add a flag at the end for the Premiere script to know whether the silences line up
 # with the beginning of the clip or not.
 # logging.debug(silences[0][0])
 # logging.debug(START/1000)
-if silences[0][0] == START/1000:
+if silences and silences[0][0] == START/1000:
     silences.append(1)
 else:
     silences.append(0)
@@ -155,4 +342,14 @@ else:
 # logging.debug(jumpcut_params)
 # logging.debug(silences)
 
-print(json.dumps({"silences": silences}))
+output = {"silences": silences}
+if threshold_estimate:
+    output.update(threshold_estimate)
+if budget_report:
+    output['cutBudget'] = budget_report
+if MEMORY:
+    output['memory'] = MEMORY.report()
+if PROFILER:
+    output['profile'] = PROFILER.finish()
+
+print(json.dumps(output))
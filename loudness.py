@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Vectorized loudness-based silence detection
+NumPy equivalent of pydub.silence.detect_silence that works on memory-mapped PCM
+(see pcm_reader.py) and produces the same millisecond ranges
+"""
+
+import collections
+import concurrent.futures
+import os
+
+import numpy as np
+
+# Frames converted and squared per step; bounds the scratch memory of a pass
+CHUNK_MS = 10000
+# Chunks converted at once by jumpcut.py
+THREADS = os.cpu_count() or 1
+
+# Auto threshold: histogram frame length and level range (dBFS)
+LEVEL_FRAME_MS = 50
+LEVEL_FLOOR_DB = -120
+# Where the threshold sits between the noise floor (0.0) and the speech level (1.0)
+AUTO_THRESHOLD_POSITION = 0.3
+# Below this spread the clip has no distinguishable pauses and nothing is cut
+MIN_SEPARATION_DB = 6
+
+# Boundary refinement: how far (ms) a snapped cut may move to a quieter point
+SNAP_MS = 10
+SNAP_MODES = ('energy', 'zero-crossing')
+
+
+def db_to_float(db):
+    """Same conversion pydub.utils.db_to_float uses for silence thresholds"""
+    return 10 ** (db / 20)
+
+
+def ms_boundaries(frame_rate, length_ms):
+    """Frame index of every millisecond boundary, using pydub's slicing arithmetic"""
+    return (np.arange(length_ms + 1) * (frame_rate / 1000.0)).astype(np.int64)
+
+
+def block_energy(source, bounds, chunk_ms=CHUNK_MS, should_stop=None, threads=1):
+    """
+    Sum of squared samples (all channels) inside each 1 ms block of a source.
+
+    Args:
+        source: PCMSource (or anything with read(), frame_count and sample_width)
+        bounds: Frame boundaries from ms_boundaries()
+        chunk_ms: Number of blocks converted per step
+        should_stop: Optional callable, given the position (ms) reached before each
+            chunk; returning True ends the pass early
+        threads: Chunks converted at once. Chunks end on block boundaries and are the
+            same for any thread count, so the result does not depend on it
+
+    Returns:
+        Array with one energy value per millisecond. Integer for sample widths up to
+        16-bit so window sums stay exact; float64 otherwise, like audioop.rms.
+        Shorter than the source if the pass was stopped early.
+    """
+    exact = source.sample_width <= 2
+    acc_dtype = np.int64 if exact else np.float64
+    blocks = len(bounds) - 1
+    energy = np.zeros(blocks, dtype=acc_dtype)
+    chunks = [(k0, min(k0 + chunk_ms, blocks)) for k0 in range(0, blocks, chunk_ms)]
+
+    if threads <= 1 or len(chunks) <= 1:
+        for k0, k1 in chunks:
+            if should_stop is not None and should_stop(k0):
+                return energy[:k0]
+            chunk = _chunk_energy(source, bounds, k0, k1, acc_dtype)
+            if chunk is None:
+                break
+            energy[k0:k1] = chunk
+        return energy
+
+    # NumPy releases the GIL while converting and summing, so threads run in parallel;
+    # at most `threads` chunks are in flight to keep the scratch memory bounded
+    stopped_at = None
+    pending = collections.deque()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for k0, k1 in chunks:
+            if should_stop is not None and should_stop(k0):
+                stopped_at = k0
+                break
+            pending.append((k0, k1, pool.submit(_chunk_energy, source, bounds, k0, k1, acc_dtype)))
+            if len(pending) >= threads:
+                _store_chunk(energy, pending.popleft())
+        while pending:
+            _store_chunk(energy, pending.popleft())
+    return energy if stopped_at is None else energy[:stopped_at]
+
+
+def _chunk_energy(source, bounds, k0, k1, acc_dtype):
+    """Block energies of blocks k0..k1, or None past the end of the source"""
+    f0 = min(bounds[k0], source.frame_count)
+    f1 = min(bounds[k1], source.frame_count)
+    if f1 <= f0:
+        return None
+    samples = source.read(f0, f1).astype(acc_dtype)
+    per_frame = (samples * samples).reshape(f1 - f0, -1).sum(axis=1)
+    cumulative = np.concatenate(([0], np.cumsum(per_frame)))
+    local = np.clip(bounds[k0:k1 + 1], f0, f1) - f0
+    return cumulative[local[1:]] - cumulative[local[:-1]]
+
+
+def _store_chunk(energy, entry):
+    k0, k1, future = entry
+    chunk = future.result()
+    if chunk is not None:
+        energy[k0:k1] = chunk
+
+
+def window_starts(seg_len, min_silence_len, seek_step):
+    """Slice start positions pydub evaluates, including the forced last slice"""
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step, dtype=np.int64)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+    return starts
+
+
+def window_rms(energy, bounds, starts, length, channels):
+    """
+    RMS of every [start, start + length) millisecond window, truncated to an integer
+    like audioop.rms.
+    """
+    return _cumulative_rms(np.concatenate(([0], np.cumsum(energy))), bounds, starts, length, channels)
+
+
+def _cumulative_rms(cumulative, bounds, starts, length, channels):
+    """window_rms() from the running sum of the block energies"""
+    sums = cumulative[starts + length] - cumulative[starts]
+    counts = (bounds[starts + length] - bounds[starts]) * channels
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rms = np.floor(np.sqrt(sums / counts))
+    return np.where(counts > 0, rms, 0)
+
+
+def group_silent_starts(silence_starts, min_silence_len, seek_step):
+    """Combine silent window starts into [start, end] ranges exactly like pydub"""
+    if len(silence_starts) == 0:
+        return []
+
+    gaps = np.diff(silence_starts)
+    breaks = np.nonzero((gaps != seek_step) & (gaps > min_silence_len))[0]
+    range_starts = np.concatenate(([silence_starts[0]], silence_starts[breaks + 1]))
+    range_ends = np.concatenate((silence_starts[breaks], [silence_starts[-1]])) + min_silence_len
+
+    return [[int(s), int(e)] for s, e in zip(range_starts, range_ends)]
+
+
+def frame_levels(energy, bounds, channels, max_amplitude, frame_ms=LEVEL_FRAME_MS):
+    """dBFS RMS level of consecutive frame_ms frames, built from the per-millisecond block energies"""
+    frames = len(energy) // frame_ms
+    if frames == 0:
+        return np.empty(0)
+    edges = np.arange(frames + 1) * frame_ms
+    cumulative = np.concatenate(([0], np.cumsum(energy)))
+    sums = cumulative[edges[1:]] - cumulative[edges[:-1]]
+    counts = (bounds[edges[1:]] - bounds[edges[:-1]]) * channels
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.sqrt(sums / counts) / max_amplitude
+        levels = 20 * np.log10(ratio)
+    return np.clip(np.nan_to_num(levels, nan=LEVEL_FLOOR_DB, neginf=LEVEL_FLOOR_DB), LEVEL_FLOOR_DB, 0)
+
+
+def estimate_threshold(levels):
+    """
+    Estimate noise floor and speech level from a histogram of frame levels.
+
+    The histogram (1 dB bins) is split into two clusters with Otsu's method; the
+    noise floor and speech level are the medians of the lower and upper cluster.
+
+    Returns:
+        Dict with 'threshold', 'noiseFloor' and 'speechLevel' in dBFS
+    """
+    if len(levels) == 0:
+        return {'threshold': LEVEL_FLOOR_DB, 'noiseFloor': LEVEL_FLOOR_DB, 'speechLevel': LEVEL_FLOOR_DB}
+
+    counts, edges = np.histogram(levels, bins=-LEVEL_FLOOR_DB, range=(LEVEL_FLOOR_DB, 0))
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    # Otsu: pick the split that maximizes the between-class variance
+    weight_low = np.cumsum(counts)
+    weight_high = weight_low[-1] - weight_low
+    mass_low = np.cumsum(counts * centers)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_low = mass_low / weight_low
+        mean_high = (mass_low[-1] - mass_low) / weight_high
+        between = weight_low * weight_high * (mean_low - mean_high) ** 2
+    split = edges[np.argmax(np.nan_to_num(between)) + 1]
+
+    noise = levels[levels < split]
+    speech = levels[levels >= split]
+    noise_floor = float(np.median(noise)) if len(noise) else float(levels.min())
+    speech_level = float(np.median(speech)) if len(speech) else float(levels.max())
+
+    if speech_level - noise_floor < MIN_SEPARATION_DB:
+        threshold = float(levels.min()) - 1
+    else:
+        threshold = noise_floor + (speech_level - noise_floor) * AUTO_THRESHOLD_POSITION
+
+    return {
+        'threshold': round(threshold, 1),
+        'noiseFloor': round(noise_floor, 1),
+        'speechLevel': round(speech_level, 1),
+    }
+
+
+class Envelope:
+    """
+    Per-millisecond block energies of a source plus what is needed to turn them into
+    RMS/dBFS values. Computing it is the only pass over the samples; every threshold,
+    minimum length and seek step can then be evaluated from it, and it can be cached.
+    """
+
+    def __init__(self, energy, bounds, channels, max_possible_amplitude, frame_rate):
+        self.energy = energy
+        self.bounds = bounds
+        self.channels = channels
+        self.max_possible_amplitude = max_possible_amplitude
+        self.frame_rate = frame_rate
+
+    def __len__(self):
+        return len(self.energy)
+
+    def window(self, in_ms=None, out_ms=None):
+        """Sub-range on this envelope's millisecond grid"""
+        start = 0 if in_ms is None else max(0, min(int(in_ms), len(self)))
+        end = len(self) if out_ms is None else max(start, min(int(out_ms), len(self)))
+        bounds = self.bounds[start:end + 1] - self.bounds[start]
+        return Envelope(self.energy[start:end], bounds, self.channels,
+                        self.max_possible_amplitude, self.frame_rate)
+
+    def levels(self, frame_ms=LEVEL_FRAME_MS):
+        return frame_levels(self.energy, self.bounds, self.channels, self.max_possible_amplitude, frame_ms)
+
+
+def compute_envelope(source, should_stop=None, chunk_ms=CHUNK_MS, threads=1):
+    """Single pass over a PCMSource; shorter than the source if should_stop ended it early"""
+    bounds = ms_boundaries(source.frame_rate, len(source))
+    energy = block_energy(source, bounds, chunk_ms=chunk_ms, should_stop=should_stop, threads=threads)
+    return Envelope(energy, bounds[:len(energy) + 1], source.channels,
+                    source.max_possible_amplitude, source.frame_rate)
+
+
+def silences_from_envelope(envelope, min_silence_len=1000, silence_thresh=-16, seek_step=1):
+    """pydub-compatible silence ranges (ms) evaluated on a precomputed envelope"""
+    seg_len = len(envelope)
+    if seg_len < min_silence_len:
+        return []
+
+    threshold = db_to_float(silence_thresh) * envelope.max_possible_amplitude
+    starts = window_starts(seg_len, min_silence_len, seek_step)
+    rms = window_rms(envelope.energy, envelope.bounds, starts, min_silence_len, envelope.channels)
+    return group_silent_starts(starts[rms <= threshold], min_silence_len, seek_step)
+
+
+def auto_silences_from_envelope(envelope, min_silence_len=1000, seek_step=1):
+    """
+    Pick silence_thresh from the envelope's own loudness histogram, then detect silences.
+
+    Returns:
+        (silences, estimate) where estimate is the dict from estimate_threshold()
+    """
+    estimate = estimate_threshold(envelope.levels())
+    silences = silences_from_envelope(envelope, min_silence_len, estimate['threshold'], seek_step)
+    return silences, estimate
+
+
+def detect_silence(source, min_silence_len=1000, silence_thresh=-16, seek_step=1, should_stop=None,
+                   chunk_ms=CHUNK_MS, threads=1):
+    """
+    Returns a list of all silent sections [start, end] in milliseconds of source.
+
+    Drop-in replacement for pydub.silence.detect_silence: every window RMS comes from
+    one pass over the samples instead of re-slicing the audio for each seek step.
+    If should_stop ends the pass early, silences are reported for the part analyzed.
+    """
+    if len(source) < min_silence_len:
+        return []
+    envelope = compute_envelope(source, should_stop=should_stop, chunk_ms=chunk_ms, threads=threads)
+    return silences_from_envelope(envelope, min_silence_len, silence_thresh, seek_step)
+
+
+def detect_silence_auto(source, min_silence_len=1000, seek_step=1, should_stop=None, chunk_ms=CHUNK_MS,
+                        threads=1):
+    """
+    Like detect_silence, but picks silence_thresh from the clip's own loudness histogram.
+
+    The histogram is built from the same block energies as the window RMS values,
+    so choosing the threshold costs no extra pass over the audio.
+
+    Returns:
+        (silences, estimate) where estimate is the dict from estimate_threshold()
+    """
+    envelope = compute_envelope(source, should_stop=should_stop, chunk_ms=chunk_ms, threads=threads)
+    return auto_silences_from_envelope(envelope, min_silence_len, seek_step)
+
+
+def coarse_to_fine_silences(envelope, min_silence_len=1000, silence_thresh=-16, seek_step=50):
+    """
+    pydub-compatible silences with seek_step=1 edges for about the cost of a seek_step scan.
+
+    Windows are evaluated on the seek_step grid; 1 ms starts are only evaluated in the
+    steps that can hold an edge. Every silent window starting within one step before
+    a grid point contains that point's window shortened by seek_step - 1 ms, so grid
+    points whose shortened window is loud cannot have a silent start in the step
+    before them, and a step between two silent grid points cannot change the ranges.
+
+    Returns:
+        The same ranges (ms) as silences_from_envelope(..., seek_step=1)
+    """
+    seg_len = len(envelope)
+    if seg_len < min_silence_len:
+        return []
+    shortened = min_silence_len - seek_step + 1
+    if seek_step <= 1 or shortened < 1:
+        return silences_from_envelope(envelope, min_silence_len, silence_thresh, 1)
+
+    threshold = db_to_float(silence_thresh) * envelope.max_possible_amplitude
+    energy, bounds, channels = envelope.energy, envelope.bounds, envelope.channels
+    cumulative = np.concatenate(([0], np.cumsum(energy)))
+    grid = window_starts(seg_len, min_silence_len, seek_step)
+    silent = _cumulative_rms(cumulative, bounds, grid, min_silence_len, channels) <= threshold
+
+    # Integer RMS <= threshold means energy < (floor(threshold) + 1)^2 per sample; a window
+    # starting up to a step earlier holds at most one frame per channel more
+    limit = (np.floor(threshold) + 1) ** 2 * ((bounds[grid + min_silence_len] - bounds[grid] + 1) * channels)
+    candidate = cumulative[grid + shortened] - cumulative[grid] < limit
+
+    previous = np.concatenate(([-1], grid[:-1]))
+    between_silent = silent & np.concatenate(([False], silent[:-1]))
+    refine = candidate & ~between_silent
+    first, last = previous[refine] + 1, grid[refine]
+    counts = last - first + 1
+    fine = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+    fine_silent = fine[_cumulative_rms(cumulative, bounds, fine, min_silence_len, channels) <= threshold]
+
+    return group_silent_starts(np.union1d(grid[silent], fine_silent), min_silence_len, 1)
+
+
+def _zero_crossing(source, position_ms, snap_ms):
+    """Nearest zero crossing (ms, fractional) of the channel sum within snap_ms of position_ms"""
+    f0 = max(0, int((position_ms - snap_ms) * source.frame_rate / 1000.0))
+    f1 = min(source.frame_count, int((position_ms + snap_ms) * source.frame_rate / 1000.0) + 1)
+    if f1 - f0 < 2:
+        return position_ms
+    mono = source.read(f0, f1).reshape(f1 - f0, -1).astype(np.float64).sum(axis=1)
+    crossings = np.nonzero(np.signbit(mono[1:]) != np.signbit(mono[:-1]))[0] + 1 + f0
+    if len(crossings) == 0:
+        return position_ms
+    target = position_ms * source.frame_rate / 1000.0
+    return float(crossings[np.argmin(np.abs(crossings - target))]) * 1000.0 / source.frame_rate
+
+
+def snap_silences(envelope, silences, mode='energy', source=None, snap_ms=SNAP_MS):
+    """
+    Move every edge that borders kept audio to a quieter point within snap_ms.
+
+    Args:
+        mode: 'energy' for the quietest millisecond of the envelope, 'zero-crossing'
+            for the nearest zero crossing of the samples (needs the source the envelope
+            was computed from; only the frames around each edge are read)
+
+    Returns:
+        Silences in ms; fractional for zero crossings
+    """
+    length = len(envelope)
+
+    def snap(position):
+        if position <= 0 or position >= length:
+            return position
+        if mode == 'zero-crossing' and source is not None:
+            return _zero_crossing(source, position, snap_ms)
+        first, last = max(0, position - snap_ms), min(length, position + snap_ms + 1)
+        quiet = first + np.flatnonzero(envelope.energy[first:last] == envelope.energy[first:last].min())
+        return int(quiet[np.argmin(np.abs(quiet - position))])
+
+    snapped = [[snap(start), snap(end)] for start, end in silences]
+    return [s for s in snapped if s[1] > s[0]]
+
+
+def detect_silence_refined(envelope, min_silence_len=1000, silence_thresh=-16, seek_step=50, snap=None,
+                           source=None, snap_ms=SNAP_MS):
+    """
+    Coarse-to-fine detection: millisecond edges at the cost of a seek_step scan, then
+    optional snapping of the cuts.
+
+    Args:
+        envelope: Envelope of the analyzed range
+        snap: None, 'energy' or 'zero-crossing' (see snap_silences)
+        source: Source of the envelope, for zero-crossing snapping
+
+    Returns:
+        Silences [[start, end], ...] in ms
+    """
+    silences = coarse_to_fine_silences(envelope, min_silence_len, silence_thresh, seek_step)
+    if snap:
+        silences = snap_silences(envelope, silences, snap, source, snap_ms)
+    return silences
+
+
+def pad_silences(silences, padding, clip_length):
+    """
+    Shrink silences by `padding` ms on each side that borders kept audio, dropping
+    silences padded out of existence (jumpcut.py's reference padding loop).
+    """
+    to_remove = []
+    for i in range(len(silences)):
+
+        # Check that this silence is not at the beginning of the file
+        if silences[i][0] > 0:
+            silences[i][0] = silences[i][0] + padding
+
+        # Check that this silence is not at the end of the file
+        if silences[i][1] < clip_length:
+            silences[i][1] = silences[i][1] - padding
+
+        if silences[i][1] <= silences[i][0]:
+            to_remove.append(i)
+
+    # Remove silences that were padded out of existence
+    return [s for idx, s in enumerate(silences) if idx not in to_remove]
+
+
+def merge_keep_over(silences, keep_over):
+    """
+    Implement 'keep over': if the kept audio between a pair of silences is shorter than
+    keep_over ms, combine them into one long silence (jumpcut.py's reference loop).
+    """
+    cleaned_silences = []
+    for i in range(0, len(silences), 2):
+        if i + 1 < len(silences):
+            if silences[i+1][0] - silences[i][1] < keep_over:
+                cleaned_silences.append([silences[i][0], silences[i+1][1]])
+            else:
+                cleaned_silences.append(silences[i])
+                cleaned_silences.append(silences[i+1])
+        else:
+            cleaned_silences.append(silences[i])
+    return cleaned_silences
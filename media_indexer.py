@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Background pre-analysis of project media
+Watches media folders (or a list of project media paths) and fills the analysis cache
+with loudness envelopes, waveform pyramids, audio proxies and Whisper transcripts for new or changed files, at low OS
+priority and throttled so it does not compete with playback
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+import analysis_cache
+import checkpoints
+import job_scheduler
+import loudness
+import pcm_reader
+import proxy_cache
+import waveform
+import whisper_jumpcut
+
+MEDIA_EXTENSIONS = pcm_reader.PCM_EXTENSIONS + [
+    '.mp3', '.m4a', '.aac', '.flac', '.ogg', '.opus',
+    '.mp4', '.mov', '.avi', '.mkv', '.webm', '.mxf',
+]
+
+# Fraction of one core the indexer may use while working
+DEFAULT_DUTY_CYCLE = 0.25
+DEFAULT_SCAN_INTERVAL = 30
+
+
+def lower_priority():
+    """Drop CPU (and on Windows, I/O) priority of this process so editing stays responsive"""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            BELOW_NORMAL_PRIORITY_CLASS = 0x00004000
+            PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            ctypes.windll.kernel32.SetPriorityClass(handle, BELOW_NORMAL_PRIORITY_CLASS)
+            ctypes.windll.kernel32.SetPriorityClass(handle, PROCESS_MODE_BACKGROUND_BEGIN)
+        else:
+            os.nice(19)
+    except Exception as e:
+        logging.warning(f"Could not lower process priority: {e}")
+
+
+class Throttle:
+    """
+    Duty-cycle limiter called between chunks/segments: after working for t seconds
+    it sleeps t * (1 - duty) / duty, so on average only `duty` of a core is used.
+
+    Also usable as a should_stop callback; returns True once the job is cancelled.
+    """
+
+    def __init__(self, duty_cycle=DEFAULT_DUTY_CYCLE, cancel_event=None):
+        self.duty_cycle = max(0.01, min(1.0, duty_cycle))
+        self.cancel_event = cancel_event
+        self._resumed = time.monotonic()
+
+    def __call__(self, *_):
+        worked = time.monotonic() - self._resumed
+        pause = worked * (1 - self.duty_cycle) / self.duty_cycle
+        if self.cancel_event is not None:
+            if self.cancel_event.wait(pause):
+                return True
+        elif pause > 0:
+            time.sleep(pause)
+        self._resumed = time.monotonic()
+        return False
+
+
+def index_file(path, models=(), language=None, duty_cycle=DEFAULT_DUTY_CYCLE, cancel_event=None):
+    """
+    Compute and cache the envelope, waveform pyramid and requested transcripts of one media file
+
+    Returns:
+        Dict describing what was computed (or already cached)
+    """
+    summary = {'path': path, 'envelope': 'cached', 'waveform': 'cached', 'proxy': 'not needed', 'transcripts': {}}
+    throttle = Throttle(duty_cycle, cancel_event)
+
+    # Compressed media is decoded once into the shared 16 kHz proxy that the Whisper,
+    # VAD and batch engines read; envelopes stay at the native format for pydub parity
+    audio_path = path
+    if not pcm_reader.is_pcm_file(path):
+        proxy = proxy_cache.load_proxy(path)
+        summary['proxy'] = 'cached'
+        if proxy is None:
+            proxy = proxy_cache.build_proxy(path, whisper_jumpcut.RunControl(cancel_event=cancel_event))
+            if proxy is None:
+                raise job_scheduler.JobCancelled()
+            summary['proxy'] = 'computed'
+        audio_path = proxy.path
+
+    if analysis_cache.load_envelope(path) is None:
+        source = whisper_jumpcut.load_pcm_source(path)
+        envelope = loudness.compute_envelope(source, should_stop=throttle)
+        if len(envelope) < len(source):
+            raise job_scheduler.JobCancelled()
+        analysis_cache.save_envelope(path, envelope)
+        summary['envelope'] = 'computed'
+
+    if analysis_cache.load_pyramid(path) is None:
+        pyramid = waveform.build_pyramid(whisper_jumpcut.load_pcm_source(path), should_stop=throttle)
+        if pyramid is None:
+            raise job_scheduler.JobCancelled()
+        analysis_cache.save_pyramid(path, pyramid)
+        summary['waveform'] = 'computed'
+
+    for model_size in models:
+        if analysis_cache.load_transcript(path, model_size, language) is not None:
+            summary['transcripts'][model_size] = 'cached'
+            continue
+        control = whisper_jumpcut.RunControl(cancel_event=cancel_event)
+        # A cancelled or killed job continues from its last checkpoint next time
+        checkpoint = checkpoints.Checkpoint(path, {'model': model_size, 'language': language, 'engine': 'indexer'})
+        segments, duration = whisper_jumpcut.transcribe(audio_path, model_size, language, control,
+                                                        on_segment=throttle, cpu_threads=1, checkpoint=checkpoint)
+        if control.stopped:
+            raise job_scheduler.JobCancelled()
+        analysis_cache.save_transcript(path, model_size, language, segments, duration)
+        summary['transcripts'][model_size] = 'computed'
+
+    logging.info(f"Indexed {path}: {summary}")
+    return summary
+
+
+def iter_media(folders=(), paths=()):
+    """Media files from explicit paths and (recursively) from watched folders"""
+    for path in paths:
+        if os.path.isfile(path):
+            yield os.path.abspath(path)
+    for folder in folders:
+        for root, _, files in os.walk(folder):
+            for name in files:
+                if os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS and not name.startswith('.'):
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+class MediaIndexer:
+    """
+    Polls folders/paths and queues changed files as batch jobs on a JobScheduler.
+
+    A file is only queued once its size and modification time are unchanged between
+    two scans, so recordings and copies in progress are not analyzed half-written.
+    """
+
+    def __init__(self, folders=(), paths_file=None, models=(), language=None,
+                 duty_cycle=DEFAULT_DUTY_CYCLE, workers=1, scheduler=None):
+        self.folders = list(folders)
+        self.paths_file = paths_file
+        self.models = list(models)
+        self.language = language
+        self.duty_cycle = duty_cycle
+        self.scheduler = scheduler or job_scheduler.JobScheduler(max_workers=workers, supersede_running=True)
+        self._seen = {}
+        self._indexed = {}
+
+    def _paths(self):
+        if not self.paths_file or not os.path.exists(self.paths_file):
+            return []
+        with open(self.paths_file, 'r', encoding='utf-8') as f:
+            return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+    def scan(self):
+        """One polling pass; returns the jobs queued for new or changed files"""
+        jobs = []
+        current = {}
+        for path in iter_media(self.folders, self._paths()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            current[path] = state
+            stable = self._seen.get(path) == state
+            if stable and self._indexed.get(path) != state:
+                self._indexed[path] = state
+                jobs.append(self.scheduler.submit(path, index_file, path, models=self.models,
+                                                  language=self.language, duty_cycle=self.duty_cycle,
+                                                  priority=job_scheduler.PRIORITY_BATCH))
+        self._seen = current
+        return jobs
+
+    def run(self, interval=DEFAULT_SCAN_INTERVAL, once=False):
+        """Scan forever (or until everything found is indexed, with once=True)"""
+        self.scan()
+        while True:
+            if once:
+                # The first scan only records sizes; the second queues stable files
+                jobs = self.scan()
+                for job in jobs:
+                    job.wait()
+                return jobs
+            time.sleep(interval)
+            self.scan()
+            logging.debug(f"Indexer queue: {self.scheduler.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-analyze project media in the background')
+    parser.add_argument("--watch", nargs='*', default=[], help="Media folders to watch (recursively)")
+    parser.add_argument("--paths-file", default=None,
+                       help="Text file with one project media path per line (re-read every scan)")
+    parser.add_argument("--models", nargs='*', default=[],
+                       choices=["tiny", "base", "small", "medium", "large"],
+                       help="Whisper models to pre-transcribe with (envelopes are always computed)")
+    parser.add_argument("--language", default=None, help="Language code (auto-detect if None)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_SCAN_INTERVAL, help="Seconds between scans")
+    parser.add_argument("--duty-cycle", type=float, default=DEFAULT_DUTY_CYCLE,
+                       help="Fraction of a core to use while indexing (0-1)")
+    parser.add_argument("--workers", type=int, default=1, help="Files analyzed in parallel")
+    parser.add_argument("--once", action="store_true", help="Index what is there now and exit")
+
+    args = parser.parse_args()
+    if not args.watch and not args.paths_file:
+        parser.error("give at least one --watch folder or a --paths-file")
+
+    lower_priority()
+    indexer = MediaIndexer(args.watch, args.paths_file, args.models, args.language,
+                           args.duty_cycle, args.workers)
+    try:
+        jobs = indexer.run(args.interval, once=args.once)
+        if args.once:
+            print(json.dumps({'indexed': [job.result for job in jobs if job.result],
+                              'failed': [job.key for job in jobs if job.state == job_scheduler.FAILED],
+                              'queue': indexer.scheduler.stats()}))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        indexer.scheduler.shutdown(wait=True, cancel_running=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Memory budget planning and peak-RSS reporting for the analysis scripts
+Picks the decode chunk size, analysis sample rate and Whisper model that fit a
+memory budget, and records how much each stage of a run allocated
+"""
+
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+
+import loudness
+
+MB = 1024 * 1024
+
+# Resident size of a loaded faster-whisper model (CPU, int8) including its working set
+MODEL_MEMORY_MB = {
+    'tiny': 150,
+    'base': 250,
+    'small': 600,
+    'medium': 1600,
+    'large': 3300,
+}
+MODEL_ORDER = ['tiny', 'base', 'small', 'medium', 'large']
+
+# Whisper keeps the whole clip as 16 kHz float32 samples
+WHISPER_RATE = 16000
+WHISPER_BYTES_PER_SECOND = WHISPER_RATE * 4
+
+# Share of the budget the loudness pass may use as scratch per chunk
+CHUNK_SHARE = 0.125
+MIN_CHUNK_MS = 1000
+# Scratch arrays alive per sample while a chunk is squared and summed (8-byte values)
+CHUNK_BYTES_PER_SAMPLE = 8 * 3
+
+# Decoding compressed media in memory costs at most this share of the budget;
+# longer clips are extracted to a temporary WAV at the analysis rate and memory-mapped
+DECODE_SHARE = 0.5
+DECODE_BYTES_PER_SAMPLE = 2
+# Assumed for media whose duration cannot be probed
+DEFAULT_DURATION = 3600
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if unknown"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None if unknown"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return getattr(psutil.Process().memory_info(), 'peak_wset', None)
+    except ImportError:
+        return None
+
+
+def _mb(value):
+    return None if value is None else round(value / MB, 1)
+
+
+class MemoryTracker:
+    """
+    Per-stage allocation figures for one run.
+
+    Every stage records the peak of memory allocated through Python and NumPy while
+    it ran (tracemalloc), the change in RSS and its duration.
+    """
+
+    def __init__(self, budget_mb=None):
+        self.budget_mb = budget_mb
+        self.stages = []
+        self.plan = {}
+        self.start_rss = current_rss()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        rss_before = current_rss()
+        tracemalloc.reset_peak()
+        traced_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            rss_after = current_rss()
+            self.stages.append({
+                'stage': name,
+                'allocatedPeakMB': _mb(max(0, traced_peak - traced_before)),
+                'rssDeltaMB': _mb(rss_after - rss_before) if None not in (rss_before, rss_after) else None,
+                'seconds': round(time.perf_counter() - started, 3),
+            })
+
+    def report(self):
+        """Figures for the JSON output"""
+        peak = peak_rss()
+        report = {'budgetMB': self.budget_mb, 'peakRssMB': _mb(peak), 'stages': self.stages}
+        if self.plan:
+            report['plan'] = self.plan
+        if self.budget_mb is not None and peak is not None:
+            report['withinBudget'] = peak <= self.budget_mb * MB
+        return report
+
+
+def chunk_ms_for(budget_bytes, frame_rate, channels):
+    """Largest loudness chunk (ms) whose scratch arrays fit in CHUNK_SHARE of the budget"""
+    bytes_per_ms = frame_rate / 1000.0 * channels * CHUNK_BYTES_PER_SAMPLE
+    chunk = int(budget_bytes * CHUNK_SHARE / bytes_per_ms)
+    return max(MIN_CHUNK_MS, min(loudness.CHUNK_MS, chunk))
+
+
+def plan_run(budget_mb, method, model_size, duration=None, frame_rate=48000, channels=2, compressed=True):
+    """
+    Choose execution settings that keep a run within budget_mb.
+
+    Args:
+        budget_mb: Memory the whole process may use (MB)
+        method: Detection method ("whisper", "vad" or "loudness")
+        model_size: Whisper model the user asked for; a smaller one is picked if it does not fit
+        duration: Media duration in seconds (None if unknown)
+        frame_rate, channels: Source format, for decode and chunk sizes
+        compressed: Whether the source must be decoded (not memory-mappable PCM)
+
+    Returns:
+        Dict with chunkMs, decodeToDisk, analysisRate (None = native rate) and, for
+        Whisper, model plus whether the request was downgraded. jumpcut.py decodes at
+        analysisRate; whisper_jumpcut.py decodes to disk through the 16 kHz proxy
+    """
+    budget = budget_mb * MB
+    available = max(0, budget - (current_rss() or 0))
+    duration = duration or DEFAULT_DURATION
+
+    plan = {'chunkMs': chunk_ms_for(available, frame_rate, channels), 'decodeToDisk': False, 'analysisRate': None}
+
+    if compressed:
+        decoded = duration * frame_rate * channels * DECODE_BYTES_PER_SAMPLE
+        if decoded > available * DECODE_SHARE:
+            plan['decodeToDisk'] = True
+            plan['analysisRate'] = WHISPER_RATE if method == 'whisper' else min(frame_rate, 16000)
+
+    if method == 'whisper':
+        audio_mb = duration * WHISPER_BYTES_PER_SECOND / MB
+        requested = model_size if model_size in MODEL_ORDER else 'base'
+        candidates = MODEL_ORDER[:MODEL_ORDER.index(requested) + 1]
+        fitting = [m for m in candidates if MODEL_MEMORY_MB[m] + audio_mb <= available / MB]
+        plan['model'] = fitting[-1] if fitting else 'tiny'
+        plan['modelDowngraded'] = plan['model'] != requested
+        plan['overBudget'] = not fitting
+    return plan
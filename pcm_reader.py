@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Zero-copy reader for uncompressed WAV/AIFF sources
+Parses the RIFF/RF64/AIFF header and exposes the PCM payload as a numpy.memmap view,
+so loudness analysis can run straight from the page cache without decoding or copying
+"""
+
+import os
+import struct
+
+import numpy as np
+
+PCM_EXTENSIONS = ['.wav', '.wave', '.bwf', '.rf64', '.aif', '.aiff', '.aifc']
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class PCMSource:
+    """
+    A window of frames over a memory-mapped PCM payload.
+
+    Sample values are exposed the same way pydub would hold them after loading the
+    file (8-bit WAV re-biased to signed, 24-bit widened to 32-bit), so results from
+    this reader line up with AudioSegment-based analysis.
+    """
+
+    def __init__(self, path, frame_rate, channels, sample_width, data_offset,
+                 frame_count, big_endian=False, unsigned_8bit=False,
+                 start_frame=0, stop_frame=None):
+        self.path = path
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sample_width = sample_width
+        self.data_offset = data_offset
+        self.total_frames = frame_count
+        self.big_endian = big_endian
+        self.unsigned_8bit = unsigned_8bit
+        self.start_frame = start_frame
+        self.stop_frame = frame_count if stop_frame is None else stop_frame
+        self._memmap = None
+
+    @property
+    def frame_count(self):
+        return self.stop_frame - self.start_frame
+
+    @property
+    def max_possible_amplitude(self):
+        # 24-bit audio is widened to 32-bit on read, same as pydub
+        bits = (4 if self.sample_width == 3 else self.sample_width) * 8
+        return (2 ** bits) / 2
+
+    def __len__(self):
+        """Length in milliseconds, rounded the same way as AudioSegment"""
+        return round(1000 * (self.frame_count / self.frame_rate))
+
+    def _storage(self):
+        """Lazily map the whole data chunk; every window shares this one mapping"""
+        if self._memmap is None:
+            if self.sample_width == 3:
+                dtype, shape = np.uint8, (self.total_frames, self.channels, 3)
+            else:
+                order = '>' if self.big_endian else '<'
+                if self.sample_width == 1:
+                    kind = 'u1' if self.unsigned_8bit else 'i1'
+                else:
+                    kind = 'i%d' % self.sample_width
+                dtype, shape = np.dtype(order + kind), (self.total_frames, self.channels)
+            if self.total_frames == 0:
+                self._memmap = np.zeros(shape, dtype=dtype)
+            else:
+                self._memmap = np.memmap(self.path, dtype=dtype, mode='r',
+                                         offset=self.data_offset, shape=shape)
+        return self._memmap
+
+    def window(self, in_ms=None, out_ms=None):
+        """
+        Return a sub-range of this source without touching the audio data.
+
+        Millisecond positions are converted to frames with pydub's slicing
+        arithmetic, so `source.window(a, b)` covers the same frames as `audio[a:b]`.
+        """
+        length = len(self)
+        start_ms = 0 if in_ms is None else min(in_ms, length)
+        end_ms = length if out_ms is None else min(out_ms, length)
+        start = self.start_frame + int(start_ms * (self.frame_rate / 1000.0))
+        stop = self.start_frame + int(end_ms * (self.frame_rate / 1000.0))
+        stop = max(start, min(stop, self.stop_frame))
+
+        view = PCMSource(self.path, self.frame_rate, self.channels, self.sample_width,
+                         self.data_offset, self.total_frames, self.big_endian,
+                         self.unsigned_8bit, start, stop)
+        view._memmap = self._storage()
+        return view
+
+    def raw(self, start=0, stop=None):
+        """Memory-mapped frames [start, stop) of this window in their on-disk layout"""
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        return self._storage()[self.start_frame + start:self.start_frame + stop]
+
+    def read(self, start=0, stop=None):
+        """
+        Frames [start, stop) of this window as a (frames, channels) integer array.
+
+        16/32-bit little-endian data is returned as a view of the mapping; other
+        layouts are converted for just the requested range.
+        """
+        raw = self.raw(start, stop)
+        if self.sample_width == 3:
+            b = raw.astype(np.int32)
+            if self.big_endian:
+                b = b[..., ::-1]
+            # pydub pads the low byte with the sign, keep that for identical RMS values
+            pad = np.where(b[..., 2] > 0x7f, 0xff, 0)
+            return (b[..., 2] << 24) | (b[..., 1] << 16) | (b[..., 0] << 8) | pad
+        if self.sample_width == 1 and self.unsigned_8bit:
+            return raw.astype(np.int16) - 128
+        return raw
+
+
+def wrap_audio_segment(audio):
+    """Expose an already decoded pydub AudioSegment through the PCMSource interface without copying"""
+    dtype = 'i1' if audio.sample_width == 1 else '<i%d' % audio.sample_width
+    samples = np.frombuffer(audio.raw_data, dtype=dtype).reshape(-1, audio.channels)
+    source = PCMSource(None, audio.frame_rate, audio.channels, audio.sample_width, 0, len(samples))
+    source._memmap = samples
+    return source
+
+
+def is_pcm_file(path):
+    """Cheap extension check used to decide whether the memmap fast path is worth trying"""
+    return os.path.splitext(path)[1].lower() in PCM_EXTENSIONS
+
+
+def open_pcm(path, growing=False):
+    """
+    Parse a WAV (RIFF/RF64) or AIFF/AIFC header and return a PCMSource.
+
+    With growing=True a file still being recorded is read up to its current size even
+    though recorders only write the real data size when they stop (the header holds 0
+    or 0xFFFFFFFF until then).
+
+    Raises ValueError for compressed or otherwise unsupported payloads so the caller
+    can fall back to decoding through ffmpeg.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        if len(header) < 12:
+            raise ValueError(f"File too short to be PCM audio: {path}")
+        if header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE':
+            params = _parse_wave(f, header[:4] == b'RF64')
+        elif header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+            params = _parse_aiff(f, header[8:12] == b'AIFC')
+        else:
+            raise ValueError(f"Not a WAV or AIFF file: {path}")
+
+    frame_rate, channels, sample_width, data_offset, data_size = params[:5]
+    if sample_width not in (1, 2, 3, 4) or channels < 1 or frame_rate <= 0:
+        raise ValueError(f"Unsupported PCM layout: {sample_width * 8}-bit, {channels} channels")
+
+    # Clamp to what is actually on disk (truncated exports, files still being written)
+    frame_width = sample_width * channels
+    available = max(0, os.path.getsize(path) - data_offset)
+    if growing and data_size in (0, 0xFFFFFFFF):
+        data_size = available
+    frame_count = min(data_size, available) // frame_width
+
+    return PCMSource(path, frame_rate, channels, sample_width, data_offset, frame_count,
+                     big_endian=params[5], unsigned_8bit=params[6])
+
+
+def _iter_chunks(f, endian, pad):
+    """Yield (chunk_id, size, offset_of_payload) for every chunk after the file header"""
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            return
+        chunk_id = chunk_header[:4]
+        size = struct.unpack(endian + 'I', chunk_header[4:])[0]
+        offset = f.tell()
+        yield chunk_id, size, offset
+        f.seek(offset + size + (size & 1 if pad else 0))
+
+
+def _parse_wave(f, rf64):
+    fmt = None
+    data_offset = data_size = None
+    ds64_data_size = None
+
+    for chunk_id, size, offset in _iter_chunks(f, '<', pad=True):
+        if chunk_id == b'ds64':
+            ds64_data_size = struct.unpack('<QQQ', f.read(24))[1]
+        elif chunk_id == b'fmt ':
+            fmt = f.read(size)
+        elif chunk_id == b'data':
+            data_offset = offset
+            data_size = size
+            if (rf64 or size == 0xFFFFFFFF) and ds64_data_size is not None:
+                data_size = ds64_data_size
+            break
+
+    if fmt is None or data_offset is None:
+        raise ValueError("WAV file is missing its fmt or data chunk")
+
+    audio_format, channels, frame_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+    if audio_format == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        audio_format = struct.unpack('<H', fmt[24:26])[0]
+    if audio_format != WAVE_FORMAT_PCM:
+        raise ValueError(f"Unsupported WAV encoding 0x{audio_format:04x}")
+    if block_align != channels * ((bits + 7) // 8):
+        raise ValueError("Unsupported WAV block alignment")
+
+    return frame_rate, channels, (bits + 7) // 8, data_offset, data_size, False, bits <= 8
+
+
+def _parse_aiff(f, aifc):
+    comm = None
+    data_offset = data_size = None
+
+    for chunk_id, size, offset in _iter_chunks(f, '>', pad=True):
+        if chunk_id == b'COMM':
+            comm = f.read(size)
+        elif chunk_id == b'SSND':
+            block_offset = struct.unpack('>II', f.read(8))[0]
+            data_offset = offset + 8 + block_offset
+            data_size = size - 8 - block_offset
+        if comm is not None and data_offset is not None:
+            break
+
+    if comm is None or data_offset is None:
+        raise ValueError("AIFF file is missing its COMM or SSND chunk")
+
+    channels, _, bits = struct.unpack('>hIh', comm[:8])
+    frame_rate = _extended_to_float(comm[8:18])
+    big_endian = True
+    if aifc:
+        compression = comm[18:22]
+        if compression == b'sowt':
+            big_endian = False
+        elif compression != b'NONE':
+            raise ValueError(f"Unsupported AIFC compression {compression!r}")
+
+    return int(frame_rate), channels, (bits + 7) // 8, data_offset, data_size, big_endian, False
+
+
+def _extended_to_float(data):
+    """Decode the 80-bit IEEE 754 extended sample rate stored in AIFF COMM chunks"""
+    exponent, mantissa = struct.unpack('>HQ', data)
+    sign = -1 if exponent & 0x8000 else 1
+    exponent &= 0x7FFF
+    if exponent == 0 and mantissa == 0:
+        return 0.0
+    return sign * mantissa * 2.0 ** (exponent - 16383 - 63)
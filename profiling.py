@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Profiling mode for production runs (--profile)
+Wraps a run in cProfile and tracemalloc and bundles the pstats file, a hotspot
+summary, per-stage memory snapshots and the run's log into one zip archive next to
+the log, ready to attach to a ticket. Nothing here is imported unless --profile is given
+"""
+
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+# Functions listed in the hotspot summary
+TOP_FUNCTIONS = 40
+# Allocation sites listed per memory snapshot
+TOP_ALLOCATIONS = 25
+# Frames kept per allocation traceback
+TRACEBACK_FRAMES = 10
+
+
+class Profiler:
+    """
+    cProfile + tracemalloc for one run.
+
+    Call start() first; every stage(name) records its duration and a memory snapshot,
+    and finish() writes the archive.
+    """
+
+    def __init__(self, log_path, argv=None):
+        self.log_path = os.path.abspath(log_path)
+        self.argv = list(sys.argv if argv is None else argv)
+        self.directory = tempfile.mkdtemp(prefix='jumpcut-profile-')
+        self.profile = cProfile.Profile()
+        self.stages = []
+        self.started = None
+
+    def start(self):
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() < TRACEBACK_FRAMES:
+            # Started by memory_budget.MemoryTracker with one frame; no stage has run yet, so
+            # restarting loses nothing it measures
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+        self.started = time.perf_counter()
+        self.profile.enable()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            # Keep the snapshot's own cost out of the hotspots
+            self.profile.disable()
+            index = len(self.stages)
+            snapshot = tracemalloc.take_snapshot()
+            snapshot.dump(os.path.join(self.directory, f"memory-{index:02d}-{name}.snapshot"))
+            with open(os.path.join(self.directory, f"memory-{index:02d}-{name}.txt"), 'w') as f:
+                f.write(f"Stage {name}: {seconds:.3f} s, traced {tracemalloc.get_traced_memory()[0] / 2**20:.1f} MB "
+                        f"(peak {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MB)\n\n")
+                for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                    f.write(f"{stat}\n")
+            self.stages.append((name, seconds))
+            self.profile.enable()
+
+    def _summary(self, elapsed):
+        stream = io.StringIO()
+        stream.write(f"Command: {' '.join(self.argv)}\n")
+        stream.write(f"Wall time: {elapsed:.3f} s\n\n")
+        stream.write("Stages:\n")
+        for name, seconds in self.stages:
+            stream.write(f"  {name:<12} {seconds:9.3f} s\n")
+        for sort in ('cumulative', 'tottime'):
+            stream.write(f"\nTop {TOP_FUNCTIONS} functions by {sort}:\n")
+            pstats.Stats(self.profile, stream=stream).strip_dirs().sort_stats(sort).print_stats(TOP_FUNCTIONS)
+        return stream.getvalue()
+
+    def finish(self):
+        """
+        Stop profiling and write the archive.
+
+        Returns:
+            Path of the zip archive (next to the log file)
+        """
+        self.profile.disable()
+        elapsed = time.perf_counter() - self.started if self.started else 0.0
+        self.profile.dump_stats(os.path.join(self.directory, 'profile.pstats'))
+        with open(os.path.join(self.directory, 'hotspots.txt'), 'w') as f:
+            f.write(self._summary(elapsed))
+
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+        stem = os.path.splitext(self.log_path)[0]
+        archive = f"{stem}-profile-{time.strftime('%Y%m%d-%H%M%S')}.zip"
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as bundle:
+            for name in sorted(os.listdir(self.directory)):
+                bundle.write(os.path.join(self.directory, name), name)
+            if os.path.exists(self.log_path):
+                bundle.write(self.log_path, os.path.basename(self.log_path))
+        shutil.rmtree(self.directory, ignore_errors=True)
+        logging.info(f"Profile written to {archive}")
+        return archive
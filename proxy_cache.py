@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Normalized audio proxies shared by the engines
+Container demuxing and decoding of compressed media happen once per file: the audio
+is stored as a 16 kHz mono 16-bit WAV in the analysis cache, keyed by the media
+fingerprint, with a small JSON index next to it. The Whisper extraction step, the
+pipelined decoder and batch analysis then read the proxy through the memory-mapped
+PCM reader instead of running ffmpeg again
+"""
+
+import json
+import logging
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+import analysis_cache
+import decoders
+import pcm_reader
+
+PROXY_RATE = 16000
+
+# Proxies are about 115 MB per hour; the least recently used ones beyond this are removed
+MAX_PROXY_MB = float(os.environ.get('OPENJUMPCUT_PROXY_MB', 20000))
+
+# Frames converted per step when building from an uncompressed source
+BUILD_CHUNK_SECONDS = 30
+
+
+def _entries(path, cache_dir=None):
+    return analysis_cache._entry(path, 'proxy.wav', cache_dir), analysis_cache._entry(path, 'proxy.json', cache_dir)
+
+
+def load_proxy(path, cache_dir=None):
+    """Memory-mapped PCMSource of the cached proxy, or None"""
+    try:
+        proxy_path, index_path = _entries(path, cache_dir)
+        if not os.path.exists(index_path):
+            return None
+        with open(index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if os.path.getsize(proxy_path) != index['bytes']:
+            return None
+        source = pcm_reader.open_pcm(proxy_path)
+        # Reading counts as use for the least recently used clean-up
+        os.utime(index_path)
+        return source
+    except Exception as e:
+        logging.debug(f"Proxy cache miss for {path}: {e}")
+        return None
+
+
+def _write_wav(f, chunks):
+    """Write 16 kHz mono int16 chunks to an open file as a WAV; returns the frame count"""
+    frames = 0
+    with wave.open(f, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(PROXY_RATE)
+        for chunk in chunks:
+            w.writeframes(chunk.astype('<i2').tobytes())
+            frames += len(chunk)
+    return frames
+
+
+def _pcm_chunks(path):
+    """16 kHz mono int16 chunks of an uncompressed source, converted with NumPy"""
+    import transcribe_pipeline
+
+    source = pcm_reader.open_pcm(path)
+    step = BUILD_CHUNK_SECONDS * source.frame_rate
+    for f0 in range(0, source.frame_count, step):
+        samples = transcribe_pipeline.whisper_audio(source, f0, min(f0 + step, source.frame_count))
+        yield np.clip(np.round(samples * 32768.0), -32768, 32767)
+
+
+def build_proxy(path, control=None, cache_dir=None):
+    """
+    Decode a media file into its proxy (replacing any previous one)
+
+    Returns:
+        The proxy as a PCMSource, or None if the run was stopped while decoding
+
+    Raises:
+        Exception: If the file cannot be decoded
+    """
+    if control is None:
+        import whisper_jumpcut
+        control = whisper_jumpcut.RunControl()
+    proxy_path, index_path = _entries(path, cache_dir)
+    os.makedirs(os.path.dirname(proxy_path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(proxy_path), suffix='.tmp')
+    os.close(fd)
+    try:
+        if pcm_reader.is_pcm_file(path):
+            with open(temp_path, 'wb') as f:
+                _write_wav(f, _pcm_chunks(path))
+        else:
+            # PyAV in-process when available, else an ffmpeg subprocess
+            chunks = decoders.decode_chunks(path, rate=PROXY_RATE, channels=1, control=control)
+            with open(temp_path, 'wb') as f:
+                _write_wav(f, (chunk.reshape(-1) for chunk in chunks))
+            if control.stopped:
+                return None
+        frames = pcm_reader.open_pcm(temp_path).frame_count
+        os.replace(temp_path, proxy_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    index = {'source': os.path.abspath(path), 'frameRate': PROXY_RATE, 'channels': 1, 'sampleWidth': 2,
+             'frames': frames, 'bytes': os.path.getsize(proxy_path)}
+    analysis_cache._atomic_write(index_path, lambda f: f.write(json.dumps(index).encode('utf-8')))
+    prune(cache_dir)
+    return pcm_reader.open_pcm(proxy_path)
+
+
+def ensure_proxy(path, control=None, cache_dir=None):
+    """The cached proxy of a media file, decoding it first on a miss"""
+    proxy = load_proxy(path, cache_dir)
+    if proxy is None:
+        print("Decoding audio proxy...")
+        proxy = build_proxy(path, control, cache_dir)
+    return proxy
+
+
+def write_window(proxy, in_ms, out_ms, target):
+    """Copy the in/out range (ms) of a proxy to a WAV file, without decoding"""
+    window = proxy.window(in_ms, out_ms)
+    step = BUILD_CHUNK_SECONDS * PROXY_RATE
+    chunks = (window.read(f0, min(f0 + step, window.frame_count)).reshape(-1)
+              for f0 in range(0, window.frame_count, step))
+    with open(target, 'wb') as f:
+        _write_wav(f, chunks)
+
+
+def prune(cache_dir=None, max_mb=None):
+    """Remove the least recently used proxies until they fit in max_mb"""
+    directory = cache_dir or analysis_cache.CACHE_DIR
+    limit = (MAX_PROXY_MB if max_mb is None else max_mb) * 1024 * 1024
+    proxies = []
+    for name in os.listdir(directory):
+        if name.endswith('.proxy.json'):
+            index_path = os.path.join(directory, name)
+            proxy_path = index_path[:-len('.json')] + '.wav'
+            try:
+                proxies.append((os.path.getmtime(index_path), index_path, proxy_path,
+                                os.path.getsize(proxy_path)))
+            except OSError:
+                continue
+    total = sum(entry[3] for entry in proxies)
+    for _, index_path, proxy_path, size in sorted(proxies):
+        if total <= limit:
+            break
+        for entry in (index_path, proxy_path):
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+        total -= size
+        logging.debug(f"Removed audio proxy {proxy_path}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Two-phase results: a quick preview, then the refined cuts
+The preview runs a cheap analysis (loudness, or the tiny Whisper model on the 16 kHz
+audio) under a latency deadline and is printed at once; the chosen method then runs
+to completion and only the silences that differ from the preview are sent
+"""
+
+import json
+import logging
+
+import whisper_jumpcut
+
+PREVIEW_MODES = ('loudness', 'tiny')
+# Seconds the preview may take; whatever it found by then is shown
+PREVIEW_LATENCY = 3.0
+
+
+def preview_params(jumpcut_params, mode):
+    """Parameters of the preview analysis"""
+    params = dict(jumpcut_params)
+    if mode == 'tiny' and params.get('method') == 'whisper':
+        params['model'] = 'tiny'
+    else:
+        params['method'] = 'loudness'
+    return params
+
+
+def _key(interval):
+    return round(interval[0], 3), round(interval[1], 3)
+
+
+def diff_silences(before, after):
+    """
+    Silences (without the trailing clip start flag) added and removed between two results
+
+    Returns:
+        {'added': [...], 'removed': [...]}
+    """
+    old = {_key(s) for s in before}
+    new = {_key(s) for s in after}
+    return {'added': [s for s in after if _key(s) not in old],
+            'removed': [s for s in before if _key(s) not in new]}
+
+
+def apply_changes(silences, changes, flag):
+    """Final silence list (with its flag) from the preview's list and the changes"""
+    removed = {_key(s) for s in changes['removed']}
+    kept = [s for s in silences if _key(s) not in removed]
+    return sorted(kept + changes['added']) + [flag]
+
+
+def two_phase(file_path, jumpcut_params, control, mode='loudness', latency=PREVIEW_LATENCY, emit=None):
+    """
+    Preview, then refine, one analysis
+
+    Args:
+        mode: 'loudness' or 'tiny' (falls back to loudness for the VAD and loudness methods)
+        latency: Seconds the preview may take
+        emit: Called with the preview result as soon as it is ready; prints a JSON line
+            by default
+
+    Returns:
+        (result, silences): the refined result and its full silence list. Unless either
+        phase failed, the result's silences are replaced by 'changes' against the
+        preview and the clip start 'flag'; 'phase' is 'final'
+    """
+    emit = emit or (lambda result: print(json.dumps(result), flush=True))
+
+    preview = whisper_jumpcut.analyze(file_path, preview_params(jumpcut_params, mode), control.child(latency),
+                                      resumable=False)
+    preview['phase'] = 'preview'
+    emit(preview)
+    logging.debug(f"Preview: {len(preview.get('silences', [])) - 1} silences, partial={preview.get('partial', False)}")
+
+    final = whisper_jumpcut.analyze(file_path, jumpcut_params, control)
+    final['phase'] = 'final'
+    if 'error' in preview or 'error' in final:
+        return final, final.get('silences')
+    silences = final.pop('silences')
+    final['changes'] = diff_silences(preview['silences'][:-1], silences[:-1])
+    final['flag'] = silences[-1]
+    return final, silences
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Headless jump-cut rendering
+Turns the silences found by the engines into the ranges to keep and writes the
+jump-cut media with a single ffmpeg run, without going through Premiere: stream copy
+through the concat demuxer when every kept range starts on a keyframe, otherwise one
+filter_complex (trim/atrim + concat, or select/aselect for long cut lists) re-encode
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import os
+import sys
+import tempfile
+
+# Kept ranges shorter than this are dropped (s); they would only produce glitches
+MIN_RANGE = 0.02
+
+# A range may start this far from a keyframe and still be stream-copied (s)
+KEYFRAME_TOLERANCE = 0.02
+
+# Above this many ranges a single select/aselect filter replaces the trim + concat
+# chains, which keep one filter (and its frame queue) alive per range
+MAX_CONCAT_SEGMENTS = 64
+
+# Codecs used when the cuts must be re-encoded
+VIDEO_ENCODE_ARGS = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '18', '-pix_fmt', 'yuv420p']
+AUDIO_ENCODE_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+RENDER_MODES = ['auto', 'copy', 'encode']
+
+
+def kept_ranges(silences, in_point=0.0, out_point=None, start=0.0):
+    """
+    Ranges of the source media to keep, in media seconds.
+
+    Args:
+        silences: Engine output ([[start, end], ..., flag]) in timeline seconds
+        in_point, out_point: Clip in/out points in media seconds (out_point None or 0
+            for the end of the media, then the last range stays open-ended as None)
+        start: Timeline position of the clip, as passed to the engine
+
+    Returns:
+        [[start, end], ...] sorted and non-overlapping
+    """
+    offset = in_point - start
+    end = out_point or None
+    ranges = []
+    cursor = in_point
+    for silence in sorted(s for s in silences if isinstance(s, (list, tuple))):
+        cut_start, cut_end = silence[0] + offset, silence[1] + offset
+        if end is not None:
+            cut_start, cut_end = min(cut_start, end), min(cut_end, end)
+        if cut_start - cursor >= MIN_RANGE:
+            ranges.append([round(cursor, 6), round(cut_start, 6)])
+        cursor = max(cursor, cut_end)
+    if end is None or end - cursor >= MIN_RANGE:
+        ranges.append([round(cursor, 6), None if end is None else round(end, 6)])
+    return ranges
+
+
+def probe_streams(media_path, control):
+    """Stream types of a media file ('video', 'audio', ...) from ffprobe"""
+    result = control.run(['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type',
+                          '-of', 'csv=p=0', media_path])
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+    return [line.strip() for line in result.stdout.splitlines() if line.strip()]
+
+
+def probe_keyframes(media_path, control):
+    """Sorted keyframe times (s) of the first video stream, read from packet flags (no decoding)"""
+    result = control.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                          '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', media_path])
+    if result.returncode != 0:
+        raise Exception(f"ffprobe failed: {result.stderr.strip()}")
+    keyframes = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) >= 2 and 'K' in fields[1] and fields[0] not in ('', 'N/A'):
+            keyframes.append(float(fields[0]))
+    return sorted(keyframes)
+
+
+def starts_on_keyframes(ranges, keyframes, tolerance=KEYFRAME_TOLERANCE):
+    """Whether every range starts within tolerance of a keyframe"""
+    if not keyframes:
+        return False
+    for range_start, _ in ranges:
+        i = bisect.bisect_left(keyframes, range_start)
+        nearest = min(abs(keyframes[j] - range_start) for j in (i - 1, i) if 0 <= j < len(keyframes))
+        if nearest > tolerance:
+            return False
+    return True
+
+
+def _between(ranges):
+    return '+'.join(f"between(t,{a},{b})" if b is not None else f"gte(t,{a})" for a, b in ranges)
+
+
+def filter_graph(ranges, video=True, audio=True):
+    """
+    filter_complex joining the ranges of input 0 into [outv]/[outa]
+
+    Up to MAX_CONCAT_SEGMENTS ranges are trimmed and concatenated; longer lists use
+    select/aselect, one filter per stream whatever the number of cuts.
+    """
+    if len(ranges) > MAX_CONCAT_SEGMENTS:
+        chains = []
+        if video:
+            chains.append(f"[0:v]select='{_between(ranges)}',setpts=N/FRAME_RATE/TB[outv]")
+        if audio:
+            chains.append(f"[0:a]aselect='{_between(ranges)}',asetpts=N/SR/TB[outa]")
+        return ';'.join(chains)
+
+    chains, pads = [], []
+    for i, (a, b) in enumerate(ranges):
+        bounds = f"start={a}" + (f":end={b}" if b is not None else '')
+        if video:
+            chains.append(f"[0:v]trim={bounds},setpts=PTS-STARTPTS[v{i}]")
+            pads.append(f"[v{i}]")
+        if audio:
+            chains.append(f"[0:a]atrim={bounds},asetpts=PTS-STARTPTS[a{i}]")
+            pads.append(f"[a{i}]")
+    outputs = ('[outv]' if video else '') + ('[outa]' if audio else '')
+    chains.append(f"{''.join(pads)}concat=n={len(ranges)}:v={int(video)}:a={int(audio)}{outputs}")
+    return ';'.join(chains)
+
+
+def concat_list(media_path, ranges):
+    """concat demuxer script playing the ranges of one file back to back"""
+    quoted = os.path.abspath(media_path).replace("'", "'\\''")
+    lines = ['ffconcat version 1.0']
+    for a, b in ranges:
+        lines += [f"file '{quoted}'", f"inpoint {a}"]
+        if b is not None:
+            lines.append(f"outpoint {b}")
+    return '\n'.join(lines) + '\n'
+
+
+def render(media_path, output_path, ranges, mode='auto', control=None):
+    """
+    Write the kept ranges of media_path to output_path with one ffmpeg run.
+
+    Args:
+        media_path: Source media
+        output_path: Jump-cut output (container chosen by its extension)
+        ranges: Ranges to keep, from kept_ranges()
+        mode: 'copy' (stream copy, cuts snap to the keyframe before each range),
+            'encode' (frame-accurate re-encode) or 'auto' (copy only when every
+            range already starts on a keyframe)
+        control: Optional whisper_jumpcut.RunControl; stopping it kills ffmpeg
+
+    Returns:
+        Dict describing the render (output, mode, segments, keptSeconds)
+    """
+    if control is None:
+        import whisper_jumpcut
+        control = whisper_jumpcut.RunControl()
+    if not ranges:
+        raise ValueError("Nothing left to render: the whole clip is silent")
+
+    streams = probe_streams(media_path, control)
+    video, audio = 'video' in streams, 'audio' in streams
+    if not (video or audio):
+        raise ValueError(f"No audio or video streams in {media_path}")
+
+    if mode == 'auto':
+        # Audio alone re-encodes quickly and copying it would cut on packet boundaries
+        aligned = video and starts_on_keyframes(ranges, probe_keyframes(media_path, control))
+        mode = 'copy' if aligned else 'encode'
+
+    fd, script_path = tempfile.mkstemp(suffix='.txt', prefix='jumpcut-render-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            if mode == 'copy':
+                f.write(concat_list(media_path, ranges))
+            else:
+                f.write(filter_graph(ranges, video, audio))
+
+        if mode == 'copy':
+            cmd = ['ffmpeg', '-f', 'concat', '-safe', '0', '-i', script_path,
+                   '-map', '0', '-c', 'copy', '-avoid_negative_ts', 'make_zero']
+        else:
+            # The graph goes through a script file: hundreds of cuts overflow command lines on Windows
+            cmd = ['ffmpeg', '-i', media_path, '-filter_complex_script', script_path]
+            if video:
+                cmd += ['-map', '[outv]'] + VIDEO_ENCODE_ARGS
+            if audio:
+                cmd += ['-map', '[outa]'] + AUDIO_ENCODE_ARGS
+        cmd += [output_path, '-y']
+
+        print(f"Rendering {len(ranges)} segments ({mode})...")
+        result = control.run(cmd)
+        if control.stopped:
+            raise Exception(f"Render stopped: {control.reason}")
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg failed: {result.stderr[-2000:]}")
+    finally:
+        os.remove(script_path)
+
+    kept = sum(b - a for a, b in ranges if b is not None)
+    logging.info(f"Rendered {output_path}: {len(ranges)} segments, mode {mode}")
+    return {'output': output_path, 'mode': mode, 'segments': len(ranges), 'keptSeconds': round(kept, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render jump-cut media from engine output')
+    parser.add_argument("path", help="Source media")
+    parser.add_argument("output", help="Output media")
+    parser.add_argument("--silences", default='-',
+                       help="Engine JSON output (file, or - for stdin)")
+    parser.add_argument("--in", dest="in_point", type=float, default=0.0, help="Clip in point (s)")
+    parser.add_argument("--out", dest="out_point", type=float, default=None, help="Clip out point (s)")
+    parser.add_argument("--start", type=float, default=0.0, help="Timeline start passed to the engine (s)")
+    parser.add_argument("--mode", default="auto", choices=RENDER_MODES,
+                       help="Stream copy, re-encode, or copy when keyframes allow")
+    args = parser.parse_args()
+
+    text = sys.stdin.read() if args.silences == '-' else open(args.silences).read()
+    # Engines may print progress lines before the JSON
+    line = next((l for l in text.splitlines() if l.strip().startswith('{')), text)
+    silences = json.loads(line).get('silences', [])
+
+    try:
+        result = render(args.path, args.output, kept_ranges(silences, args.in_point, args.out_point, args.start),
+                        args.mode)
+    except Exception as e:
+        logging.error(f"Render failed: {e}")
+        result = {"error": str(e)}
+    print(json.dumps(result))
+    return 1 if 'error' in result else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Zero-copy PCM sharing with worker processes
+Decoded audio is placed once in a multiprocessing.shared_memory block (or a
+memory-mapped scratch file); workers receive a small picklable descriptor and build
+a PCMSource over the same memory instead of unpickling their own copy of the
+samples. Memory-mapped WAV/AIFF sources need no copy at all: every process maps the
+file itself
+"""
+
+import atexit
+import concurrent.futures
+import logging
+import os
+import tempfile
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import pcm_reader
+
+# Where a scratch file is used instead of shared memory (OPENJUMPCUT_SCRATCH or the temp dir)
+SCRATCH_DIR = os.environ.get('OPENJUMPCUT_SCRATCH', tempfile.gettempdir())
+SCRATCH_PREFIX = 'openjumpcut-pcm-'
+
+# kind is 'file' (the original WAV/AIFF), 'shm' or 'scratch'; name is a path or shared
+# memory block name and offset the byte offset of the samples in it
+PCMDescriptor = namedtuple('PCMDescriptor', ['kind', 'name', 'offset', 'dtype', 'frames', 'channels',
+                                             'frame_rate', 'sample_width', 'big_endian', 'unsigned_8bit',
+                                             'start_frame', 'stop_frame'])
+
+# Blocks attached by this (worker) process, kept open while views on them exist
+_attached = {}
+
+# Win32 constants for the process liveness check
+PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+ERROR_ACCESS_DENIED = 5
+STILL_ACTIVE = 259
+
+
+def _windows_pid_alive(pid):
+    # os.kill() would call TerminateProcess on Windows; ask for the exit code instead
+    import ctypes
+
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # Access denied means the process exists but belongs to someone else
+        return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+    try:
+        code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+            return True
+        return code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    if os.name == 'nt':
+        return _windows_pid_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def sweep_scratch(directory=None):
+    """Remove scratch files left behind by processes that no longer exist"""
+    directory = directory or SCRATCH_DIR
+    for name in os.listdir(directory):
+        if not name.startswith(SCRATCH_PREFIX):
+            continue
+        try:
+            pid = int(name[len(SCRATCH_PREFIX):].split('-')[0])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            try:
+                os.remove(os.path.join(directory, name))
+                logging.debug(f"Removed stale scratch file {name}")
+            except OSError:
+                pass
+
+
+class SharedPCM:
+    """
+    Owner of the shared copy of one source, used as a context manager.
+
+    The block (or scratch file) is removed by close(), which runs on leaving the
+    `with` block, at interpreter exit, and is not affected by workers crashing;
+    a killed owner's shared memory is reclaimed by the multiprocessing resource
+    tracker and its scratch file by the next sweep_scratch().
+    """
+
+    def __init__(self, source, scratch=False, scratch_dir=None):
+        """
+        Args:
+            source: PCMSource (memory-mapped file or decoded audio)
+            scratch: Use a memory-mapped scratch file instead of shared memory
+                (also the fallback when shared memory is too small)
+        """
+        self.source = source
+        self._shm = None
+        self._scratch_path = None
+        storage = source._storage()
+        layout = dict(frames=source.total_frames, channels=source.channels, frame_rate=source.frame_rate,
+                      sample_width=source.sample_width, big_endian=source.big_endian,
+                      unsigned_8bit=source.unsigned_8bit, start_frame=source.start_frame,
+                      stop_frame=source.stop_frame, dtype=storage.dtype.str)
+
+        if source.path is not None and isinstance(storage, np.memmap):
+            self.descriptor = PCMDescriptor('file', source.path, source.data_offset, **layout)
+            return
+
+        if not scratch:
+            try:
+                self._shm = shared_memory.SharedMemory(create=True, size=max(1, storage.nbytes))
+            except OSError as e:
+                logging.warning(f"Shared memory unavailable, using a scratch file: {e}")
+        if self._shm is not None:
+            np.ndarray(storage.shape, storage.dtype, buffer=self._shm.buf)[...] = storage
+            self.descriptor = PCMDescriptor('shm', self._shm.name, 0, **layout)
+        else:
+            directory = scratch_dir or SCRATCH_DIR
+            sweep_scratch(directory)
+            fd, self._scratch_path = tempfile.mkstemp(prefix=f"{SCRATCH_PREFIX}{os.getpid()}-", suffix='.raw',
+                                                      dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(np.ascontiguousarray(storage).tobytes())
+            self.descriptor = PCMDescriptor('scratch', self._scratch_path, 0, **layout)
+        atexit.register(self.close)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+            self._shm = None
+        if self._scratch_path is not None:
+            try:
+                os.remove(self._scratch_path)
+            except OSError:
+                pass
+            self._scratch_path = None
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach_shm(name):
+    """
+    Open a shared memory block once per process. Pool workers share the owner's
+    resource tracker, so attaching does not make a worker's exit remove the block.
+    """
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return _attached[name]
+
+
+def attach(descriptor, start_frame=None, stop_frame=None):
+    """
+    PCMSource over the shared samples of a descriptor (no copy)
+
+    Args:
+        start_frame, stop_frame: Optional sub-range, in frames of the descriptor's window
+    """
+    d = descriptor
+    source = pcm_reader.PCMSource(d.name if d.kind == 'file' else None, d.frame_rate, d.channels, d.sample_width,
+                                  d.offset, d.frames, d.big_endian, d.unsigned_8bit, d.start_frame, d.stop_frame)
+    dtype = np.dtype(d.dtype)
+    # 24-bit files are stored as bytes, three per sample
+    shape = (d.frames, d.channels, 3) if d.sample_width == 3 and dtype == np.uint8 else (d.frames, d.channels)
+    if d.kind == 'shm':
+        source._memmap = np.ndarray(shape, dtype, buffer=_attach_shm(d.name).buf, offset=d.offset)
+    elif d.kind == 'scratch':
+        source._memmap = (np.memmap(d.name, dtype=dtype, mode='r', offset=d.offset, shape=shape)
+                          if d.frames else np.zeros(shape, dtype))
+    if start_frame is not None or stop_frame is not None:
+        start = d.start_frame + (start_frame or 0)
+        stop = d.stop_frame if stop_frame is None else min(d.start_frame + stop_frame, d.stop_frame)
+        source.start_frame, source.stop_frame = start, stop
+    return source
+
+
+def map_frames(fn, shared, boundaries, workers, should_stop=None):
+    """
+    Run fn(descriptor, start_frame, stop_frame) for consecutive frame ranges in a process pool.
+
+    Args:
+        fn: Picklable (module-level) function; it calls attach() to get its samples
+        shared: SharedPCM
+        boundaries: Ascending frame positions; range i is boundaries[i]..boundaries[i + 1]
+        should_stop: Optional callable, given the frame position reached; returning True
+            cancels the ranges not started yet
+
+    Returns:
+        Results of the ranges in order, up to the first one not computed
+
+    Raises:
+        concurrent.futures.process.BrokenProcessPool: If a worker died; the shared
+        block is still released by the SharedPCM owner
+    """
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fn, shared.descriptor, f0, f1) for f0, f1 in ranges]
+        results = []
+        try:
+            for (f0, _), future in zip(ranges, futures):
+                if should_stop is not None and should_stop(f0):
+                    break
+                results.append(future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+    return results
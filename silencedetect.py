@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+ffmpeg silencedetect engine
+Decoding and detection both run inside ffmpeg (the silencedetect filter); Python only
+reads the silence_start/silence_end events from its log as they stream in, so memory
+use does not grow with the clip length
+
+Unlike pydub and loudness.py, which compare the RMS of seek_step windows with the
+cutoff, silencedetect compares every sample's amplitude: the same cutoff finds
+slightly shorter silences on noisy material.
+"""
+
+import logging
+import re
+import subprocess
+
+# ffmpeg prints the times with %g, so tiny and huge values use exponents (5e-05)
+NUMBER = r'([-+]?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)'
+SILENCE_START = re.compile(r'silence_start: ' + NUMBER)
+SILENCE_END = re.compile(r'silence_end: ' + NUMBER)
+DURATION = re.compile(r'Duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+def command(path, silence_thresh, min_silence_len, in_ms=0, out_ms=None, ffmpeg='ffmpeg'):
+    """ffmpeg command running silencedetect over the in/out range (ms) of path"""
+    cmd = [ffmpeg, '-hide_banner', '-nostats']
+    if in_ms:
+        cmd += ['-ss', str(in_ms / 1000.0)]
+    if out_ms:
+        cmd += ['-t', str((out_ms - (in_ms or 0)) / 1000.0)]
+    cmd += ['-i', path, '-vn', '-sn', '-dn',
+            '-af', f"silencedetect=noise={silence_thresh}dB:d={min_silence_len / 1000.0}",
+            '-f', 'null', '-']
+    return cmd
+
+
+def parse_events(lines):
+    """
+    Events in an ffmpeg log: ('duration', s) from the input header, then
+    ('start', s) and ('end', s) from silencedetect
+    """
+    for line in lines:
+        match = SILENCE_START.search(line)
+        if match:
+            yield 'start', float(match.group(1))
+            continue
+        match = SILENCE_END.search(line)
+        if match:
+            yield 'end', float(match.group(1))
+            continue
+        match = DURATION.search(line)
+        if match:
+            hours, minutes, seconds = match.groups()
+            yield 'duration', int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def iter_silences(events, in_ms=0, out_ms=None):
+    """
+    Pair silencedetect events into [start, end] silences (ms, relative to in_ms),
+    yielding each one as soon as its end arrives.
+
+    A silence still open when the log ends runs to the end of the range; its length
+    comes from out_ms or the input's duration, and the last value yielded is
+    ('length', clip length in ms) so callers can pad against it.
+    """
+    clip_length = out_ms - (in_ms or 0) if out_ms else None
+    open_start = None
+    for kind, seconds in events:
+        if kind == 'duration':
+            media_length = max(0, int(round(seconds * 1000)) - (in_ms or 0))
+            clip_length = media_length if clip_length is None else min(clip_length, media_length)
+        elif kind == 'start':
+            open_start = max(0, int(round(seconds * 1000)))
+        elif kind == 'end' and open_start is not None:
+            end = int(round(seconds * 1000))
+            if clip_length is not None:
+                end = min(end, clip_length)
+            if end > open_start:
+                yield [open_start, end]
+            open_start = None
+    if open_start is not None and clip_length is not None and clip_length > open_start:
+        yield [open_start, clip_length]
+    yield 'length', clip_length
+
+
+def detect_silence(path, min_silence_len=1000, silence_thresh=-16, in_ms=0, out_ms=None, should_stop=None):
+    """
+    Silences of the in/out range of a media file, detected by ffmpeg.
+
+    Args:
+        path: Media file (any format ffmpeg reads)
+        min_silence_len, silence_thresh: As for pydub.silence.detect_silence (ms, dBFS)
+        in_ms, out_ms: Range to analyze (out_ms None or 0 for the end of the file)
+        should_stop: Optional callable, given the position (ms) of every silence found;
+            returning True kills ffmpeg and returns what was found so far
+
+    Returns:
+        (silences, clip_length) with [[start, end], ...] in ms relative to in_ms and
+        the length of the analyzed range in ms (None if ffmpeg never reported it)
+
+    Raises:
+        Exception: If ffmpeg fails
+    """
+    cmd = command(path, silence_thresh, min_silence_len, in_ms, out_ms)
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True, errors='replace')
+    silences, clip_length, log = [], None, []
+    stopped = False
+
+    def lines():
+        for line in process.stderr:
+            log.append(line)
+            del log[:-20]
+            yield line
+
+    try:
+        for item in iter_silences(parse_events(lines()), in_ms, out_ms):
+            if item[0] == 'length':
+                clip_length = item[1]
+            else:
+                silences.append(item)
+                if should_stop is not None and should_stop(item[1]):
+                    stopped = True
+                    break
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        if stopped and process.poll() is None:
+            process.kill()
+        process.stderr.close()
+        returncode = process.wait()
+
+    if returncode != 0 and not stopped:
+        raise Exception(f"FFmpeg silencedetect failed: {''.join(log).strip()}")
+    logging.debug(f"silencedetect found {len(silences)} silences in {clip_length} ms")
+    return silences, clip_length
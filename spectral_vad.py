@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Spectral voice activity detection
+NumPy-only speech detector between the loudness threshold and Whisper: frame energy,
+zero-crossing rate and spectral flatness from batched FFTs, smoothed with hysteresis.
+No model weights, runs in one pass over a PCMSource (see pcm_reader.py)
+"""
+
+import numpy as np
+
+FRAME_MS = 20
+# Frames analyzed per step; bounds the scratch memory of a pass
+CHUNK_FRAMES = 500
+
+# Band where speech energy and harmonics live (Hz)
+SPEECH_BAND = (100, 4000)
+
+# Speech must be this far above the noise floor (dB); the floor is a low percentile of frame energy
+NOISE_FLOOR_PERCENTILE = 10
+ENERGY_MARGIN_DB = 6
+# Voiced speech is harmonic: much less flat than room noise (1.0 = white noise)
+FLATNESS_MAX = 0.35
+# Fricatives are flat but loud and with many zero crossings
+FRICATIVE_MARGIN_DB = 12
+FRICATIVE_ZCR_MIN = 0.25
+
+# Hysteresis on the smoothed frame decisions
+SMOOTH_FRAMES = 5
+ONSET_SCORE = 0.6
+OFFSET_SCORE = 0.2
+HANGOVER_FRAMES = 15
+
+_EPS = 1e-12
+
+# Sources shorter than this (s) are not worth starting worker processes for
+PARALLEL_MIN_SECONDS = 300
+# Ranges per worker process, so a slow range does not leave the others idle
+RANGES_PER_PROCESS = 4
+
+
+def _frame_length(frame_rate):
+    return max(1, int(frame_rate * FRAME_MS / 1000))
+
+
+def frame_features(source, should_stop=None):
+    """
+    Per-frame features of a source, FRAME_MS frames without overlap.
+
+    Args:
+        source: PCMSource (or anything with read(), frame_count, frame_rate and max_possible_amplitude)
+        should_stop: Optional callable, given the position (ms) reached before each
+            chunk; returning True ends the pass early
+
+    Returns:
+        Dict of equally long arrays: 'energy' (dBFS), 'zcr' (crossings per sample)
+        and 'flatness' (0-1, in the speech band)
+    """
+    frame_len = _frame_length(source.frame_rate)
+    nfft = 1 << (frame_len - 1).bit_length()
+    window = np.hanning(frame_len).astype(np.float32)
+    freqs = np.fft.rfftfreq(nfft, 1.0 / source.frame_rate)
+    band = (freqs >= SPEECH_BAND[0]) & (freqs <= SPEECH_BAND[1])
+    scale = 1.0 / source.max_possible_amplitude
+
+    total = source.frame_count // frame_len
+    energy, zcr, flatness = [], [], []
+    for k0 in range(0, total, CHUNK_FRAMES):
+        if should_stop is not None and should_stop(k0 * FRAME_MS):
+            break
+        k1 = min(k0 + CHUNK_FRAMES, total)
+        samples = source.read(k0 * frame_len, k1 * frame_len).astype(np.float32)
+        mono = samples.reshape(k1 * frame_len - k0 * frame_len, -1).mean(axis=1) * scale
+        frames = mono.reshape(k1 - k0, frame_len)
+
+        energy.append(10 * np.log10(np.mean(frames * frames, axis=1) + _EPS))
+        crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1)
+        zcr.append(crossings / frame_len)
+
+        power = np.abs(np.fft.rfft(frames * window, n=nfft, axis=1)[:, band]) ** 2 + _EPS
+        flatness.append(np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1))
+
+    def join(parts):
+        return np.concatenate(parts) if parts else np.empty(0)
+    return {'energy': join(energy), 'zcr': join(zcr), 'flatness': join(flatness)}
+
+
+def _features_worker(descriptor, start_frame, stop_frame):
+    """frame_features() of one range of a shared source, in a worker process"""
+    import shared_pcm
+    return frame_features(shared_pcm.attach(descriptor, start_frame, stop_frame))
+
+
+def frame_features_parallel(source, processes, should_stop=None):
+    """
+    frame_features() computed by worker processes over ranges split on frame
+    boundaries; the features are identical to a single pass. The samples are shared
+    with the workers, not copied (see shared_pcm.py).
+    """
+    import shared_pcm
+
+    frame_len = _frame_length(source.frame_rate)
+    total = source.frame_count // frame_len
+    step = max(1, -(-total // (processes * RANGES_PER_PROCESS)))
+    boundaries = [k * frame_len for k in range(0, total, step)] + [total * frame_len]
+
+    def stop_at(frame):
+        return should_stop is not None and should_stop(frame * 1000 // source.frame_rate)
+
+    with shared_pcm.SharedPCM(source) as shared:
+        parts = shared_pcm.map_frames(_features_worker, shared, boundaries, processes, stop_at)
+    if not parts:
+        return {'energy': np.empty(0), 'zcr': np.empty(0), 'flatness': np.empty(0)}
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+def classify_frames(features):
+    """Raw per-frame speech decisions from the features"""
+    energy = features['energy']
+    if len(energy) == 0:
+        return np.zeros(0, dtype=bool)
+    above_floor = energy - np.percentile(energy, NOISE_FLOOR_PERCENTILE)
+    voiced = (above_floor > ENERGY_MARGIN_DB) & (features['flatness'] < FLATNESS_MAX)
+    fricative = (above_floor > FRICATIVE_MARGIN_DB) & (features['zcr'] > FRICATIVE_ZCR_MIN)
+    return voiced | fricative
+
+
+def apply_hysteresis(decisions):
+    """
+    Smooth raw decisions: speech starts when the moving average reaches ONSET_SCORE
+    and ends where it drops below OFFSET_SCORE, unless it recovers within
+    HANGOVER_FRAMES frames (short pauses inside words and phrases are bridged).
+    """
+    if len(decisions) == 0:
+        return decisions
+    score = np.convolve(decisions.astype(np.float32), np.ones(SMOOTH_FRAMES) / SMOOTH_FRAMES, mode='same')
+    speech = np.zeros(len(decisions), dtype=bool)
+    active = False
+    quiet = 0
+    for i, value in enumerate(score):
+        if not active:
+            active = value >= ONSET_SCORE
+            quiet = 0
+        elif value < OFFSET_SCORE:
+            quiet += 1
+            if quiet >= HANGOVER_FRAMES:
+                # Gap too long to bridge: speech ended at its first quiet frame
+                active = False
+                speech[i - quiet + 1:i] = False
+                continue
+        else:
+            quiet = 0
+        speech[i] = active
+    return speech
+
+
+def speech_regions(source, should_stop=None, processes=1):
+    """
+    Speech regions of a source in seconds.
+
+    Args:
+        processes: Worker processes for the features of sources longer than
+            PARALLEL_MIN_SECONDS (1 analyzes in this process)
+
+    Returns:
+        (regions, processed) with [[start, end], ...] and the number of seconds
+        analyzed (less than the source if should_stop ended the pass early)
+    """
+    if processes > 1 and len(source) >= PARALLEL_MIN_SECONDS * 1000:
+        features = frame_features_parallel(source, processes, should_stop=should_stop)
+    else:
+        features = frame_features(source, should_stop=should_stop)
+    speech = apply_hysteresis(classify_frames(features))
+    frame_seconds = FRAME_MS / 1000.0
+
+    edges = np.diff(np.concatenate(([False], speech, [False])).astype(np.int8))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    regions = [[float(s * frame_seconds), float(e * frame_seconds)] for s, e in zip(starts, ends)]
+    return regions, len(speech) * frame_seconds
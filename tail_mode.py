@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Live analysis of recordings that are still being captured
+Follows a growing WAV/AIFF file, analyzes only the audio appended since the last poll
+and keeps an up-to-date silence list on disk. The detectors keep their state (the
+open silence run, the keep-over pair still waiting for its partner, the Whisper
+speech gaps) between polls, so when recording stops only the last few seconds remain
+"""
+
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import loudness
+import pcm_reader
+
+# Seconds between checks of the file size
+POLL_SECONDS = 2.0
+# The recording is considered finished once the file has not grown for this long
+IDLE_SECONDS = 10.0
+
+
+def _bounds(first_ms, last_ms, frame_rate):
+    """loudness.ms_boundaries() entries first_ms..last_ms (inclusive)"""
+    return (np.arange(first_ms, last_ms + 1) * (frame_rate / 1000.0)).astype(np.int64)
+
+
+class LoudnessTail:
+    """
+    Incremental version of the loudness engine (pydub-compatible detection, then
+    jumpcut.py's padding and keep-over steps); all values in ms.
+
+    After finish() the silences equal those of one pass over the whole recording.
+    """
+
+    def __init__(self, min_silence_len=1000, silence_thresh=-16, seek_step=1, padding=0, keep_over=0):
+        self.min_silence_len = int(min_silence_len)
+        self.silence_thresh = silence_thresh
+        self.seek_step = int(seek_step)
+        self.padding = padding
+        self.keep_over = keep_over
+
+        self.energy = np.zeros(0, dtype=np.int64)
+        self.length = 0          # ms blocks analyzed
+        self.next_start = 0      # next window start on the seek grid
+        self.open = None         # [first start, last start] of the silent run still growing
+        self.padded = []         # closed silences after padding
+        self.paired = 0          # padded silences already through keep-over
+        self.merged = []         # final keep-over output
+        self.source_format = None
+
+    def _append_energy(self, values):
+        """Amortized O(1) append to the per-millisecond energy buffer"""
+        needed = self.length + len(values)
+        if needed > len(self.energy):
+            grown = np.zeros(max(needed, 2 * len(self.energy), 60000), dtype=values.dtype)
+            grown[:self.length] = self.energy[:self.length]
+            self.energy = grown
+        elif values.dtype != self.energy.dtype:
+            self.energy = self.energy.astype(values.dtype)
+        self.energy[self.length:needed] = values
+        self.length = needed
+
+    def _evaluate(self, starts):
+        """Add the silent windows among `starts` (ascending, all complete) to the runs"""
+        if len(starts) == 0:
+            return
+        frame_rate, channels, max_amplitude = self.source_format
+        first, last = int(starts[0]), int(starts[-1]) + self.min_silence_len
+        rms = loudness.window_rms(self.energy[first:last], _bounds(first, last, frame_rate),
+                                  starts - first, self.min_silence_len, channels)
+        silent = starts[rms <= loudness.db_to_float(self.silence_thresh) * max_amplitude]
+        if len(silent) == 0:
+            return
+
+        if self.open is not None:
+            silent = np.concatenate(([self.open[1]], silent))
+        ranges = loudness.group_silent_starts(silent, self.min_silence_len, self.seek_step)
+        if self.open is not None:
+            ranges[0][0] = self.open[0]
+        self.open = [ranges[-1][0], ranges[-1][1] - self.min_silence_len]
+        self._close(ranges[:-1])
+
+    def _close(self, ranges, clip_length=float('inf')):
+        """Pad finished silences and run keep-over over every complete pair"""
+        self.padded += loudness.pad_silences([list(r) for r in ranges], self.padding, clip_length)
+        while len(self.padded) - self.paired >= 2:
+            pair = self.padded[self.paired:self.paired + 2]
+            self.merged += loudness.merge_keep_over([list(s) for s in pair], self.keep_over)
+            self.paired += 2
+
+    def feed(self, source):
+        """Analyze the frames of a (re-opened, longer) source not seen yet"""
+        self.source_format = (source.frame_rate, source.channels, source.max_possible_amplitude)
+        # Only whole milliseconds whose frames are all on disk
+        complete = int(source.frame_count * 1000 // source.frame_rate)
+        while complete > 0 and int(complete * (source.frame_rate / 1000.0)) > source.frame_count:
+            complete -= 1
+        if complete <= self.length:
+            return
+        bounds = _bounds(self.length, complete, source.frame_rate)
+        self._append_energy(loudness.block_energy(source, bounds))
+
+        last_start = self.length - self.min_silence_len
+        if last_start >= self.next_start:
+            starts = np.arange(self.next_start, last_start + 1, self.seek_step, dtype=np.int64)
+            self._evaluate(starts)
+            self.next_start = int(starts[-1]) + self.seek_step
+
+    def finish(self, source=None):
+        """The recording ended: evaluate pydub's forced last window and close the open run"""
+        if source is not None:
+            self.feed(source)
+        last_start = self.length - self.min_silence_len
+        if last_start >= 0 and last_start % self.seek_step:
+            self._evaluate(np.array([last_start], dtype=np.int64))
+        if self.open is not None:
+            self._close([[self.open[0], self.open[1] + self.min_silence_len]], self.length)
+            self.open = None
+        self.merged += loudness.merge_keep_over([list(s) for s in self.padded[self.paired:]], self.keep_over)
+        self.paired = len(self.padded)
+
+    def silences(self):
+        """Silences so far in seconds; a run still silent at the end of the file is included"""
+        pending = [list(s) for s in self.padded[self.paired:]]
+        if self.open is not None:
+            pending += loudness.pad_silences([[self.open[0], self.open[1] + self.min_silence_len]],
+                                             self.padding, self.length)
+        silences = self.merged + loudness.merge_keep_over(pending, self.keep_over)
+        return [[s[0] / 1000.0, s[1] / 1000.0] for s in silences]
+
+    @property
+    def processed(self):
+        return self.length / 1000.0
+
+
+class WhisperTail:
+    """
+    Incremental version of the Whisper engine: appended audio is transcribed in
+    overlapping windows, as in transcribe_pipeline, and the speech gaps are collected
+    as the segments arrive. Speech reaching into a window's last seconds waits for
+    the next window, which hears it whole.
+    """
+
+    def __init__(self, model_size="base", language=None, min_silence_length=1.0, padding=0.5, control=None,
+                 window_seconds=None):
+        import transcribe_pipeline
+        import whisper_jumpcut
+
+        self.model_size = model_size
+        self.language = language
+        self.padding = padding
+        self.control = control or whisper_jumpcut.RunControl()
+        self.window_seconds = window_seconds or transcribe_pipeline.WINDOW_SECONDS
+        self.gaps = whisper_jumpcut.SpeechGaps(min_silence_length)
+        self.windows = transcribe_pipeline.OverlappedWindows(self.window_seconds)
+        self.frames_done = 0
+        self.processed = 0.0
+        self.model = None
+
+    def feed(self, source, final=False):
+        """Transcribe every complete window appended since the last call (and the rest if final)"""
+        import transcribe_pipeline
+        import whisper_jumpcut
+
+        step_frames = int(self.windows.step_seconds * source.frame_rate)
+        while not self.control.stopped:
+            remaining = source.frame_count - self.frames_done
+            if remaining <= 0 or (remaining < step_frames and not final):
+                break
+            f1 = self.frames_done + min(step_frames, remaining)
+            if self.model is None:
+                self.model = whisper_jumpcut.load_model(self.model_size)
+            offset = self.frames_done / source.frame_rate
+            segments, cut, self.language = self.windows.transcribe(
+                self.model, offset, transcribe_pipeline.whisper_audio(source, self.frames_done, f1), self.language)
+            for segment in segments:
+                self.gaps.add(segment)
+            self.frames_done = f1
+            # Speech after cut is still held back
+            self.processed = cut
+        if final and not self.control.stopped:
+            for segment in self.windows.flush():
+                self.gaps.add(segment)
+            self.processed = self.frames_done / source.frame_rate
+
+    def finish(self, source):
+        self.feed(source, final=True)
+
+    def silences(self):
+        return self.gaps.finish(self.processed, self.padding)
+
+
+def write_result(output_path, detector, start=0.0, complete=False):
+    """Replace the silence list on disk (engine output format plus progress fields)"""
+    silences = [[s[0] + start, s[1] + start] for s in detector.silences()]
+    silences.append(1 if silences and silences[0][0] == start else 0)
+    result = {'silences': silences, 'processedUntil': round(detector.processed + start, 3), 'complete': complete}
+
+    directory = os.path.dirname(os.path.abspath(output_path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(result, f)
+        os.replace(temp_path, output_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return result
+
+
+def follow(path, detector, output_path, start=0.0, poll_seconds=POLL_SECONDS, idle_seconds=IDLE_SECONDS,
+           control=None):
+    """
+    Analyze a recording while it grows, until it stops growing for idle_seconds or
+    the run is stopped (SIGTERM, deadline); then finish the last part.
+
+    Args:
+        path: WAV/AIFF file being recorded
+        detector: LoudnessTail or WhisperTail
+        output_path: JSON file kept up to date with the silences found so far
+        start: Timeline position of the recording (s), as for the engines
+
+    Returns:
+        The final result written to output_path
+    """
+    if control is None:
+        import whisper_jumpcut
+        control = whisper_jumpcut.RunControl()
+
+    source = None
+    last_size = None
+    last_growth = time.monotonic()
+    while not control.stopped:
+        size = os.path.getsize(path) if os.path.exists(path) else None
+        if size != last_size:
+            last_size = size
+            last_growth = time.monotonic()
+            try:
+                source = pcm_reader.open_pcm(path, growing=True)
+            except (ValueError, OSError) as e:
+                # The recorder has not written the header yet
+                logging.debug(f"Waiting for {path}: {e}")
+            else:
+                detector.feed(source)
+                write_result(output_path, detector, start)
+                print(f"Analyzed {detector.processed:.0f} s")
+        elif time.monotonic() - last_growth >= idle_seconds:
+            break
+        time.sleep(poll_seconds)
+
+    if source is not None:
+        # Pick up anything written since the last poll
+        detector.finish(pcm_reader.open_pcm(path, growing=True))
+    return write_result(output_path, detector, start, complete=not control.stopped)
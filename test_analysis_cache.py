@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis cache used by the engines and the background indexer
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import analysis_cache
+import loudness
+import pcm_reader
+from test_loudness import create_test_wav
+
+
+def test_cached_envelope_gives_same_silences():
+    """A round-tripped envelope, windowed to in/out, cuts exactly like a direct pass"""
+    path = create_test_wav(seconds=10)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        source = pcm_reader.open_pcm(path)
+        assert analysis_cache.load_envelope(path, cache_dir) is None
+        analysis_cache.save_envelope(path, loudness.compute_envelope(source), cache_dir)
+
+        envelope = analysis_cache.load_envelope(path, cache_dir).window(137, 8003)
+        expected = loudness.detect_silence(source.window(137, 8003), min_silence_len=300,
+                                           silence_thresh=-30, seek_step=10)
+        assert loudness.silences_from_envelope(envelope, 300, -30, 10) == expected
+    finally:
+        os.remove(path)
+        shutil.rmtree(cache_dir)
+
+
+def test_transcript_round_trip_and_clip():
+    path = create_test_wav(seconds=1)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        segments = [analysis_cache.Segment(0.5, 2.0, 'hello'), analysis_cache.Segment(3.0, 4.5, 'world')]
+        analysis_cache.save_transcript(path, 'base', None, segments, 5.0, cache_dir)
+        assert analysis_cache.load_transcript(path, 'base', 'en', cache_dir) is None
+
+        loaded, duration = analysis_cache.load_transcript(path, 'base', None, cache_dir)
+        assert loaded == segments and duration == 5.0
+        clipped = analysis_cache.clip_segments(loaded, 1.0, 3.5)
+        assert [(s.start, s.end) for s in clipped] == [(0.0, 1.0), (2.0, 2.5)]
+    finally:
+        os.remove(path)
+        shutil.rmtree(cache_dir)
+
+
+def test_prune_removes_least_recently_used_results():
+    paths = [create_test_wav(seconds=1, seed=i) for i in range(2)]
+    cache_dir = tempfile.mkdtemp()
+    try:
+        first, second = paths
+        analysis_cache.save_transcript(first, 'base', None, [analysis_cache.Segment(0.1, 0.5)], 1.0, cache_dir)
+        analysis_cache.save_transcript(second, 'base', None, [analysis_cache.Segment(0.2, 0.6)], 1.0, cache_dir)
+        entry = analysis_cache._entry(first, analysis_cache._transcript_suffix('base', None), cache_dir)
+        os.utime(entry, (0, 0))
+        # A hit makes the first transcript the most recently used one
+        assert analysis_cache.load_transcript(first, 'base', None, cache_dir) is not None
+        other = analysis_cache._entry(second, analysis_cache._transcript_suffix('base', None), cache_dir)
+        os.utime(other, (1, 1))
+
+        analysis_cache.prune(cache_dir, max_mb=os.path.getsize(entry) / (1024 * 1024))
+        assert os.path.exists(entry) and not os.path.exists(other)
+    finally:
+        for path in paths:
+            os.remove(path)
+        shutil.rmtree(cache_dir)
+
+
+def test_panel_run_fills_the_envelope_cache(tmp_path):
+    """jumpcut.py with the panel's in/out points stores the whole file and cuts the same from it"""
+    path = create_test_wav(seconds=10)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jumpcut.py')
+    params = json.dumps({'silenceCutoff': -40, 'removeOver': 0.3, 'keepOver': 0.1, 'padding': 0.05,
+                         'in': 1.7, 'out': 8.3, 'start': 4})
+    env = dict(os.environ, OPENJUMPCUT_CACHE=str(tmp_path / 'cache'))
+    try:
+        def run():
+            completed = subprocess.run([sys.executable, script, path, params], cwd=str(tmp_path), env=env,
+                                       capture_output=True, text=True, check=True)
+            return json.loads(completed.stdout.strip().splitlines()[-1])
+
+        direct = run()
+        cached = analysis_cache.load_envelope(path, str(tmp_path / 'cache'))
+        assert cached is not None and len(cached) == len(pcm_reader.open_pcm(path))
+        assert run() == direct and len(direct['silences']) > 2
+    finally:
+        os.remove(path)
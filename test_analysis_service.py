@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTTP analysis service, run against a localhost instance
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import pytest
+
+import analysis_cache
+import analysis_service
+import whisper_jumpcut
+from test_loudness import create_test_wav
+
+PARAMS = {'silenceCutoff': -30, 'removeOver': 0.3, 'keepOver': 0.1, 'padding': 0.05,
+          'in': 1, 'out': 9, 'start': 0, 'method': 'loudness'}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(analysis_cache, 'CACHE_DIR', tempfile.mkdtemp())
+    server = analysis_service.make_server('127.0.0.1', 0, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    server.service.shutdown()
+    shutil.rmtree(analysis_cache.CACHE_DIR)
+
+
+def request(url, body=None, method=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={'X-Client-Id': 'test-panel'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_analyze_matches_cli_and_caches(service):
+    path = create_test_wav(seconds=10)
+    try:
+        status, result = request(service + '/analyze', {'path': path, 'params': PARAMS})
+        assert status == 200
+        expected = whisper_jumpcut.analyze(path, whisper_jumpcut.parse_jumpcut_params(PARAMS))
+        assert result == expected
+        assert len(result['silences']) > 1
+
+        status, again = request(service + '/analyze', {'path': path, 'params': PARAMS})
+        assert status == 200 and again.pop('cached') is True and again == result
+
+        status, info = request(service + '/status')
+        assert info['cache'] == {'entries': 1, 'hits': 1, 'misses': 1}
+        assert info['queue']['running'] == 0
+    finally:
+        os.remove(path)
+
+
+def test_envelope_endpoint(service):
+    path = create_test_wav(seconds=10)
+    try:
+        query = urllib.parse.urlencode({'path': path, 'start': 1, 'end': 9, 'pixels': 300})
+        status, result = request(service + '/envelope?' + query)
+        assert status == 200
+        assert len(result['max']) == len(result['rms']) == 300
+        assert (result['start'], result['end'], result['duration']) == (1, 9, 10)
+
+        status, result = request(service + '/envelope?' + urllib.parse.urlencode({'path': path, 'pixels': 0}))
+        assert status == 400
+    finally:
+        os.remove(path)
+
+
+def test_pyramid_builds_go_through_the_scheduler(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis_cache, 'CACHE_DIR', str(tmp_path))
+    path = create_test_wav(seconds=4)
+    service = analysis_service.AnalysisService(workers=1)
+    submitted = []
+    submit = service.scheduler.submit
+    monkeypatch.setattr(service.scheduler, 'submit', lambda key, *args, **kwargs: submitted.append(key) or
+                        submit(key, *args, **kwargs))
+    try:
+        query = {'path': [path], 'pixels': ['100']}
+        first = service.envelope(query, 'panel')
+        # The second request is served from the cached pyramid without a job
+        assert service.envelope(query, 'panel') == first
+        assert submitted == [('panel', 'envelope', path)]
+    finally:
+        service.shutdown()
+        os.remove(path)
+
+
+def test_rejects_bad_requests(service):
+    status, result = request(service + '/analyze', {'path': '/no/such/file.wav', 'params': PARAMS})
+    assert status == 404 and 'error' in result
+
+    path = create_test_wav(seconds=1)
+    try:
+        status, result = request(service + '/analyze', {'path': path, 'params': {'removeOver': 'long'}})
+        assert status == 400
+    finally:
+        os.remove(path)
+
+    assert request(service + '/jobs/test-panel', method='DELETE') == (200, {'cancelled': 0})
+
+
+def test_path_map_and_media_roots():
+    media_root = tempfile.mkdtemp()
+    path = os.path.join(media_root, 'clip.wav')
+    shutil.move(create_test_wav(seconds=1), path)
+    service = analysis_service.AnalysisService(workers=1, path_map=['Z:\\Media=' + media_root],
+                                               media_roots=[media_root])
+    try:
+        assert service.resolve_path('Z:\\Media\\clip.wav') == os.path.realpath(path)
+        with pytest.raises(analysis_service.ServiceError) as error:
+            service.resolve_path(__file__)
+        assert error.value.status == 403
+    finally:
+        service.shutdown()
+        shutil.rmtree(media_root)
+
+
+def test_token_origins_and_listen_address(monkeypatch):
+    monkeypatch.setattr(analysis_cache, 'CACHE_DIR', tempfile.mkdtemp())
+    with pytest.raises(ValueError):
+        analysis_service.make_server('0.0.0.0', 0, token='secret')
+    server = analysis_service.make_server('127.0.0.1', 0, workers=1, token='secret',
+                                          allowed_origins=['http://panel'])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def call(path, method, headers):
+        req = urllib.request.Request(url + path, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.headers.get('Access-Control-Allow-Origin')
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Access-Control-Allow-Origin')
+
+    try:
+        assert call('/jobs/other-panel', 'DELETE', {})[0] == 401
+        assert call('/jobs/other-panel', 'DELETE', {'X-Service-Token': 'wrong'})[0] == 401
+        assert call('/jobs/other-panel', 'DELETE', {'X-Service-Token': 'secret', 'X-Client-Id': 'panel'})[0] == 403
+        assert call('/jobs/panel', 'DELETE', {'X-Service-Token': 'secret', 'X-Client-Id': 'panel'})[0] == 200
+        assert call('/health', 'GET', {'Origin': 'http://evil'}) == (200, None)
+        assert call('/health', 'GET', {'Origin': 'http://panel'}) == (200, 'http://panel')
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.shutdown()
+        shutil.rmtree(analysis_cache.CACHE_DIR)
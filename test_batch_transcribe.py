@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for batched Whisper analysis, with stand-ins for the VAD and the batched pipeline
+"""
+
+import os
+
+import numpy as np
+
+import batch_transcribe
+import whisper_jumpcut
+from test_loudness import create_test_wav
+from test_transcribe_pipeline import LoudnessModel
+
+FRAME = 1600
+
+
+def loud_spans(samples):
+    """Runs of loud 100 ms frames, padded by two frames on each side"""
+    frames = samples[:len(samples) // FRAME * FRAME].reshape(-1, FRAME)
+    loud = np.append(np.sqrt(np.mean(frames ** 2, axis=1)) > 0.05, False)
+    spans, start = [], None
+    for i, value in enumerate(loud):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            spans.append([max(0, start - 2) * FRAME, min(len(frames), i + 2) * FRAME])
+            start = None
+    return spans
+
+
+class BatchedLoudnessPipeline:
+    """Transcribes every clip timestamp on its own, like BatchedInferencePipeline"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, clip_timestamps, **kwargs):
+        self.calls += 1
+        segments = []
+        for chunk in clip_timestamps:
+            found, _ = LoudnessModel().transcribe(audio[chunk['start']:chunk['end']])
+            offset = chunk['start'] / batch_transcribe.WHISPER_RATE
+            segments += [s.__class__(start=s.start + offset, end=s.end + offset, text=s.text) for s in found]
+        return iter(segments), None
+
+
+def test_pack_spans_respects_window():
+    assert batch_transcribe.pack_spans([[0, 10], [20, 30], [35, 90]], 40) == [[0, 30], [35, 75], [75, 90]]
+
+
+def test_batched_matches_sequential(monkeypatch):
+    pipeline = BatchedLoudnessPipeline()
+    monkeypatch.setattr(batch_transcribe, 'speech_spans', loud_spans)
+    monkeypatch.setattr(batch_transcribe, 'load_pipeline', lambda *args: pipeline)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: LoudnessModel())
+
+    paths = [create_test_wav(frame_rate=16000, seconds=12 + i, seed=i) for i in range(5)]
+    try:
+        items = []
+        for i, path in enumerate(paths):
+            params = whisper_jumpcut.parse_jumpcut_params({'removeOver': 0.3, 'padding': 0.05, 'start': i,
+                                                           'in': 0.1 * i, 'out': 11 + 0.2 * i if i % 2 else None})
+            items.append((path, params))
+        items.append(('/nonexistent/clip.wav', items[0][1]))
+
+        sequential = batch_transcribe.analyze_sequential(items)
+        batched = batch_transcribe.analyze_batch(items, group_seconds=5)
+
+        assert pipeline.calls > 1
+        for a, b in zip(sequential[:-1], batched[:-1]):
+            assert len(a['silences']) > 2
+            assert a['silences'][-1] == b['silences'][-1]
+            assert np.allclose(a['silences'][:-1], b['silences'][:-1])
+        assert 'error' in batched[-1] and 'error' in sequential[-1]
+    finally:
+        for path in paths:
+            os.remove(path)
+
+
+def test_benchmark_without_batched_pipeline(monkeypatch):
+    def no_pipeline(*args):
+        raise ImportError("cannot import name 'BatchedInferencePipeline'")
+
+    monkeypatch.setattr(batch_transcribe, 'load_pipeline', no_pipeline)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: LoudnessModel())
+    path = create_test_wav(frame_rate=16000, seconds=5)
+    try:
+        params = whisper_jumpcut.parse_jumpcut_params({'removeOver': 0.3})
+        report = batch_transcribe.benchmark([(path, params)])
+        assert report['sequentialClipsPerMinute'] and report['batchedClipsPerMinute'] is None
+        assert report['speedup'] is None and report['differing'] == []
+    finally:
+        os.remove(path)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tests for the Whisper confidence post-filter
+"""
+
+from analysis_cache import Segment
+from confidence_filter import ConfidenceFilter
+import engine_harness
+import whisper_jumpcut
+
+SPEECH = Segment(1.0, 3.0, ' hello there', -0.2, 0.05, 1.3,
+                 ((1.0, 1.4, 0.2), (1.4, 2.0, 0.9), (2.0, 2.6, 0.95), (2.6, 3.0, 0.1)))
+BREATH = Segment(4.0, 4.6, ' uh', -0.9, 0.7, 1.1)
+LOOP = Segment(6.0, 8.0, ' the the the the the the', -0.3, 0.1, 3.1)
+
+
+def test_unreliable_segments_become_silence():
+    confidence = ConfidenceFilter(word_probability=0.5)
+    kept = confidence.apply([SPEECH, BREATH, LOOP])
+
+    assert [(segment.start, segment.end) for segment in kept] == [(1.4, 2.6)]
+    assert confidence.report() == {'segmentsDropped': 2, 'droppedSeconds': 2.6, 'trimmedSeconds': 0.8}
+    # The gap left by the dropped segments is cut
+    silences = whisper_jumpcut.speech_gaps_to_silences(kept, 10.0, 1.0, 0.0)
+    assert silences[-1] == [2.6, 10.0]
+
+
+def test_filter_is_off_unless_asked_for():
+    assert ConfidenceFilter.from_params(whisper_jumpcut.parse_jumpcut_params({})) is None
+    params = whisper_jumpcut.parse_jumpcut_params({'noSpeechProb': 0.5, 'wordProbability': True})
+    confidence = ConfidenceFilter.from_params(params)
+    assert confidence.no_speech_prob == 0.5 and confidence.word_probability == 0.4
+
+
+def test_masks_score_false_and_missed_speech():
+    reference = engine_harness.speech_mask([SPEECH], 10.0)
+    candidate = engine_harness.speech_mask([SPEECH, BREATH], 10.0)
+    scores = engine_harness.compare_masks(reference, candidate)
+    assert scores == {'agreement': 0.94, 'falseSpeechSeconds': 0.6, 'missedSpeechSeconds': 0.0}
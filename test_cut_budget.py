@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Tests for the cut budget selection
+"""
+
+import cut_budget
+
+SILENCES = [[0.0, 0.2], [1.0, 3.0], [4.0, 4.1], [5.0, 6.5], [7.0, 7.3]]
+
+
+def test_keeps_longest_silences_in_timeline_order():
+    kept, report = cut_budget.select_cuts(SILENCES, max_cuts=2)
+    assert kept == [[1.0, 3.0], [5.0, 6.5]]
+    assert report == {'cutsKept': 2, 'cutsDropped': 3, 'savedSeconds': 3.5, 'droppedSeconds': 0.6}
+
+
+def test_min_saved_and_no_budget():
+    kept, report = cut_budget.select_cuts(SILENCES, min_saved=0.25)
+    assert kept == [[1.0, 3.0], [5.0, 6.5], [7.0, 7.3]]
+    assert cut_budget.select_cuts(SILENCES)[0] == SILENCES
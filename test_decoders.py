@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the decoding backends, with a stand-in for PyAV
+"""
+
+import sys
+from fractions import Fraction
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import decoders
+
+RATE = 16000
+PACKET_FRAMES = 1024
+
+
+class FakeContainer:
+    """Mono 16 kHz stream cut into 1024-frame packets; seeking lands on a packet start"""
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.position = 0
+        self.duration = int(len(samples) / RATE * 1000000)
+        self.stream = SimpleNamespace(rate=RATE, time_base=Fraction(1, RATE),
+                                      layout=SimpleNamespace(name='mono', channels=[0]))
+        self.streams = SimpleNamespace(audio=[self.stream])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def seek(self, offset, stream=None):
+        self.position = offset // PACKET_FRAMES * PACKET_FRAMES
+
+    def demux(self, stream):
+        for start in range(self.position, len(self.samples), PACKET_FRAMES):
+            frame = SimpleNamespace(time=start / RATE, data=self.samples[start:start + PACKET_FRAMES])
+            yield SimpleNamespace(decode=lambda frame=frame: [frame])
+
+
+class FakeResampler:
+    def __init__(self, format, layout, rate):
+        assert (format, layout, rate) == ('s16', 'mono', RATE)
+
+    def resample(self, frame):
+        if frame is None:
+            return []
+        return [SimpleNamespace(to_ndarray=lambda: frame.data.reshape(1, -1))]
+
+
+def test_pyav_seeks_and_trims_to_the_in_out_range(monkeypatch):
+    samples = np.arange(10 * RATE, dtype=np.int64).astype('<i2')
+    monkeypatch.setitem(sys.modules, 'av', SimpleNamespace(open=lambda path: FakeContainer(samples),
+                                                           AudioResampler=FakeResampler, time_base=1000000))
+
+    chunks = list(decoders.decode_chunks('clip.m4a', 1234, 5678, chunk_frames=1000, backend='pyav'))
+    assert all(len(chunk) == 1000 for chunk in chunks[:-1])
+    assert np.array_equal(np.concatenate(chunks).reshape(-1), samples[int(1.234 * RATE):int(5.678 * RATE)])
+
+    source = decoders.decode_source('clip.m4a', 0, None, backend='pyav')
+    assert (source.frame_rate, source.channels, source.frame_count) == (RATE, 1, len(samples))
+    assert np.array_equal(source.read().reshape(-1), samples)
+
+
+def test_pyav_failures_fall_back_to_ffmpeg(monkeypatch):
+    class FFmpegError(OSError):
+        pass
+
+    def fail(path):
+        raise FFmpegError("codec not found")
+
+    samples = np.arange(2 * RATE, dtype='<i2').reshape(-1, 1)
+    calls = []
+
+    def ffmpeg_chunks(path, in_ms, out_ms, rate, channels, control):
+        calls.append((in_ms, out_ms, rate, channels))
+        yield samples
+
+    monkeypatch.setitem(sys.modules, 'av', SimpleNamespace(open=fail, FFmpegError=FFmpegError))
+    monkeypatch.setattr(decoders, 'available_backends', lambda: ['pyav', 'ffmpeg'])
+    monkeypatch.setattr(decoders, 'DEFAULT_BACKEND', 'auto')
+    monkeypatch.setattr(decoders, '_ffmpeg_chunks', ffmpeg_chunks)
+
+    chunks = list(decoders.decode_chunks('clip.m4a', 500, 2500, RATE, 1))
+    assert calls == [(500, 2500, RATE, 1)] and np.array_equal(chunks[0], samples)
+
+    # A backend chosen explicitly reports its own failure
+    with pytest.raises(FFmpegError):
+        list(decoders.decode_chunks('clip.m4a', 0, None, RATE, 1, backend='pyav'))
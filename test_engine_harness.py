@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Runs the differential harness on a small corpus: the accelerated engines must cut
+exactly where pydub and jumpcut.py's padding/keep-over loops do
+"""
+
+import shutil
+import tempfile
+
+import engine_harness
+
+
+def test_engines_match_reference():
+    directory = tempfile.mkdtemp()
+    try:
+        cases = engine_harness.generate_corpus(directory, seconds=4)
+        report = engine_harness.run_harness(cases[::3])
+        assert report['results']
+        mismatches = [record for record in report['results'] if not record['match']]
+        assert mismatches == []
+    finally:
+        shutil.rmtree(directory)
+
+
+def test_diff_reports_first_difference():
+    expected = [[0, 1000], [2000, 3000]]
+    assert engine_harness.diff_intervals(expected, [[0, 1001], [2000, 3000]])['match']
+    diff = engine_harness.diff_intervals(expected, [[0, 1000], [2005, 3000]])
+    assert not diff['match'] and diff['firstDifference']['index'] == 1
+    assert not engine_harness.diff_intervals(expected, expected[:1])['match']
+
+
+def test_approximate_engines_are_measured_not_checked():
+    def late_engine(path, in_ms, out_ms, params):
+        # Every silence starts 30 ms late, as an engine with another algorithm might
+        return [[start + 30, end] for start, end in engine_harness.numpy_engine(path, in_ms, out_ms, params)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        cases = engine_harness.generate_corpus(directory, seconds=4)[:1]
+        report = engine_harness.run_harness(cases, {'numpy': engine_harness.numpy_engine},
+                                            approximate={'late': late_engine})
+        assert [record['engine'] for record in report['results']] == ['numpy'] * len(report['results'])
+        assert report['summary']['numpy']['mismatches'] == 0
+        measured = report['approximate']['summary']['late']
+        assert measured['maxDeviation'] == 30 and 0 < measured['disagreement'] < 1
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the analysis job scheduler
+Covers priorities, superseded-job coalescing and cancellation of running engines
+"""
+
+import sys
+import threading
+
+import job_scheduler
+from job_scheduler import JobScheduler, PRIORITY_BATCH, PRIORITY_INTERACTIVE
+
+
+def blocking_job(release, cancel_event=None):
+    """Occupies a worker until released or cancelled"""
+    while not release.wait(0.01):
+        if cancel_event.is_set():
+            raise job_scheduler.JobCancelled()
+    return 'released'
+
+
+def record_job(name, order, cancel_event=None):
+    order.append(name)
+    return name
+
+
+def test_interactive_jobs_run_before_batch():
+    scheduler = JobScheduler(max_workers=1)
+    release = threading.Event()
+    order = []
+    try:
+        busy = scheduler.submit('busy.wav', blocking_job, release)
+        while busy.state != job_scheduler.RUNNING:
+            busy.wait(0.01)
+        batch = scheduler.submit('a.wav', record_job, 'batch', order, priority=PRIORITY_BATCH)
+        interactive = scheduler.submit('b.wav', record_job, 'interactive', order, priority=PRIORITY_INTERACTIVE)
+        assert scheduler.stats()['queued'] == 2
+        release.set()
+        assert batch.wait(5) and interactive.wait(5)
+        assert order == ['interactive', 'batch']
+    finally:
+        scheduler.shutdown()
+
+
+def test_newer_request_supersedes_queued_and_running_jobs():
+    scheduler = JobScheduler(max_workers=1)
+    release = threading.Event()
+    order = []
+    try:
+        running = scheduler.submit('clip.wav', blocking_job, release)
+        while running.state != job_scheduler.RUNNING:
+            running.wait(0.01)
+        queued = scheduler.submit('other.wav', record_job, 'stale', order)
+        queued_again = scheduler.submit('other.wav', record_job, 'fresh', order)
+        latest = scheduler.submit('clip.wav', record_job, 'latest', order)
+
+        assert running.wait(5) and latest.wait(5) and queued_again.wait(5)
+        assert running.state == job_scheduler.SUPERSEDED
+        assert queued.state == job_scheduler.SUPERSEDED
+        assert order == ['fresh', 'latest']
+    finally:
+        scheduler.shutdown()
+
+
+def test_cancel_terminates_engine_process():
+    scheduler = JobScheduler(max_workers=1)
+    try:
+        job = scheduler.submit_command('clip.wav', [sys.executable, '-c', 'import time; time.sleep(30)'])
+        while job.state != job_scheduler.RUNNING:
+            job.wait(0.01)
+        assert scheduler.cancel(job.id)
+        assert job.wait(10)
+        assert job.state == job_scheduler.CANCELLED
+        assert scheduler.stats()['running'] == 0
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the memory-mapped PCM reader and the vectorized loudness detector
+Checks that the fast path cuts in exactly the same places as pydub
+"""
+
+import os
+import tempfile
+import wave
+
+import numpy as np
+import pytest
+
+import loudness
+import pcm_reader
+
+
+def create_test_wav(sample_width=2, channels=1, frame_rate=16000, seconds=6.0, seed=0):
+    """Write a WAV with tone bursts separated by low-level noise"""
+    rng = np.random.default_rng(seed)
+    frames = int(frame_rate * seconds)
+    t = np.arange(frames) / frame_rate
+    envelope = (np.sin(t * 1.3) > 0.2) * 0.5
+    signal = envelope * np.sin(2 * np.pi * 220 * t)
+    samples = np.clip(signal[:, None] + rng.normal(0, 0.001, (frames, channels)), -1, 1)
+
+    scale = 2 ** (8 * sample_width - 1) - 1
+    if sample_width == 1:
+        data = (samples * scale + 128).astype(np.uint8)
+    elif sample_width == 3:
+        wide = (samples * scale).astype('<i4')
+        data = np.ascontiguousarray(wide.view(np.uint8).reshape(frames, channels, 4)[..., :3])
+    else:
+        data = (samples * scale).astype('<i%d' % sample_width)
+
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(frame_rate)
+        w.writeframes(data.tobytes())
+    return path
+
+
+def test_matches_pydub_detect_silence():
+    """Fast path and pydub agree for every supported sample width and window"""
+    from pydub import AudioSegment, silence
+
+    for sample_width in (1, 2, 3, 4):
+        path = create_test_wav(sample_width=sample_width, channels=2, frame_rate=44100)
+        try:
+            audio = AudioSegment.from_file(path, 'wav')
+            source = pcm_reader.open_pcm(path)
+            for in_point, out_point in [(0, len(audio)), (137, 5003)]:
+                for seek_step in (1, 50):
+                    expected = silence.detect_silence(audio[in_point:out_point], min_silence_len=300,
+                                                      silence_thresh=-30, seek_step=seek_step)
+                    actual = loudness.detect_silence(source.window(in_point, out_point), min_silence_len=300,
+                                                     silence_thresh=-30, seek_step=seek_step)
+                    assert actual == expected
+        finally:
+            os.remove(path)
+
+
+def test_window_is_a_view():
+    """Windows share the file mapping instead of copying samples"""
+    path = create_test_wav()
+    try:
+        source = pcm_reader.open_pcm(path)
+        window = source.window(1000, 2000)
+        assert window.frame_count == 16000
+        assert np.shares_memory(window.read(), source.read())
+    finally:
+        os.remove(path)
+
+
+def test_rejects_compressed_wav():
+    """Non-PCM payloads raise ValueError so callers fall back to ffmpeg"""
+    path = create_test_wav()
+    try:
+        with open(path, 'r+b') as f:
+            f.seek(20)
+            f.write((3).to_bytes(2, 'little'))  # WAVE_FORMAT_IEEE_FLOAT
+        with pytest.raises(ValueError):
+            pcm_reader.open_pcm(path)
+    finally:
+        os.remove(path)
+
+
+def test_auto_threshold_between_noise_and_speech():
+    """Auto mode finds the noise floor and speech level and cuts like a fixed threshold would"""
+    path = create_test_wav(seconds=20)
+    try:
+        source = pcm_reader.open_pcm(path)
+        silences, estimate = loudness.detect_silence_auto(source, min_silence_len=300, seek_step=50)
+        assert -70 < estimate['noiseFloor'] < -55
+        assert -12 < estimate['speechLevel'] < -6
+        assert estimate['noiseFloor'] < estimate['threshold'] < estimate['speechLevel']
+        assert silences == loudness.detect_silence(source, min_silence_len=300,
+                                                   silence_thresh=estimate['threshold'], seek_step=50)
+        assert len(silences) > 0
+    finally:
+        os.remove(path)
+
+
+def test_coarse_to_fine_matches_one_ms_scan():
+    """Refined edges equal a seek_step=1 scan, and snapped edges land on quiet points"""
+    for sample_width, channels, frame_rate in ((2, 1, 16000), (3, 2, 44100)):
+        path = create_test_wav(sample_width=sample_width, channels=channels, frame_rate=frame_rate, seconds=20)
+        try:
+            source = pcm_reader.open_pcm(path).window(137, 19003)
+            envelope = loudness.compute_envelope(source)
+            for min_silence_len, thresh, seek_step in [(300, -30, 50), (300, -50, 10), (1000, -40, 100), (40, -30, 50)]:
+                expected = loudness.silences_from_envelope(envelope, min_silence_len, thresh, 1)
+                assert loudness.coarse_to_fine_silences(envelope, min_silence_len, thresh, seek_step) == expected
+            assert len(expected) > 3
+
+            refined = loudness.detect_silence_refined(envelope, 300, -30, 50)
+            energy = loudness.detect_silence_refined(envelope, 300, -30, 50, snap='energy')
+            zero = loudness.detect_silence_refined(envelope, 300, -30, 50, snap='zero-crossing', source=source)
+            for (start, end), snapped, crossing in zip(refined[1:], energy[1:], zero[1:]):
+                assert abs(snapped[0] - start) <= loudness.SNAP_MS and abs(snapped[1] - end) <= loudness.SNAP_MS
+                assert envelope.energy[snapped[0]] <= envelope.energy[start]
+                frame = int(round(crossing[0] * frame_rate / 1000.0))
+                mono = source.read(frame - 1, frame + 1).reshape(2, -1).astype(np.int64).sum(axis=1)
+                assert np.signbit(mono[0]) != np.signbit(mono[1])
+        finally:
+            os.remove(path)
+
+
+def test_threaded_envelope_matches_single_thread():
+    """Chunks converted in parallel give bit-identical energies, also when stopped early"""
+    for sample_width in (2, 3):
+        path = create_test_wav(sample_width=sample_width, channels=2, frame_rate=44100, seconds=20)
+        try:
+            source = pcm_reader.open_pcm(path).window(137, 19003)
+            bounds = loudness.ms_boundaries(source.frame_rate, len(source))
+            expected = loudness.block_energy(source, bounds, chunk_ms=1000)
+            assert np.array_equal(loudness.block_energy(source, bounds, chunk_ms=1000, threads=4), expected)
+            stopped = loudness.block_energy(source, bounds, chunk_ms=1000, threads=4, should_stop=lambda ms: ms >= 5000)
+            assert np.array_equal(stopped, expected[:5000])
+        finally:
+            os.remove(path)
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Tests for memory budget planning and per-stage reporting
+"""
+
+import numpy as np
+
+import loudness
+import memory_budget
+
+
+def test_plan_fits_model_and_decoding_to_budget():
+    rss = (memory_budget.current_rss() or 0) / memory_budget.MB
+    roomy = memory_budget.plan_run(rss + 8000, 'whisper', 'medium', duration=600)
+    assert roomy['model'] == 'medium' and not roomy['modelDowngraded'] and not roomy['decodeToDisk']
+    assert roomy['chunkMs'] == loudness.CHUNK_MS
+
+    tight = memory_budget.plan_run(rss + 700, 'whisper', 'medium', duration=3600)
+    assert tight['model'] == 'base' and tight['modelDowngraded']
+    assert tight['decodeToDisk'] and tight['analysisRate'] == 16000
+    assert memory_budget.MIN_CHUNK_MS <= tight['chunkMs'] <= loudness.CHUNK_MS
+
+
+def test_tracker_reports_stage_allocations():
+    tracker = memory_budget.MemoryTracker(budget_mb=4096)
+    with tracker.stage('allocate'):
+        block = np.ones(4 * memory_budget.MB, dtype=np.uint8)
+        del block
+    report = tracker.report()
+    assert report['stages'][0]['stage'] == 'allocate'
+    assert report['stages'][0]['allocatedPeakMB'] >= 4
+    assert report['peakRssMB'] is None or report['peakRssMB'] > 0
+    memory_budget.tracemalloc.stop()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for the --profile archive
+"""
+
+import os
+import pstats
+import tracemalloc
+import zipfile
+
+import numpy as np
+
+import memory_budget
+import profiling
+import whisper_jumpcut
+
+
+def test_profile_archive_bundles_stats_snapshots_and_log(tmp_path):
+    log_path = tmp_path / 'run.log'
+    log_path.write_text('analysis log\n')
+    profiler = profiling.Profiler(str(log_path), argv=['jumpcut.py', 'clip.wav'])
+    control = whisper_jumpcut.RunControl(memory=memory_budget.MemoryTracker(4096), profiler=profiler)
+    profiler.start()
+    # The tracker started tracing first; the snapshots still get full tracebacks
+    assert tracemalloc.get_traceback_limit() == profiling.TRACEBACK_FRAMES
+    with control.stage('decode'):
+        block = np.ones(2 * memory_budget.MB, dtype=np.uint8)
+    with control.stage('detect'):
+        del block
+    archive = profiler.finish()
+    tracemalloc.stop()
+
+    assert os.path.dirname(archive) == str(tmp_path)
+    with zipfile.ZipFile(archive) as bundle:
+        names = set(bundle.namelist())
+        assert {'profile.pstats', 'hotspots.txt', 'run.log',
+                'memory-00-decode.txt', 'memory-00-decode.snapshot',
+                'memory-01-detect.txt', 'memory-01-detect.snapshot'} <= names
+        hotspots = bundle.read('hotspots.txt').decode()
+        bundle.extract('profile.pstats', tmp_path / 'out')
+    assert 'jumpcut.py clip.wav' in hotspots and 'decode' in hotspots
+    assert pstats.Stats(str(tmp_path / 'out' / 'profile.pstats')).total_calls > 0
+    assert [s['stage'] for s in control.memory.stages] == ['decode', 'detect']
+    assert not os.path.exists(profiler.directory)
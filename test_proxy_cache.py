@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared 16 kHz audio proxies
+"""
+
+import os
+
+import numpy as np
+
+import pcm_reader
+import proxy_cache
+import transcribe_pipeline
+from test_loudness import create_test_wav
+
+
+def test_proxy_build_load_window_and_prune(tmp_path):
+    path = create_test_wav(channels=2, frame_rate=44100, seconds=40)
+    try:
+        assert proxy_cache.load_proxy(path, str(tmp_path)) is None
+        proxy = proxy_cache.ensure_proxy(path, cache_dir=str(tmp_path))
+        assert (proxy.frame_rate, proxy.channels, proxy.sample_width) == (16000, 1, 2)
+        assert proxy.frame_count == 40 * 16000
+
+        # Same samples as converting the source directly, up to 16-bit rounding
+        source = pcm_reader.open_pcm(path)
+        expected = transcribe_pipeline.whisper_audio(source, 0, 44100 * 5)
+        assert np.abs(proxy.read(0, 80000).reshape(-1) / 32768.0 - expected).max() < 1e-4
+
+        loaded = proxy_cache.load_proxy(path, str(tmp_path))
+        assert loaded is not None and loaded.path == proxy.path
+
+        target = str(tmp_path / 'window.wav')
+        proxy_cache.write_window(loaded, 1500, 31500, target)
+        window = pcm_reader.open_pcm(target)
+        assert window.frame_count == 30 * 16000
+        assert np.array_equal(window.read(), proxy.window(1500, 31500).read())
+
+        # A truncated proxy is a miss, and pruning removes proxies over the budget
+        with open(proxy.path, 'r+b') as f:
+            f.truncate(1000)
+        assert proxy_cache.load_proxy(path, str(tmp_path)) is None
+        proxy_cache.prune(str(tmp_path), max_mb=0)
+        assert not os.path.exists(proxy.path)
+        assert not os.path.exists(proxy.path[:-len('.wav')] + '.json')
+    finally:
+        os.remove(path)
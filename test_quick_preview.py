@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Tests for two-phase (preview, then refine) results
+"""
+
+import os
+
+import analysis_cache
+import quick_preview
+import whisper_jumpcut
+from test_loudness import create_test_wav
+
+PARAMS = {'silenceCutoff': -30, 'removeOver': 0.3, 'keepOver': 0.1, 'padding': 0.05, 'method': 'vad', 'start': 2}
+
+
+def test_changes_rebuild_the_refined_silences(monkeypatch, tmp_path):
+    monkeypatch.setattr(analysis_cache, 'CACHE_DIR', str(tmp_path))
+    path = create_test_wav(frame_rate=16000, seconds=20)
+    try:
+        params = whisper_jumpcut.parse_jumpcut_params(PARAMS)
+        previews = []
+        result, silences = quick_preview.two_phase(path, params, whisper_jumpcut.RunControl(), emit=previews.append)
+
+        expected = whisper_jumpcut.analyze(path, params)['silences']
+        assert silences == expected
+        assert result['phase'] == 'final' and 'silences' not in result
+        assert len(previews) == 1 and previews[0]['phase'] == 'preview'
+        assert result['changes']['added'] and result['changes']['removed']
+        assert quick_preview.apply_changes(previews[0]['silences'][:-1], result['changes'], result['flag']) == expected
+    finally:
+        os.remove(path)
+
+
+def test_preview_stops_at_its_deadline_but_not_the_run():
+    control = whisper_jumpcut.RunControl()
+    child = control.child(-1)
+    assert child.stopped and child.reason == 'deadline' and not control.stopped
+    child = control.child(60)
+    control.stop('cancelled')
+    assert child.stopped and child.reason == 'cancelled'
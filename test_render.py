@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless render path (ffmpeg command construction; no ffmpeg needed)
+"""
+
+import render
+
+
+def test_kept_ranges_from_engine_output():
+    # Clip starts 5 s into the media and sits at 100 s on the timeline
+    silences = [[100.0, 101.0], [103.0, 104.5], [109.99, 111.0], 1]
+    assert render.kept_ranges(silences, in_point=5.0, out_point=15.0, start=100.0) == [[6.0, 8.0], [9.5, 14.99]]
+    # Without an out point the last range runs to the end of the media
+    assert render.kept_ranges([[2.0, 3.0], 0], 0.0, None) == [[0.0, 2.0], [3.0, None]]
+
+
+def test_filter_graph_and_keyframes():
+    ranges = [[0.0, 2.0], [3.5, None]]
+    assert render.filter_graph(ranges, video=False, audio=True) == (
+        "[0:a]atrim=start=0.0:end=2.0,asetpts=PTS-STARTPTS[a0];"
+        "[0:a]atrim=start=3.5,asetpts=PTS-STARTPTS[a1];"
+        "[a0][a1]concat=n=2:v=0:a=1[outa]")
+
+    many = [[i * 2.0, i * 2.0 + 1] for i in range(render.MAX_CONCAT_SEGMENTS + 1)]
+    graph = render.filter_graph(many)
+    assert graph.count('[0:v]select=') == 1 and graph.count('[0:a]aselect=') == 1 and 'concat' not in graph
+
+    keyframes = [0.0, 2.0, 4.0, 6.0]
+    assert render.starts_on_keyframes([[0.0, 1.0], [4.01, 5.0]], keyframes)
+    assert not render.starts_on_keyframes([[0.0, 1.0], [3.0, 5.0]], keyframes)
+    assert "file '/media/it'\\''s.mp4'" in render.concat_list("/media/it's.mp4", ranges)
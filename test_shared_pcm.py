@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Tests for sharing PCM with worker processes
+"""
+
+import os
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+import pcm_reader
+import shared_pcm
+import spectral_vad
+from test_loudness import create_test_wav
+
+
+def _checksum(descriptor, start_frame, stop_frame):
+    return int(shared_pcm.attach(descriptor, start_frame, stop_frame).read().astype(np.int64).sum())
+
+
+def _crash(descriptor, start_frame, stop_frame):
+    os._exit(1)
+
+
+def decoded_source(seconds=20, channels=2, frame_rate=16000):
+    """Audio held in memory, like a pydub decode"""
+    samples = np.random.default_rng(0).normal(0, 3000, (seconds * frame_rate, channels)).astype('<i2')
+    samples[frame_rate:3 * frame_rate] //= 100
+    source = pcm_reader.PCMSource(None, frame_rate, channels, 2, 0, len(samples))
+    source._memmap = samples
+    return source
+
+
+def test_workers_see_the_same_samples():
+    path = create_test_wav(sample_width=3, channels=2, frame_rate=44100)
+    try:
+        for source, scratch, kind in [(decoded_source(), False, 'shm'), (decoded_source(), True, 'scratch'),
+                                      (pcm_reader.open_pcm(path).window(137, 5003), False, 'file')]:
+            with shared_pcm.SharedPCM(source, scratch=scratch) as shared:
+                assert shared.descriptor.kind == kind
+                boundaries = [0, 1000, 5000, source.frame_count]
+                sums = shared_pcm.map_frames(_checksum, shared, boundaries, workers=2)
+                expected = [int(source.read(a, b).astype(np.int64).sum()) for a, b in zip(boundaries, boundaries[1:])]
+                assert sums == expected
+                descriptor = shared.descriptor
+            if kind == 'shm':
+                with pytest.raises(FileNotFoundError):
+                    shared_memory.SharedMemory(name=descriptor.name)
+            if kind == 'scratch':
+                assert not os.path.exists(descriptor.name)
+    finally:
+        os.remove(path)
+
+
+def test_parallel_vad_features_match_and_crashes_release_memory():
+    source = decoded_source()
+    expected = spectral_vad.frame_features(source)
+    actual = spectral_vad.frame_features_parallel(source, processes=2)
+    for key in expected:
+        assert np.array_equal(expected[key], actual[key])
+
+    with pytest.raises(BrokenProcessPool):
+        with shared_pcm.SharedPCM(source) as shared:
+            shared_pcm.map_frames(_crash, shared, [0, 100, 200], workers=2)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=shared.descriptor.name)
+
+
+def test_sweep_removes_scratch_of_dead_processes(tmp_path):
+    stale = tmp_path / f"{shared_pcm.SCRATCH_PREFIX}999999999-x.raw"
+    live = tmp_path / f"{shared_pcm.SCRATCH_PREFIX}{os.getpid()}-y.raw"
+    stale.write_bytes(b'0')
+    live.write_bytes(b'0')
+    shared_pcm.sweep_scratch(str(tmp_path))
+    assert not stale.exists() and live.exists()
+
+
+def test_sweep_never_signals_processes_on_windows(tmp_path, monkeypatch):
+    def kill(pid, sig):
+        raise AssertionError("os.kill terminates processes on Windows")
+
+    scratch = tmp_path / f"{shared_pcm.SCRATCH_PREFIX}{os.getpid() + 1}-z.raw"
+    scratch.write_bytes(b'0')
+    monkeypatch.setattr(shared_pcm.os, 'kill', kill)
+    monkeypatch.setattr(shared_pcm.os, 'name', 'nt')
+    monkeypatch.setattr(shared_pcm, '_windows_pid_alive', lambda pid: True)
+    shared_pcm.sweep_scratch(str(tmp_path))
+    assert scratch.exists()
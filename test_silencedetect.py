@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the ffmpeg silencedetect engine's log parsing (no ffmpeg needed)
+"""
+
+import silencedetect
+
+LOG = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'clip.mp4':
+  Duration: 00:00:12.50, start: 0.000000, bitrate: 1000 kb/s
+[silencedetect @ 0x5581] silence_start: -0.0005
+[silencedetect @ 0x5581] silence_end: 1.25 | silence_duration: 1.2505
+[silencedetect @ 0x5581] silence_start: 4.1
+[silencedetect @ 0x5581] silence_end: 6.0203 | silence_duration: 1.9203
+[silencedetect @ 0x5581] silence_start: 9.5
+size=N/A time=00:00:10.00 bitrate=N/A speed= 300x
+"""
+
+
+def test_events_pair_into_silences():
+    items = list(silencedetect.iter_silences(silencedetect.parse_events(LOG.splitlines()), in_ms=2000))
+    # Times are relative to the in point; the open silence runs to the end of the media
+    assert items == [[0, 1250], [4100, 6020], [9500, 10500], ('length', 10500)]
+
+    items = list(silencedetect.iter_silences(silencedetect.parse_events(LOG.splitlines()), in_ms=2000, out_ms=11000))
+    # An out point before the open silence drops it
+    assert items == [[0, 1250], [4100, 6020], ('length', 9000)]
+
+
+def test_exponent_times_are_read_whole():
+    log = ["[silencedetect @ 0x5581] silence_start: 5e-05",
+           "[silencedetect @ 0x5581] silence_end: 1.5 | silence_duration: 1.49995",
+           "[silencedetect @ 0x5581] silence_start: -2.5e-05",
+           "[silencedetect @ 0x5581] silence_end: 1.2e+01 | silence_duration: 12"]
+    items = list(silencedetect.iter_silences(silencedetect.parse_events(log), out_ms=20000))
+    assert items == [[0, 1500], [0, 12000], ('length', 20000)]
+
+
+def test_command_maps_panel_values():
+    cmd = silencedetect.command('clip.mp4', -45, 800, in_ms=1500, out_ms=9500)
+    assert cmd[cmd.index('-ss') + 1] == '1.5' and cmd[cmd.index('-t') + 1] == '8.0'
+    assert 'silencedetect=noise=-45dB:d=0.8' in cmd
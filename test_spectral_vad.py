@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the spectral VAD engine
+"""
+
+import os
+import tempfile
+import wave
+
+import numpy as np
+
+import pcm_reader
+import spectral_vad
+
+
+def create_noisy_speech_wav(seconds=18, frame_rate=16000, noise=0.05, seed=0):
+    """Harmonic 'voice' for the first 3 s of every 6 s, over loud white room noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(frame_rate * seconds)) / frame_rate
+    phase = 2 * np.pi * np.cumsum(140 + 20 * np.sin(2 * np.pi * 0.7 * t)) / frame_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 15)) * 0.15
+    signal = voice * ((t % 6) < 3) + rng.normal(0, noise, len(t))
+
+    fd, path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(frame_rate)
+        w.writeframes((np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes())
+    return path
+
+
+def test_finds_speech_in_noisy_room():
+    path = create_noisy_speech_wav()
+    try:
+        regions, processed = spectral_vad.speech_regions(pcm_reader.open_pcm(path))
+        assert processed == 18.0
+        assert len(regions) == 3
+        for (start, end), expected in zip(regions, (0, 6, 12)):
+            assert abs(start - expected) < 0.1 and abs(end - (expected + 3)) < 0.1
+    finally:
+        os.remove(path)
+
+
+def test_stops_between_chunks():
+    path = create_noisy_speech_wav()
+    try:
+        regions, processed = spectral_vad.speech_regions(pcm_reader.open_pcm(path),
+                                                         should_stop=lambda position_ms: position_ms >= 10000)
+        assert processed == 10.0
+        assert regions[0][0] < 0.1
+    finally:
+        os.remove(path)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for tail mode: incremental detection over a recording that is still growing
+"""
+
+import json
+import os
+import random
+import struct
+import threading
+import time
+
+import numpy as np
+
+import loudness
+import pcm_reader
+import tail_mode
+import whisper_jumpcut
+from test_loudness import create_test_wav
+from test_transcribe_pipeline import ContextModel
+
+PARAMS = [(1000, -40, 50, 100, 300), (300, -30, 7, 50, 100)]
+
+
+def batch_silences(source, min_len, thresh, seek_step, padding, keep_over):
+    silences = loudness.silences_from_envelope(loudness.compute_envelope(source), min_len, thresh, seek_step)
+    silences = loudness.merge_keep_over(loudness.pad_silences(silences, padding, len(source)), keep_over)
+    return [[s[0] / 1000.0, s[1] / 1000.0] for s in silences]
+
+
+def test_incremental_matches_one_pass():
+    path = create_test_wav(channels=2, frame_rate=44100, seconds=15)
+    rng = random.Random(0)
+    try:
+        source = pcm_reader.open_pcm(path)
+        for params in PARAMS:
+            detector = tail_mode.LoudnessTail(*params)
+            position = 0
+            while position < len(source):
+                position = min(len(source), position + rng.choice([1, 45, 700, 2500]))
+                detector.feed(source.window(0, position))
+            detector.finish()
+            assert detector.silences() == batch_silences(source, *params)
+    finally:
+        os.remove(path)
+
+
+def test_whisper_tail_keeps_speech_across_window_edges(monkeypatch):
+    path = create_test_wav(frame_rate=16000, seconds=30)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: ContextModel())
+    try:
+        expected = whisper_jumpcut.detect_silences_with_whisper(path, removeOver=100, padding=0)
+        source = pcm_reader.open_pcm(path)
+        # 5 s windows put edges inside bursts, which the model drops when too little is left
+        detector = tail_mode.WhisperTail(min_silence_length=0.1, padding=0.0, window_seconds=5)
+        for seconds in range(3, 30, 3):
+            detector.feed(source.window(0, seconds * 1000))
+        detector.finish(source)
+        assert len(expected) > 3
+        assert np.allclose(detector.silences(), expected)
+    finally:
+        os.remove(path)
+
+
+def test_follow_growing_recording(tmp_path):
+    finished = create_test_wav(seconds=8)
+    recording = str(tmp_path / 'recording.wav')
+    output = str(tmp_path / 'recording.json')
+    try:
+        with open(finished, 'rb') as f:
+            data = f.read()
+        data_offset = pcm_reader.open_pcm(finished).data_offset
+        # Recorders leave the data size at 0 until they stop
+        header = data[:data_offset - 4] + struct.pack('<I', 0)
+
+        def record():
+            with open(recording, 'wb') as f:
+                f.write(header)
+                for i in range(data_offset, len(data), 32000):
+                    f.write(data[i:i + 32000])
+                    f.flush()
+                    time.sleep(0.02)
+
+        with open(recording, 'wb') as f:
+            f.write(header)
+        recorder = threading.Thread(target=record)
+        recorder.start()
+        detector = tail_mode.LoudnessTail(*PARAMS[0])
+        result = tail_mode.follow(recording, detector, output, start=5.0, poll_seconds=0.01, idle_seconds=0.5)
+        recorder.join()
+
+        expected = [[s[0] + 5.0, s[1] + 5.0] for s in batch_silences(pcm_reader.open_pcm(finished), *PARAMS[0])]
+        assert result['complete'] and result['silences'][:-1] == expected
+        with open(output) as f:
+            assert json.load(f) == result
+    finally:
+        os.remove(finished)
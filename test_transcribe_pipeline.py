@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the overlapped decode/transcribe pipeline and resumable transcriptions, with a
+stand-in for the Whisper model
+"""
+
+import os
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+import checkpoints
+import transcribe_pipeline
+import whisper_jumpcut
+from test_loudness import create_test_wav
+
+PARAMS = {'removeOver': 300, 'padding': 50, 'in': 700, 'out': 11300}
+
+
+class LoudnessModel:
+    """Reports every run of loud 100 ms frames as a speech segment"""
+
+    def transcribe(self, samples, **kwargs):
+        frames = samples[:len(samples) // 1600 * 1600].reshape(-1, 1600)
+        loud = np.sqrt(np.mean(frames ** 2, axis=1)) > 0.05
+        segments, start = [], None
+        for i, value in enumerate(np.append(loud, False)):
+            if value and start is None:
+                start = i
+            elif not value and start is not None:
+                segments.append(SimpleNamespace(start=start * 0.1, end=i * 0.1, text='speech'))
+                start = None
+        return iter(segments), SimpleNamespace(language='en', duration=len(samples) / 16000)
+
+
+class ContextModel(LoudnessModel):
+    """Like Whisper's VAD, ignores speech shorter than 0.3 s, so a burst cut by a window edge can vanish"""
+
+    def transcribe(self, samples, **kwargs):
+        if isinstance(samples, str):
+            samples = whisper_jumpcut.resume_audio(samples, 0)
+        segments, info = super().transcribe(samples, **kwargs)
+        return iter([segment for segment in segments if segment.end - segment.start >= 0.3]), info
+
+
+def test_pipelined_silences_match_the_single_pass(monkeypatch):
+    path = create_test_wav(frame_rate=16000, seconds=30)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: ContextModel())
+    # Without overlap, the edge at 5 s leaves 0.1 s of a burst in the first window, which the model drops
+    monkeypatch.setattr(transcribe_pipeline, 'WINDOW_SECONDS', 5)
+    try:
+        params = {'removeOver': 100, 'padding': 0}
+        expected = whisper_jumpcut.detect_silences_with_whisper(path, **params)
+        assert len(expected) > 3
+        assert np.allclose(whisper_jumpcut.detect_silences_pipelined(path, **params), expected)
+    finally:
+        os.remove(path)
+
+
+def test_window_size_does_not_change_silences(monkeypatch):
+    path = create_test_wav(frame_rate=16000, seconds=12)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: LoudnessModel())
+    try:
+        monkeypatch.setattr(transcribe_pipeline, 'WINDOW_SECONDS', 30)
+        whole = whisper_jumpcut.detect_silences_pipelined(path, **PARAMS)
+        monkeypatch.setattr(transcribe_pipeline, 'WINDOW_SECONDS', 1)
+        monkeypatch.setattr(transcribe_pipeline, 'QUEUE_WINDOWS', 1)
+        windowed = whisper_jumpcut.detect_silences_pipelined(path, **PARAMS)
+
+        assert len(whole) > 1
+        assert np.allclose(whole, windowed)
+        # Times are relative to the in point and end at the out point
+        assert whole[-1][1] <= 10.6 + 1e-9
+    finally:
+        os.remove(path)
+
+
+def test_interrupted_transcription_resumes_from_checkpoint(monkeypatch, tmp_path):
+    class FileModel(LoudnessModel):
+        def transcribe(self, samples, **kwargs):
+            if isinstance(samples, str):
+                samples = whisper_jumpcut.resume_audio(samples, 0)
+            return super().transcribe(samples, **kwargs)
+
+    path = create_test_wav(frame_rate=16000, seconds=12)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: FileModel())
+    monkeypatch.setattr(transcribe_pipeline, 'WINDOW_SECONDS', 1)
+    try:
+        expected, _ = whisper_jumpcut.transcribe(path)
+        pipelined, _ = transcribe_pipeline.transcribe_pipelined(path)
+
+        for run in (whisper_jumpcut.transcribe, transcribe_pipeline.transcribe_pipelined):
+            checkpoint = checkpoints.Checkpoint(path, {'engine': run.__name__}, str(tmp_path))
+            cancel = threading.Event()
+            seen = []
+
+            def stop_after_two(segment):
+                seen.append(segment)
+                if len(seen) == 2:
+                    cancel.set()
+
+            control = whisper_jumpcut.RunControl(cancel_event=cancel)
+            run(path, control=control, on_segment=stop_after_two, checkpoint=checkpoint)
+            assert os.path.exists(checkpoint.path)
+
+            checkpoint = checkpoints.Checkpoint(path, {'engine': run.__name__}, str(tmp_path))
+            segments, _ = run(path, checkpoint=checkpoint)
+            assert checkpoint.resumed_from > 0
+            assert np.allclose([s[:2] for s in segments],
+                               [s[:2] for s in (expected if run is whisper_jumpcut.transcribe else pipelined)])
+            assert not os.path.exists(checkpoint.path)
+    finally:
+        os.remove(path)
+
+
+def test_other_parameters_keep_their_own_job_file(monkeypatch, tmp_path):
+    path = create_test_wav(frame_rate=16000, seconds=4)
+    monkeypatch.setattr(whisper_jumpcut, 'load_model', lambda *args: LoudnessModel())
+    try:
+        interrupted = checkpoints.Checkpoint(path, {'model': 'base', 'in': 0}, str(tmp_path))
+        interrupted.update([], 2.0, 'en', force=True)
+
+        other = checkpoints.Checkpoint(path, {'model': 'base', 'in': 1000}, str(tmp_path))
+        transcribe_pipeline.transcribe_pipelined(path, checkpoint=other)
+        assert other.path != interrupted.path and not os.path.exists(other.path)
+
+        resumed = checkpoints.Checkpoint(path, {'in': 0, 'model': 'base'}, str(tmp_path))
+        assert resumed.load() == (2.0, [], 'en')
+    finally:
+        os.remove(path)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Tests for the waveform envelope pyramid behind the panel preview
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import analysis_cache
+import pcm_reader
+import waveform
+from test_loudness import create_test_wav
+
+
+def test_query_matches_samples():
+    """Every column covers exactly the samples of its time range, at any zoom level"""
+    path = create_test_wav(seconds=10)
+    try:
+        source = pcm_reader.open_pcm(path)
+        pyramid = waveform.build_pyramid(source)
+        samples = source.read(0, source.frame_count).reshape(source.frame_count, -1) / source.max_possible_amplitude
+
+        for start_ms, end_ms, pixels in ((0, 10000, 600), (1234, 1834, 600), (0, 10000, 37)):
+            columns = pyramid.query(start_ms, end_ms, pixels)
+            assert len(columns['min']) == len(columns['max']) == len(columns['rms']) == pixels
+            bucket = columns['bucketMs']
+            assert bucket <= (end_ms - start_ms) / pixels or columns['level'] == 0
+
+            # Column i spans the buckets starting inside it
+            edges = np.linspace(start_ms, end_ms, pixels + 1)
+            for i in (0, pixels // 2, pixels - 1):
+                first = int(edges[i] // bucket)
+                last = max(int(edges[i + 1] // bucket), first + 1) if i < pixels - 1 else \
+                    max(int(np.ceil(edges[-1] / bucket)), first + 1)
+                f0 = int(first * bucket * source.frame_rate / 1000)
+                f1 = min(int(last * bucket * source.frame_rate / 1000), source.frame_count)
+                assert abs(columns['max'][i] - samples[f0:f1].max()) < 1e-3
+                assert abs(columns['min'][i] - samples[f0:f1].min()) < 1e-3
+    finally:
+        os.remove(path)
+
+
+def test_pyramid_cache_round_trip():
+    path = create_test_wav(seconds=3)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        pyramid = waveform.build_pyramid(pcm_reader.open_pcm(path))
+        assert analysis_cache.load_pyramid(path, cache_dir) is None
+        analysis_cache.save_pyramid(path, pyramid, cache_dir)
+        loaded = analysis_cache.load_pyramid(path, cache_dir)
+        assert len(loaded.levels) == len(pyramid.levels)
+        assert loaded.query(500, 2500, 100) == pyramid.query(500, 2500, 100)
+    finally:
+        os.remove(path)
+        shutil.rmtree(cache_dir)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Overlapped decode/transcribe pipeline for the Whisper method
+A decoder thread pushes fixed-length 16 kHz PCM windows of the in/out range into a
+bounded queue while Whisper transcribes the previous ones, so decoding, model loading
+and transcription overlap instead of running one after the other, no temporary WAV is
+written and no ffprobe run is needed (the duration is the number of samples decoded)
+
+Consecutive windows share a few seconds of audio, so speech crossing a window edge is
+heard whole by one of them; segments found twice in the shared stretch are dropped
+"""
+
+import logging
+import queue
+import threading
+
+import numpy as np
+
+import analysis_cache
+import decoders
+import pcm_reader
+import proxy_cache
+
+WHISPER_RATE = 16000
+
+# Whisper works on 30 s windows; decoding in the same size keeps one window per call
+WINDOW_SECONDS = 30
+
+# Windows decoded ahead of the transcriber; bounds memory at about 2 MB per window
+QUEUE_WINDOWS = 4
+
+# Seconds at the end of a window transcribed again at the start of the next one
+OVERLAP_SECONDS = 5
+
+
+def window_overlap(window_seconds=None):
+    """Overlap (s) of consecutive windows; at most half a window"""
+    return min(OVERLAP_SECONDS, (window_seconds or WINDOW_SECONDS) / 2.0)
+
+
+def whisper_audio(source, f0, f1):
+    """Frames [f0, f1) of a PCMSource as float32 mono samples at 16 kHz"""
+    mono = source.read(f0, f1).reshape(f1 - f0, -1).astype(np.float32).mean(axis=1) / source.max_possible_amplitude
+    if source.frame_rate != WHISPER_RATE:
+        # Linear interpolation is plenty for speech detection
+        positions = np.arange(int(len(mono) * WHISPER_RATE / source.frame_rate)) * (source.frame_rate / WHISPER_RATE)
+        mono = np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+    return mono
+
+
+def _pcm_windows(source, window_seconds):
+    """Windows of a memory-mapped PCMSource, mixed to mono and resampled to 16 kHz"""
+    frames_per_window = int(window_seconds * source.frame_rate)
+    for f0 in range(0, source.frame_count, frames_per_window):
+        f1 = min(f0 + frames_per_window, source.frame_count)
+        yield f0 / source.frame_rate, whisper_audio(source, f0, f1)
+
+
+def transcribe_window(model, samples, offset, language=None):
+    """
+    Whisper segments of one window, shifted by its offset (s)
+
+    Returns:
+        (segments, language) with analysis_cache.Segment entries, lazily transcribed,
+        and the language to use for the following windows
+    """
+    segments, info = model.transcribe(samples, language=language, word_timestamps=True, vad_filter=True)
+    # Detect the language once; a window of trailing silence would guess it badly
+    language = language or getattr(info, 'language', None)
+    shifted = (analysis_cache.shift_segment(analysis_cache.to_segment(segment), offset) for segment in segments)
+    return shifted, language
+
+
+class OverlappedWindows:
+    """
+    Transcribes consecutive windows with the end of each one heard again at the start
+    of the next, and passes on every speech segment once. Segments starting in the
+    shared stretch are held back, since the next window hears them whole; flush()
+    returns those of the last window.
+    """
+
+    def __init__(self, window_seconds=None, covered=0.0):
+        """
+        Args:
+            window_seconds: Audio the model gets per window, overlap included
+            covered: End (s) of the speech already passed on, e.g. by a resumed run
+        """
+        self.overlap_frames = int(round(window_overlap(window_seconds) * WHISPER_RATE))
+        # Fresh audio per window; the model still gets window_seconds with the overlap
+        self.step_seconds = (window_seconds or WINDOW_SECONDS) - self.overlap_frames / WHISPER_RATE
+        self.covered = covered
+        self.tail = np.zeros(0, dtype=np.float32)
+        self.held = []
+
+    def transcribe(self, model, offset, samples, language=None):
+        """
+        Transcribe a window (fresh samples starting at offset s) after the previous tail.
+
+        Returns:
+            (segments, cut, language): the new segments starting before cut, lazily
+            transcribed; cut, where the next window's fresh audio hears speech whole;
+            and the language for the following windows
+        """
+        audio = np.concatenate((self.tail, samples))
+        segments, language = transcribe_window(model, audio, offset - len(self.tail) / WHISPER_RATE, language)
+        self.tail = audio[max(0, len(audio) - self.overlap_frames):]
+        cut = offset + (len(samples) - len(self.tail)) / WHISPER_RATE
+        self.held = []
+        return self._new(segments, cut), cut, language
+
+    def _new(self, segments, cut):
+        for segment in segments:
+            # Ends before what was passed on: found already by the previous window
+            if segment.end <= self.covered:
+                continue
+            if segment.start >= cut:
+                self.held.append(segment)
+                continue
+            self.covered = max(self.covered, segment.end)
+            yield segment
+
+    def flush(self):
+        """Segments of the last window's shared stretch, once nothing follows it"""
+        held, self.held = self.held, []
+        for segment in held:
+            self.covered = max(self.covered, segment.end)
+        return held
+
+
+def _decoded_windows(audio_path, in_ms, out_ms, window_seconds, control):
+    """Windows decoded to 16 kHz mono by PyAV in-process, or by an ffmpeg subprocess"""
+    offset = 0.0
+    for chunk in decoders.decode_chunks(audio_path, in_ms, out_ms, WHISPER_RATE, 1,
+                                        chunk_frames=int(window_seconds * WHISPER_RATE), control=control):
+        samples = chunk.reshape(-1).astype(np.float32) / 32768.0
+        yield offset, samples
+        offset += len(samples) / WHISPER_RATE
+
+
+def decode_windows(audio_path, in_ms=0, out_ms=None, control=None, window_seconds=None):
+    """
+    Fixed-length windows of the in/out range of a media file.
+
+    Yields:
+        (offset, samples) with the window start in seconds from in_ms and float32
+        mono samples at 16 kHz
+    """
+    window_seconds = window_seconds or WINDOW_SECONDS
+    if control is None:
+        import whisper_jumpcut
+        control = whisper_jumpcut.RunControl()
+    if pcm_reader.is_pcm_file(audio_path):
+        try:
+            source = pcm_reader.open_pcm(audio_path).window(in_ms, out_ms)
+        except ValueError as e:
+            logging.debug(f"PCM fast path unavailable, decoding the file: {e}")
+        else:
+            yield from _pcm_windows(source, window_seconds)
+            return
+    else:
+        # Compressed media decoded earlier (by an analysis run or the indexer)
+        proxy = proxy_cache.load_proxy(audio_path)
+        if proxy is not None:
+            yield from _pcm_windows(proxy.window(in_ms, out_ms), window_seconds)
+            return
+    yield from _decoded_windows(audio_path, in_ms, out_ms, window_seconds, control)
+
+
+def transcribe_pipelined(audio_path, model_size="base", language=None, control=None, in_ms=0, out_ms=None,
+                         on_segment=None, cpu_threads=0, checkpoint=None):
+    """
+    Transcribe the in/out range of a file while it is being decoded.
+
+    Args:
+        on_segment: Optional callback invoked with every analysis_cache.Segment as it arrives
+        checkpoint: Optional checkpoints.Checkpoint; saved after completed windows, and a
+            rerun continues after the last one (its segments are passed to on_segment first)
+        Other arguments as for whisper_jumpcut.transcribe(); in_ms/out_ms select the range
+
+    Returns:
+        (segments, duration) with segment times in seconds from in_ms and the number
+        of seconds decoded
+    """
+    import whisper_jumpcut
+
+    control = control or whisper_jumpcut.RunControl()
+    collected, position = [], 0.0
+    resumed = checkpoint.load() if checkpoint is not None else None
+    if resumed is not None:
+        position, collected, language = round(resumed[0], 3), resumed[1], resumed[2] or language
+        print(f"Resuming transcription at {position:.0f} s")
+        if on_segment is not None:
+            for segment in collected:
+                on_segment(segment)
+    # Segments and position of the windows transcribed completely
+    done = [len(collected), position]
+    # Segments ending before the last one collected are duplicates
+    overlapped = OverlappedWindows(covered=max((segment.end for segment in collected), default=0.0))
+
+    windows = queue.Queue(maxsize=QUEUE_WINDOWS)
+    decoded = [position]
+    failure = []
+    finished = threading.Event()
+
+    def put(item):
+        # Give up when the consumer has stopped and the queue stays full
+        while not control.stopped and not finished.is_set():
+            try:
+                windows.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def decode():
+        try:
+            for offset, samples in decode_windows(audio_path, in_ms + int(round(position * 1000)), out_ms, control,
+                                                  overlapped.step_seconds):
+                offset += position
+                decoded[0] = offset + len(samples) / WHISPER_RATE
+                if not put((offset, samples)):
+                    return
+        except Exception as e:
+            failure.append(e)
+        finally:
+            put(None)
+
+    decoder = threading.Thread(target=decode, name='whisper-decoder', daemon=True)
+    decoder.start()
+
+    try:
+        # The model loads while the first windows are decoded
+        with control.stage('model'):
+            model = whisper_jumpcut.load_model(model_size, cpu_threads)
+
+        def commit(segment):
+            collected.append(segment)
+            if on_segment is not None:
+                on_segment(segment)
+
+        print("Transcribing audio...")
+        with control.stage('transcribe'):
+            while not control.stopped:
+                try:
+                    item = windows.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    # Nothing follows the last window, so its shared stretch is kept
+                    for segment in overlapped.flush():
+                        commit(segment)
+                    break
+                offset, samples = item
+                segments, cut, language = overlapped.transcribe(model, offset, samples, language)
+                for segment in segments:
+                    commit(segment)
+                    if control.stopped:
+                        break
+                if control.stopped:
+                    break
+                done[:] = [len(collected), cut]
+                if checkpoint is not None:
+                    checkpoint.update(collected, done[1], language)
+                print(f"Transcribed {offset + len(samples) / WHISPER_RATE:.0f} s")
+    finally:
+        # Unblocks the decoder if transcription failed or stopped
+        finished.set()
+        decoder.join(timeout=5)
+    if failure and not control.stopped:
+        raise failure[0]
+    if checkpoint is not None:
+        if control.stopped:
+            # A window cut short is transcribed again on resume
+            checkpoint.update(collected[:done[0]], done[1], language, force=True)
+        else:
+            checkpoint.clear()
+    return collected, decoded[0]
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution waveform envelopes for the panel
+A min/max/RMS pyramid (2x decimation per level) is built in one pass over a source;
+queries return exactly `pixels` columns for any visible range in time proportional
+to the width, not the clip length
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import loudness
+
+# Duration of one bucket of the finest level (ms)
+BASE_MS = 4
+
+# Pyramids kept in memory by envelope() (the analysis service queries many times)
+MEMORY_CACHE_SIZE = 8
+
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+class EnvelopePyramid:
+    """
+    Levels of min, max (normalized to -1..1) and mean square per bucket.
+
+    Level k holds buckets of BASE_MS * 2**k milliseconds; the top level has at most
+    one bucket.
+    """
+
+    def __init__(self, levels, length_ms):
+        self.levels = levels
+        self.length_ms = length_ms
+
+    def bucket_ms(self, level):
+        return BASE_MS * (1 << level)
+
+    def to_arrays(self):
+        arrays = {'length_ms': np.array(self.length_ms)}
+        for k, (mins, maxs, mean_square) in enumerate(self.levels):
+            arrays[f'min{k}'], arrays[f'max{k}'], arrays[f'ms{k}'] = mins, maxs, mean_square
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        levels = []
+        while f'min{len(levels)}' in arrays:
+            k = len(levels)
+            levels.append((arrays[f'min{k}'], arrays[f'max{k}'], arrays[f'ms{k}']))
+        return cls(levels, int(arrays['length_ms']))
+
+    def query(self, start_ms, end_ms, pixels):
+        """
+        Waveform columns for [start_ms, end_ms) at a width of `pixels`
+
+        Returns:
+            Dict with 'min'/'max' (-1..1), 'rms' (dBFS) lists of length pixels, plus
+            the level and bucket size that served the query
+        """
+        pixels = max(1, int(pixels))
+        start_ms = max(0.0, min(float(start_ms), self.length_ms))
+        end_ms = max(start_ms, min(float(end_ms), self.length_ms))
+        per_pixel = (end_ms - start_ms) / pixels
+
+        # Coarsest level whose buckets are still no wider than one column
+        level = 0
+        while level + 1 < len(self.levels) and self.bucket_ms(level + 1) <= per_pixel:
+            level += 1
+        mins, maxs, mean_square = self.levels[level]
+        bucket = self.bucket_ms(level)
+
+        if len(mins) == 0:
+            empty = [0.0] * pixels
+            return {'level': level, 'bucketMs': bucket, 'min': empty, 'max': empty,
+                    'rms': [float(loudness.LEVEL_FLOOR_DB)] * pixels}
+
+        # Every bucket belongs to the column its start falls in; a column narrower
+        # than a bucket shows the bucket it lies in
+        edges = np.linspace(start_ms, end_ms, pixels + 1) / bucket
+        first = np.clip(np.floor(edges[:-1]).astype(np.int64), 0, len(mins) - 1)
+        stop = min(len(mins), max(int(np.ceil(edges[-1])), first[-1] + 1))
+        last = np.maximum(np.append(first[1:], stop), first + 1)
+
+        # Only the visible buckets are touched, so the cost depends on pixels, not clip length
+        offset = first[0]
+        first, last = first - offset, last - offset
+        column_min = np.minimum.reduceat(mins[offset:stop], first)
+        column_max = np.maximum.reduceat(maxs[offset:stop], first)
+        cumulative = np.concatenate(([0.0], np.cumsum(mean_square[offset:stop], dtype=np.float64)))
+        column_ms = (cumulative[last] - cumulative[first]) / (last - first)
+        with np.errstate(divide='ignore'):
+            rms_db = np.maximum(10 * np.log10(column_ms), loudness.LEVEL_FLOOR_DB)
+
+        return {
+            'level': level,
+            'bucketMs': bucket,
+            'min': np.round(column_min.astype(np.float64), 4).tolist(),
+            'max': np.round(column_max.astype(np.float64), 4).tolist(),
+            'rms': np.round(rms_db, 1).tolist(),
+        }
+
+
+def _reduce(mins, maxs, mean_square):
+    """Next level: pairs of buckets combined (an odd last bucket stands alone)"""
+    if len(mins) % 2:
+        mins, maxs, mean_square = (np.append(a, a[-1]) for a in (mins, maxs, mean_square))
+    return (np.minimum(mins[0::2], mins[1::2]),
+            np.maximum(maxs[0::2], maxs[1::2]),
+            (mean_square[0::2] + mean_square[1::2]) / 2)
+
+
+def build_pyramid(source, should_stop=None, chunk_ms=loudness.CHUNK_MS):
+    """
+    One pass over a PCMSource; returns an EnvelopePyramid (None if should_stop ended
+    the pass early)
+    """
+    length_ms = len(source)
+    buckets = -(-length_ms // BASE_MS)
+    bounds = np.minimum((np.arange(buckets + 1) * BASE_MS * (source.frame_rate / 1000.0)).astype(np.int64),
+                        source.frame_count)
+    scale = 1.0 / source.max_possible_amplitude
+    mins = np.zeros(buckets, dtype=np.float32)
+    maxs = np.zeros(buckets, dtype=np.float32)
+    mean_square = np.zeros(buckets, dtype=np.float32)
+
+    step = max(1, chunk_ms // BASE_MS)
+    for k0 in range(0, buckets, step):
+        if should_stop is not None and should_stop(k0 * BASE_MS):
+            return None
+        k1 = min(k0 + step, buckets)
+        f0, f1 = bounds[k0], bounds[k1]
+        if f1 <= f0:
+            continue
+        samples = source.read(f0, f1).reshape(f1 - f0, -1).astype(np.float32) * scale
+        starts = bounds[k0:k1] - f0
+        filled = starts < (f1 - f0)
+        starts = np.minimum(starts, f1 - f0 - 1)
+        counts = np.maximum(np.diff(np.append(starts, f1 - f0)), 1) * samples.shape[1]
+        mins[k0:k1] = np.where(filled, np.minimum.reduceat(samples.min(axis=1), starts), 0)
+        maxs[k0:k1] = np.where(filled, np.maximum.reduceat(samples.max(axis=1), starts), 0)
+        energy = np.add.reduceat((samples * samples).sum(axis=1), starts)
+        mean_square[k0:k1] = np.where(filled, energy / counts, 0)
+
+    levels = [(mins, maxs, mean_square)]
+    while len(levels[-1][0]) > 1:
+        levels.append(_reduce(*levels[-1]))
+    return EnvelopePyramid(levels, length_ms)
+
+
+def cached_pyramid(path):
+    """Pyramid of a media file from memory or the analysis cache, or None"""
+    import analysis_cache
+
+    key = analysis_cache.fingerprint(path)
+    with _pyramids_lock:
+        pyramid = _pyramids.get(key)
+    if pyramid is None:
+        pyramid = analysis_cache.load_pyramid(path)
+    if pyramid is not None:
+        _remember(key, pyramid)
+    return pyramid
+
+
+def _remember(key, pyramid):
+    with _pyramids_lock:
+        _pyramids[key] = pyramid
+        _pyramids.move_to_end(key)
+        while len(_pyramids) > MEMORY_CACHE_SIZE:
+            _pyramids.popitem(last=False)
+
+
+def load_pyramid(path, should_stop=None):
+    """
+    Pyramid of a media file from memory, the analysis cache or one pass over the file
+    (which is then cached); None if should_stop ended the pass
+    """
+    import analysis_cache
+    import whisper_jumpcut
+
+    pyramid = cached_pyramid(path)
+    if pyramid is None:
+        pyramid = build_pyramid(whisper_jumpcut.load_pcm_source(path), should_stop)
+        if pyramid is None:
+            return None
+        try:
+            analysis_cache.save_pyramid(path, pyramid)
+        except OSError:
+            pass
+        _remember(analysis_cache.fingerprint(path), pyramid)
+    return pyramid
+
+
+def envelope(path, start, end, pixels, pyramid=None):
+    """
+    Waveform columns of a media file between start and end seconds (clamped to the clip)
+
+    Args:
+        pyramid: The file's EnvelopePyramid if already at hand; otherwise it is loaded
+            with load_pyramid()
+    """
+    pyramid = pyramid or load_pyramid(path)
+    length = pyramid.length_ms / 1000.0
+    start, end = max(0.0, min(start, length)), max(0.0, min(end, length))
+    result = pyramid.query(start * 1000.0, end * 1000.0, pixels)
+    result.update({'start': start, 'end': end, 'duration': length, 'pixels': int(pixels)})
+    return result
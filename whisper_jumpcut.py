@@ -5,19 +5,205 @@ Replaces loudness-based silence detection with AI speech detection using faster-
 """
 
 import argparse
+import contextlib
 import os
 import json
 import sys
 import logging
+import signal
+import subprocess
 import tempfile
+import threading
+import time
 from pathlib import Path
 
+import analysis_cache
+import checkpoints
+import confidence_filter
+import cut_budget
+import decoders
+import loudness
+import memory_budget
+import pcm_reader
+import proxy_cache
+import spectral_vad
+
 # Configure logging
+LOG_FILE = 'whisper_jumpcut.log'
 log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s (Line: %(lineno)d)'
-logging.basicConfig(filename='whisper_jumpcut.log', format=log_format)
+logging.basicConfig(filename=LOG_FILE, format=log_format)
 logging.getLogger().setLevel(logging.DEBUG)
 
-def detect_silences_with_whisper(audio_path, model_size="base", language=None, detection_method="whisper", **kwargs):
+class RunControl:
+    """
+    Cooperative cancellation and resource limits for one run
+    
+    Stopped by SIGTERM/SIGINT, once the optional deadline passes, or when the optional
+    cancel_event (a threading.Event, e.g. from a scheduler job) is set. The engines check
+    `stopped` between segments and chunks and return what they have found so far;
+    subprocesses started through run() are killed as soon as the run stops.
+    With a memory_budget.MemoryTracker, stages record their allocations and the
+    tracker's plan sets chunk sizes, decoding and the Whisper model. With a
+    profiling.Profiler (--profile), every stage also leaves a memory snapshot.
+    A child control (see child()) also stops when its parent does.
+    """
+    
+    def __init__(self, deadline=None, cancel_event=None, memory=None, profiler=None, parent=None):
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.cancel_event = cancel_event
+        self.memory = memory
+        self.profiler = profiler
+        self.parent = parent
+        self.reason = None
+        self.processes = []
+    
+    def child(self, deadline=None):
+        """Control for one phase of this run, with its own deadline"""
+        return RunControl(deadline, self.cancel_event, self.memory, self.profiler, parent=self)
+    
+    @property
+    def plan(self):
+        return self.memory.plan if self.memory is not None else {}
+    
+    def stage(self, name):
+        """Context manager recording a stage's allocations when a memory budget or profiler is set"""
+        if self.profiler is None:
+            return self.memory.stage(name) if self.memory is not None else contextlib.nullcontext()
+        if self.memory is None:
+            return self.profiler.stage(name)
+        stack = contextlib.ExitStack()
+        stack.enter_context(self.profiler.stage(name))
+        stack.enter_context(self.memory.stage(name))
+        return stack
+    
+    def stop(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            logging.warning(f"Run stopping early: {reason}")
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+    
+    @property
+    def stopped(self):
+        if self.reason is None and self.parent is not None and self.parent.stopped:
+            self.stop(self.parent.reason)
+        if self.reason is None and self.cancel_event is not None and self.cancel_event.is_set():
+            self.stop('cancelled')
+        if self.reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stop('deadline')
+        return self.reason is not None
+    
+    def install_signal_handlers(self):
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda signum, frame: self.stop('cancelled'))
+    
+    def run(self, cmd):
+        """subprocess.run(cmd, capture_output=True, text=True) whose child dies with the run"""
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        self.processes.append(process)
+        try:
+            while True:
+                try:
+                    stdout, stderr = process.communicate(timeout=0.2)
+                    break
+                except subprocess.TimeoutExpired:
+                    if self.stopped:
+                        process.kill()
+        finally:
+            self.processes.remove(process)
+        return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+# Models stay loaded for the life of the process (indexer, analysis service) and are
+# shared by all threads; the lock keeps concurrent requests from loading one twice
+_models = {}
+_models_lock = threading.Lock()
+
+def load_model(model_size, cpu_threads=0):
+    """Load a faster-whisper model once and reuse it"""
+    from faster_whisper import WhisperModel
+    
+    key = (model_size, cpu_threads)
+    with _models_lock:
+        if key not in _models:
+            print("Loading Whisper model...")
+            _models[key] = WhisperModel(model_size, device="cpu", compute_type="int8", cpu_threads=cpu_threads)
+        return _models[key]
+
+def loaded_models():
+    """Model sizes currently held in memory"""
+    with _models_lock:
+        return sorted({model_size for model_size, _ in _models})
+
+def transcribe(audio_path, model_size="base", language=None, control=None, on_segment=None, cpu_threads=0,
+               checkpoint=None):
+    """
+    Transcribe a file with Whisper, consuming segments lazily so the run can stop between them
+    
+    Args:
+        on_segment: Optional callback invoked after every segment (used for throttling)
+        checkpoint: Optional checkpoints.Checkpoint; completed segments are saved to it
+            and a rerun continues after the last one
+    
+    Returns:
+        (segments, duration) with analysis_cache.Segment entries and the audio duration in seconds
+    """
+    control = control or RunControl()
+    collected, position = [], 0.0
+    resumed = checkpoint.load() if checkpoint is not None else None
+    if resumed is not None:
+        position, collected, language = round(resumed[0], 3), resumed[1], resumed[2] or language
+        print(f"Resuming transcription at {position:.0f} s")
+    
+    with control.stage('model'):
+        model = load_model(model_size, cpu_threads)
+    
+    print("Transcribing audio...")
+    segments, info = model.transcribe(
+        resume_audio(audio_path, position) if position else audio_path,
+        language=language,
+        word_timestamps=True,
+        vad_filter=True  # Voice Activity Detection
+    )
+    language = getattr(info, 'language', language)
+    
+    # Segments are decoded and transcribed lazily; stop between them if asked to
+    with control.stage('transcribe'):
+        for segment in segments:
+            segment = analysis_cache.to_segment(segment)
+            if position:
+                segment = analysis_cache.shift_segment(segment, position)
+            collected.append(segment)
+            if on_segment is not None:
+                on_segment(segment)
+            if checkpoint is not None:
+                checkpoint.update(collected, segment.end, language)
+            if control.stopped:
+                break
+    
+    if checkpoint is not None:
+        if control.stopped:
+            checkpoint.update(collected, collected[-1].end if collected else position, language, force=True)
+        else:
+            checkpoint.clear()
+    duration = getattr(info, 'duration', None)
+    return collected, duration + position if duration is not None else None
+
+def resume_audio(audio_path, position):
+    """16 kHz mono float32 samples of a file from `position` seconds on"""
+    import transcribe_pipeline
+    
+    if pcm_reader.is_pcm_file(audio_path):
+        try:
+            source = pcm_reader.open_pcm(audio_path).window(int(round(position * 1000)), None)
+            return transcribe_pipeline.whisper_audio(source, 0, source.frame_count)
+        except ValueError as e:
+            logging.debug(f"PCM fast path unavailable, decoding with faster-whisper: {e}")
+    from faster_whisper import decode_audio
+    return decode_audio(audio_path)[int(round(position * 1000)) * 16:]
+
+def detect_silences_with_whisper(audio_path, model_size="base", language=None, detection_method="whisper",
+                                 control=None, cache_transcript=False, checkpoint=None, confidence=None, **kwargs):
     """
     Detect silences using Whisper speech detection or fallback to loudness-based detection
     
@@ -25,96 +211,192 @@ def detect_silences_with_whisper(audio_path, model_size="base", language=None, d
         audio_path: Path to audio file
         model_size: Whisper model size (tiny, base, small, medium, large)
         language: Language code (None for auto-detection)
-        detection_method: "whisper" or "loudness"
+        detection_method: "whisper", "vad" or "loudness"
+        control: Optional RunControl; when it stops, the silences found so far are returned
+        cache_transcript: Store the full-file transcript in the analysis cache (original media only)
+        checkpoint: Optional checkpoints.Checkpoint for resuming an interrupted transcription
+        confidence: Optional confidence_filter.ConfidenceFilter; unreliable segments count as silence
         **kwargs: Additional parameters (cutoff, padding, etc.)
     
     Returns:
         List of silence segments [[start, end], [start, end], ...]
     """
     
+    control = control or RunControl()
+    report = kwargs.get('report')
+    
     if detection_method == "loudness":
-        return detect_silences_loudness(audio_path, **kwargs)
+        return detect_silences_loudness(audio_path, control=control, **kwargs)
+    if detection_method == "vad":
+        return detect_silences_vad(audio_path, control=control, **kwargs)
     
     try:
-        # Import faster-whisper
-        from faster_whisper import WhisperModel
+        segments, duration = transcribe(audio_path, model_size, language, control, checkpoint=checkpoint)
         
-        # Initialize Whisper model
-        print("Loading Whisper model...")
-        model = WhisperModel(model_size, device="cpu", compute_type="int8")
+        if cache_transcript and not control.stopped:
+            try:
+                analysis_cache.save_transcript(audio_path, model_size, language, segments, duration)
+            except OSError as e:
+                logging.warning(f"Could not cache transcript: {e}")
         
-        # Transcribe audio
-        print("Transcribing audio...")
-        segments, info = model.transcribe(
-            audio_path,
-            language=language,
-            word_timestamps=True,
-            vad_filter=True  # Voice Activity Detection
-        )
+        # Parameters
+        min_silence_length = kwargs.get('removeOver', 1000) / 1000.0  # Convert ms to seconds
+        padding = kwargs.get('padding', 500) / 1000.0
+        
+        # Only the in/out range of the clip is cut
+        in_point, out_point = kwargs.get('in'), kwargs.get('out')
+        if in_point or out_point:
+            segments = analysis_cache.clip_segments(segments, (in_point or 0) / 1000.0,
+                                                    out_point / 1000.0 if out_point else None)
+        # The cached transcript stays unfiltered so other thresholds can reuse it
+        if confidence is not None:
+            segments = confidence.apply(segments)
         
-        # Convert segments to list for processing
-        segments = list(segments)
+        if control.stopped:
+            return _partial_whisper_silences(segments, control, min_silence_length, padding, report)
         
         if not segments:
             logging.warning("No speech detected in audio file")
             return []
         
-        # Extract silence gaps between speech segments
-        silences = []
-        
-        # Parameters
-        min_silence_length = kwargs.get('removeOver', 1000) / 1000.0  # Convert ms to seconds
-        padding = kwargs.get('padding', 500) / 1000.0
-        
         # Get audio duration (needed for end silence detection)
-        import subprocess
-        try:
-            result = subprocess.run([
-                'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', audio_path
-            ], capture_output=True, text=True, check=True)
-            audio_duration = float(result.stdout.strip())
-        except Exception as e:
-            logging.error(f"Could not get audio duration: {e}")
+        if duration is None:
+            duration = probe_duration(audio_path, control)
+        audio_duration = window_duration(duration, in_point, out_point)
+        if audio_duration is None:
             audio_duration = segments[-1].end + 10  # Fallback estimate
         
-        # Find silence gaps between speech segments
-        for i in range(len(segments)):
-            current_segment = segments[i]
-            
-            if i == 0:
-                # Check for silence at the beginning
-                if current_segment.start > min_silence_length:
-                    silence_start = 0
-                    silence_end = current_segment.start
-                    if silence_end - silence_start >= min_silence_length:
-                        silences.append([silence_start, silence_end])
-            
-            if i < len(segments) - 1:
-                # Check for silence between segments
-                next_segment = segments[i + 1]
-                gap_start = current_segment.end
-                gap_end = next_segment.start
-                gap_duration = gap_end - gap_start
-                
-                if gap_duration >= min_silence_length:
-                    silences.append([gap_start, gap_end])
-            else:
-                # Check for silence at the end
-                if audio_duration - current_segment.end > min_silence_length:
-                    silence_start = current_segment.end
-                    silence_end = audio_duration
-                    if silence_end - silence_start >= min_silence_length:
-                        silences.append([silence_start, silence_end])
+        silences = speech_gaps_to_silences(segments, audio_duration, min_silence_length, padding)
+        
+        print(f"Detected {len(silences)} silence segments using Whisper")
+        return silences
+        
+    except ImportError:
+        logging.error("faster-whisper not available, falling back to loudness detection")
+        return detect_silences_loudness(audio_path, control=control, **kwargs)
+    except Exception as e:
+        if control.stopped:
+            return _partial_whisper_silences([], control, 0, 0, report)
+        logging.error(f"Whisper detection failed: {e}")
+        return detect_silences_loudness(audio_path, control=control, **kwargs)
+
+def detect_silences_pipelined(audio_path, model_size="base", language=None, control=None, report=None,
+                              checkpoint=None, confidence=None, **kwargs):
+    """
+    Whisper silences of the in/out range with decoding and transcription overlapped
+    (see transcribe_pipeline.py); gaps are collected as segments arrive
+    
+    Returns:
+        List of silence segments [[start, end], ...] in seconds from the in point
+    """
+    import transcribe_pipeline
+    
+    control = control or RunControl()
+    min_silence_length = kwargs.get('removeOver', 1000) / 1000.0
+    padding = kwargs.get('padding', 500) / 1000.0
+    gaps = SpeechGaps(min_silence_length)
+    segments = []
+    
+    def on_segment(segment):
+        if confidence is not None:
+            segment = confidence(segment)
+            if segment is None:
+                return
+        segments.append(segment)
+        gaps.add(segment)
+    
+    try:
+        _, duration = transcribe_pipeline.transcribe_pipelined(audio_path, model_size, language, control,
+                                                               kwargs.get('in') or 0, kwargs.get('out'),
+                                                               on_segment=on_segment, checkpoint=checkpoint)
+    except ImportError:
+        logging.error("faster-whisper not available, falling back to loudness detection")
+        return detect_silences_loudness(audio_path, control=control, report=report, **kwargs)
+    except Exception as e:
+        if control.stopped:
+            return _partial_whisper_silences(segments, control, min_silence_length, padding, report)
+        logging.error(f"Pipelined Whisper detection failed: {e}")
+        return detect_silences_loudness(audio_path, control=control, report=report, **kwargs)
+    
+    if control.stopped:
+        return _partial_whisper_silences(segments, control, min_silence_length, padding, report)
+    if not segments:
+        logging.warning("No speech detected in audio file")
+        return []
+    
+    silences = gaps.finish(duration, padding)
+    print(f"Detected {len(silences)} silence segments using Whisper")
+    return silences
+
+def probe_duration(audio_path, control=None):
+    """Media duration in seconds from ffprobe, or None"""
+    control = control or RunControl()
+    try:
+        result = control.run([
+            'ffprobe', '-v', 'quiet', '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1', audio_path
+        ])
+        return float(result.stdout.strip())
+    except Exception as e:
+        logging.error(f"Could not get audio duration: {e}")
+        return None
+
+def window_duration(duration, in_point=None, out_point=None):
+    """Length in seconds of the in/out range (ms) of a file lasting `duration` seconds"""
+    if duration is None:
+        return (out_point - (in_point or 0)) / 1000.0 if out_point else None
+    end = min(duration, out_point / 1000.0) if out_point else duration
+    return max(0.0, end - (in_point or 0) / 1000.0)
+
+def _partial_whisper_silences(segments, control, min_silence_length, padding, report):
+    """Silences between the segments transcribed before the run stopped"""
+    processed_until = segments[-1].end if segments else 0.0
+    if report is not None:
+        report['processedUntil'] = processed_until
+    if not segments:
+        return []
+    # Nothing is known past the last segment, so no trailing silence is reported
+    silences = speech_gaps_to_silences(segments, processed_until, min_silence_length, padding)
+    print(f"Stopped early ({control.reason}); detected {len(silences)} silence segments so far")
+    return silences
+
+class SpeechGaps:
+    """
+    Silences between Whisper speech segments, collected as the segments arrive
+    
+    Segments must be added in time order; finish() adds the trailing silence and
+    applies the padding.
+    """
+    
+    def __init__(self, min_silence_length):
+        self.min_silence_length = min_silence_length
+        self.gaps = []
+        self.last_end = None
+    
+    def add(self, segment):
+        if self.last_end is None:
+            # Silence at the beginning
+            if segment.start > self.min_silence_length:
+                self.gaps.append([0, segment.start])
+        elif segment.start - self.last_end >= self.min_silence_length:
+            # Silence between segments
+            self.gaps.append([self.last_end, segment.start])
+        self.last_end = segment.end
+    
+    def finish(self, audio_duration, padding):
+        """Padded silence ranges (in seconds) once the whole clip has been transcribed"""
+        silences = list(self.gaps)
+        # Silence at the end
+        if self.last_end is not None and audio_duration - self.last_end > self.min_silence_length:
+            silences.append([self.last_end, audio_duration])
         
         # Apply padding (same logic as original)
         audio_length_ms = audio_duration * 1000
-        to_remove = []
-        
-        for i in range(len(silences)):
+        padded = []
+        for start, end in silences:
             # Convert to ms for padding calculation
-            start_ms = silences[i][0] * 1000
-            end_ms = silences[i][1] * 1000
+            start_ms = start * 1000
+            end_ms = end * 1000
             
             # Check that this silence is not at the beginning of the file
             if start_ms > 0:
@@ -124,52 +406,85 @@ def detect_silences_with_whisper(audio_path, model_size="base", language=None, d
             if end_ms < audio_length_ms:
                 end_ms = end_ms - (padding * 1000)
             
-            if end_ms <= start_ms:
-                to_remove.append(i)
-            else:
-                # Convert back to seconds
-                silences[i] = [start_ms / 1000.0, end_ms / 1000.0]
-        
-        # Remove silences that were padded out of existence
-        silences = [s for idx, s in enumerate(silences) if idx not in to_remove]
-        
-        print(f"Detected {len(silences)} silence segments using Whisper")
-        return silences
-        
-    except ImportError:
-        logging.error("faster-whisper not available, falling back to loudness detection")
-        return detect_silences_loudness(audio_path, **kwargs)
-    except Exception as e:
-        logging.error(f"Whisper detection failed: {e}")
-        return detect_silences_loudness(audio_path, **kwargs)
+            # Drop silences that were padded out of existence
+            if end_ms > start_ms:
+                padded.append([start_ms / 1000.0, end_ms / 1000.0])
+        return padded
 
-def detect_silences_loudness(audio_path, **kwargs):
+def speech_gaps_to_silences(segments, audio_duration, min_silence_length, padding):
+    """
+    Turn Whisper speech segments into padded silence ranges (in seconds)
+    """
+    gaps = SpeechGaps(min_silence_length)
+    for segment in segments:
+        gaps.add(segment)
+    return gaps.finish(audio_duration, padding)
+
+def detect_silences_loudness(audio_path, report=None, control=None, use_cache=False, envelope=None, **kwargs):
     """
     Fallback loudness-based silence detection (original method)
+    
+    A silenceCutoff of 'auto' estimates the threshold from the clip's noise floor;
+    the chosen values are written to `report` (if given) for the JSON output.
+    If `control` stops the run, silences for the audio analyzed so far are returned.
+    With use_cache (original media only), a freshly computed whole-file envelope is
+    stored; `envelope` skips decoding by using an already computed whole-file envelope.
     """
+    control = control or RunControl()
+    position = {'ms': 0}
+    
+    def should_stop(position_ms):
+        position['ms'] = position_ms
+        return control.stopped
+    
     try:
-        from pydub import AudioSegment, silence
-        
         # Parameters
-        threshold = int(kwargs.get('silenceCutoff', -50))
+        threshold = kwargs.get('silenceCutoff', -50)
+        auto_threshold = threshold == 'auto'
         min_silence_length = int(kwargs.get('removeOver', 1000))
         keep_over = int(kwargs.get('keepOver', 300))
         padding = int(kwargs.get('padding', 500))
+        in_point = kwargs.get('in')
+        out_point = kwargs.get('out')
         
-        # Load audio
-        audio = AudioSegment.from_file(audio_path)
+        if envelope is not None:
+            envelope = envelope.window(in_point, out_point)
+        else:
+            with control.stage('decode'):
+                source = load_pcm_source(audio_path)
+                audio = source.window(in_point, out_point)
+            # One pass over the samples, checking for cancellation between chunks
+            with control.stage('envelope'):
+                envelope = loudness.compute_envelope(audio, should_stop=should_stop,
+                                                     chunk_ms=control.plan.get('chunkMs', loudness.CHUNK_MS))
+            if use_cache and not control.stopped and audio.frame_count == source.frame_count:
+                try:
+                    analysis_cache.save_envelope(audio_path, envelope)
+                except OSError as e:
+                    logging.warning(f"Could not cache envelope: {e}")
         
         # Detect silences using amplitude
-        silences = silence.detect_silence(
-            audio, 
-            min_silence_len=min_silence_length, 
-            silence_thresh=threshold
-        )
+        if auto_threshold:
+            silences, estimate = loudness.auto_silences_from_envelope(envelope, min_silence_len=min_silence_length)
+            logging.debug(f"Auto threshold: {estimate}")
+            if report is not None:
+                report.update(estimate)
+        else:
+            silences = loudness.silences_from_envelope(
+                envelope, 
+                min_silence_len=min_silence_length, 
+                silence_thresh=int(threshold)
+            )
         
         # Convert to seconds and apply same processing as original
         silences = [[s[0]/1000.0, s[1]/1000.0] for s in silences]
         
-        print(f"Detected {len(silences)} silence segments using loudness")
+        if control.stopped:
+            if report is not None:
+                report['processedUntil'] = position['ms'] / 1000.0
+            print(f"Stopped early ({control.reason}); detected {len(silences)} silence segments so far")
+        else:
+            print(f"Detected {len(silences)} silence segments using loudness")
         return silences
         
     except ImportError as e:
@@ -179,126 +494,273 @@ def detect_silences_loudness(audio_path, **kwargs):
         logging.error(f"Loudness detection failed: {e}")
         return []
 
-def main():
-    parser = argparse.ArgumentParser(description='Whisper-based jumpcut silence detection')
-    parser.add_argument("path", help="Path to audio/video file")
-    parser.add_argument("jumpcutparams", help="JSON string with jumpcut parameters")
-    parser.add_argument("--method", default="whisper", choices=["whisper", "loudness"], 
-                       help="Detection method")
-    parser.add_argument("--model", default="base", 
-                       choices=["tiny", "base", "small", "medium", "large"],
-                       help="Whisper model size")
-    parser.add_argument("--language", default=None, help="Language code (auto-detect if None)")
-    
-    args = parser.parse_args()
+def detect_silences_vad(audio_path, report=None, control=None, **kwargs):
+    """
+    Spectral VAD silence detection (no model; see spectral_vad.py)
     
-    # Default parameters (same as original)
-    jumpcut_params = {
-        'silenceCutoff': -80,
-        'removeOver': 1000,
-        'keepOver': 300,
-        'padding': 500,
-        'in': None,
-        'out': None,
-        'start': None,
-        'method': 'whisper',
-        'model': 'base',
-        'language': None
-    }
+    Speech regions found from frame energy, zero-crossing rate and spectral flatness
+    are turned into silences exactly like Whisper segments. If `control` stops the
+    run, silences for the audio analyzed so far are returned.
+    """
+    control = control or RunControl()
     
     try:
-        # Parse input parameters
-        if args.jumpcutparams:
-            input_params = json.loads(args.jumpcutparams)
-            jumpcut_params.update(input_params)
-            
-            # Convert to ms (except for dB and method/model/language)
-            for key, value in jumpcut_params.items():
-                if key not in ['silenceCutoff', 'method', 'model', 'language'] and value is not None:
-                    jumpcut_params[key] = float(value) * 1000
-            
-            # Keep dB as-is
-            if 'silenceCutoff' in jumpcut_params:
-                jumpcut_params['silenceCutoff'] = int(jumpcut_params['silenceCutoff'])
+        min_silence_length = kwargs.get('removeOver', 1000) / 1000.0
+        padding = kwargs.get('padding', 500) / 1000.0
+        
+        with control.stage('decode'):
+            audio = load_pcm_source(audio_path).window(kwargs.get('in'), kwargs.get('out'))
+        with control.stage('vad'):
+            regions, processed = spectral_vad.speech_regions(audio, should_stop=lambda position_ms: control.stopped,
+                                                             processes=int(kwargs.get('processes') or 1))
+        segments = [analysis_cache.Segment(start, end) for start, end in regions]
+        
+        if control.stopped:
+            silences = _partial_whisper_silences(segments, control, min_silence_length, padding, report)
+            if report is not None:
+                report['processedUntil'] = processed
+            return silences
+        if not segments:
+            logging.warning("No speech detected in audio file")
+            return []
+        
+        silences = speech_gaps_to_silences(segments, len(audio) / 1000.0, min_silence_length, padding)
+        print(f"Detected {len(silences)} silence segments using spectral VAD")
+        return silences
     
-    except json.JSONDecodeError as e:
-        logging.error(f"Invalid JSON parameters: {e}")
-        print(json.dumps({"error": "Invalid parameters"}))
-        return
+    except Exception as e:
+        logging.error(f"Spectral VAD detection failed: {e}")
+        return detect_silences_loudness(audio_path, control=control, report=report, **kwargs)
+
+def detect_silences_from_cache(media_path, detection_method, model_size, language, report=None, confidence=None,
+                               **kwargs):
+    """
+    Silences computed from the analysis cache (background indexer or an earlier run)
+    
+    Returns None on a cache miss; a hit needs no decoding, extraction or model.
+    """
+    in_point, out_point = kwargs.get('in'), kwargs.get('out')
+    
+    if detection_method == "loudness":
+        envelope = analysis_cache.load_envelope(media_path)
+        if envelope is None:
+            return None
+        print("Using pre-analyzed loudness envelope")
+        return detect_silences_loudness(media_path, report=report, envelope=envelope, **kwargs)
+    
+    if detection_method != "whisper":
+        return None
+    
+    cached = analysis_cache.load_transcript(media_path, model_size, language)
+    if cached is None:
+        return None
+    segments, duration = cached
+    print("Using pre-analyzed transcript")
+    segments = analysis_cache.clip_segments(segments, (in_point or 0) / 1000.0,
+                                            out_point / 1000.0 if out_point else None)
+    if confidence is not None:
+        segments = confidence.apply(segments)
+    audio_duration = window_duration(duration, in_point, out_point)
+    if not segments or audio_duration is None:
+        return []
+    
+    silences = speech_gaps_to_silences(segments, audio_duration, kwargs.get('removeOver', 1000) / 1000.0,
+                                       kwargs.get('padding', 500) / 1000.0)
+    print(f"Detected {len(silences)} silence segments using Whisper")
+    return silences
+
+def load_pcm_source(audio_path):
+    """Memory-map uncompressed WAV/AIFF; decode anything else with PyAV, or pydub/ffmpeg without it"""
+    if pcm_reader.is_pcm_file(audio_path):
+        try:
+            return pcm_reader.open_pcm(audio_path)
+        except ValueError as e:
+            logging.debug(f"PCM fast path unavailable, decoding the file: {e}")
+    
+    if decoders.use_pyav():
+        try:
+            return decoders.decode_source(audio_path)
+        except Exception as e:
+            logging.warning(f"In-process decoding failed, decoding with pydub: {e}")
+    from pydub import AudioSegment
+    return pcm_reader.wrap_audio_segment(AudioSegment.from_file(audio_path))
+
+# Default parameters (same as original); times in seconds, converted to ms on parsing
+DEFAULT_PARAMS = {
+    'silenceCutoff': -80,
+    'removeOver': 1000,
+    'keepOver': 300,
+    'padding': 500,
+    'in': None,
+    'out': None,
+    'start': None,
+    'method': 'whisper',
+    'model': 'base',
+    'language': None,
+    'maxCuts': None,
+    'minSavedSeconds': None,
+    'pipeline': False,
+    'processes': 1,
+    'preview': None,
+    'previewLatency': None,
+    'confidenceFilter': False,
+    'noSpeechProb': None,
+    'avgLogprob': None,
+    'compressionRatio': None,
+    'wordProbability': None
+}
+
+# Parameters passed through without the seconds-to-ms conversion
+UNCONVERTED_PARAMS = ['silenceCutoff', 'method', 'model', 'language', 'maxCuts', 'minSavedSeconds', 'pipeline',
+                      'processes', 'preview', 'previewLatency', 'confidenceFilter', 'noSpeechProb', 'avgLogprob',
+                      'compressionRatio', 'wordProbability']
+
+def parse_jumpcut_params(input_params):
+    """
+    Merge panel parameters over the defaults and convert times to ms
+    
+    Raises:
+        ValueError: If a value cannot be converted
+    """
+    jumpcut_params = dict(DEFAULT_PARAMS)
+    if input_params:
+        jumpcut_params.update(input_params)
+        
+        # Convert to ms (except for dB, method/model/language and the cut budget)
+        for key, value in jumpcut_params.items():
+            if key not in UNCONVERTED_PARAMS and value is not None:
+                jumpcut_params[key] = float(value) * 1000
+        
+        if jumpcut_params['maxCuts'] not in (None, ''):
+            jumpcut_params['maxCuts'] = int(jumpcut_params['maxCuts'])
+        else:
+            jumpcut_params['maxCuts'] = None
+        if jumpcut_params['minSavedSeconds'] not in (None, ''):
+            jumpcut_params['minSavedSeconds'] = float(jumpcut_params['minSavedSeconds'])
+        else:
+            jumpcut_params['minSavedSeconds'] = None
+        
+        # Keep dB as-is ('auto' picks the cutoff from the clip's noise floor)
+        if str(jumpcut_params['silenceCutoff']).lower() == 'auto':
+            jumpcut_params['silenceCutoff'] = 'auto'
+        else:
+            jumpcut_params['silenceCutoff'] = int(jumpcut_params['silenceCutoff'])
+    return jumpcut_params
+
+def analyze(file_path, jumpcut_params, control=None, resumable=True):
+    """
+    Run one jump cut analysis of a media file
+    
+    Args:
+        file_path: Path to audio/video file
+        jumpcut_params: Parameters from parse_jumpcut_params()
+        control: Optional RunControl; when it stops, the silences found so far are returned
+        resumable: Checkpoint Whisper transcriptions so a rerun continues where this one stopped
+    
+    Returns:
+        Dict in the engine's output format ({"silences": [...], ...} or {"error": ...})
+    """
+    control = control or RunControl()
     
     # Extract clip timing parameters
-    in_point = int(jumpcut_params.get('in', 0))
-    out_point = int(jumpcut_params.get('out', 0))
-    start_point = int(jumpcut_params.get('start', 0))
+    in_point = int(jumpcut_params.get('in') or 0)
+    out_point = int(jumpcut_params.get('out') or 0)
+    start_point = int(jumpcut_params.get('start') or 0)
     
     # Get detection method and Whisper parameters
-    detection_method = jumpcut_params.get('method', args.method)
-    model_size = jumpcut_params.get('model', args.model)
-    language = jumpcut_params.get('language', args.language)
+    detection_method = jumpcut_params.get('method')
+    model_size = jumpcut_params.get('model')
+    language = jumpcut_params.get('language')
     
     # For Whisper, we need to extract audio if video file
-    file_path = args.path
     temp_audio_path = None
+    checkpoint = None
     
     try:
-        # Check if we need to extract audio
-        file_ext = Path(file_path).suffix.lower()
-        if file_ext in ['.mp4', '.mov', '.avi', '.mkv', '.webm']:
-            # Extract audio using ffmpeg
-            temp_audio_path = tempfile.mktemp(suffix='.wav')
-            cmd = [
-                'ffmpeg', '-i', file_path,
-                '-ss', str(in_point / 1000.0),  # Start time
-                '-t', str((out_point - in_point) / 1000.0),  # Duration
-                '-vn',  # No video
-                '-acodec', 'pcm_s16le',  # WAV format
-                '-ar', '16000',  # 16kHz sample rate (good for Whisper)
-                '-ac', '1',  # Mono
-                temp_audio_path,
-                '-y'  # Overwrite
-            ]
-            
-            import subprocess
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                raise Exception(f"FFmpeg failed: {result.stderr}")
-            
-            audio_file = temp_audio_path
-        else:
-            audio_file = file_path
+        # Fit chunk size, decoding and model to the memory budget
+        if control.memory is not None and control.memory.budget_mb:
+            control.memory.plan = plan_memory(file_path, control.memory.budget_mb, detection_method,
+                                              model_size, in_point, out_point, control)
+            model_size = control.plan.get('model', model_size)
+            logging.debug(f"Memory plan: {control.plan}")
         
-        # Detect silences
+
         # Filter out parameters that we're passing explicitly
         filtered_params = {k: v for k, v in jumpcut_params.items() 
-                          if k not in ['method', 'model', 'language']}
-        
-        silences = detect_silences_with_whisper(
-            audio_file,
-            model_size=model_size,
-            language=language,
-            detection_method=detection_method,
-            **filtered_params
-        )
+                          if k not in ['method', 'model', 'language', 'maxCuts', 'minSavedSeconds', 'pipeline',
+                                       'preview', 'previewLatency', 'confidenceFilter']
+                          and k not in confidence_filter.PARAMS}
+        # Low-confidence Whisper segments count as silence when the filter is on
+        confidence = confidence_filter.ConfidenceFilter.from_params(jumpcut_params) \
+            if detection_method == 'whisper' else None
         
-        # Apply start offset (same as original)
-        silences = [[s[0] + start_point/1000.0, s[1] + start_point/1000.0] for s in silences]
-        
-        # Add flag for clip start alignment (same as original logic)
-        if silences and len(silences) > 0:
-            if silences[0][0] == start_point/1000.0:
-                silences.append(1)
+        # Media pre-analyzed by the background indexer (or an earlier run) needs no decoding
+        report = {}
+        silences = detect_silences_from_cache(file_path, detection_method, model_size, language,
+                                              report=report, confidence=confidence, **filtered_params)
+        if silences is None and detection_method == 'whisper' and resumable:
+            # A run of the same job that was interrupted continues where it stopped
+            checkpoint = checkpoints.Checkpoint(file_path, {
+                'model': model_size, 'language': language, 'in': in_point, 'out': out_point,
+                'pipeline': bool(jumpcut_params.get('pipeline')), 'decodeToDisk': bool(control.plan.get('decodeToDisk'))})
+        if silences is None and detection_method == 'whisper' and jumpcut_params.get('pipeline'):
+            # Decode straight into the transcriber; no temporary WAV, no ffprobe
+            silences = detect_silences_pipelined(file_path, model_size, language, control, report=report,
+                                                 checkpoint=checkpoint, confidence=confidence, **filtered_params)
+        if silences is None:
+            # Check if we need to extract audio
+            file_ext = Path(file_path).suffix.lower()
+            if file_ext in ['.mp4', '.mov', '.avi', '.mkv', '.webm'] or control.plan.get('decodeToDisk'):
+                # Decode once into the shared 16 kHz mono proxy; later runs and the
+                # other engines read it without ffmpeg
+                with control.stage('extract'):
+                    proxy = proxy_cache.ensure_proxy(file_path, control)
+                    if proxy is not None and (in_point or out_point):
+                        fd, temp_audio_path = tempfile.mkstemp(suffix='.wav')
+                        os.close(fd)
+                        proxy_cache.write_window(proxy, in_point, out_point or None, temp_audio_path)
+                
+                audio_file = temp_audio_path or (proxy.path if proxy is not None else None)
+                # The extracted audio already covers only the in/out range
+                filtered_params.pop('in', None)
+                filtered_params.pop('out', None)
             else:
-                silences.append(0)
-        else:
-            silences.append(0)
+                audio_file = file_path
+            
+            if control.stopped:
+                # Stopped while extracting audio: nothing analyzed yet
+                silences = []
+                report['processedUntil'] = 0.0
+            else:
+                # Detect silences
+                silences = detect_silences_with_whisper(
+                    audio_file,
+                    model_size=model_size,
+                    language=language,
+                    detection_method=detection_method,
+                    control=control,
+                    cache_transcript=audio_file == file_path,
+                    use_cache=audio_file == file_path,
+                    checkpoint=checkpoint,
+                    confidence=confidence,
+                    report=report,
+                    **filtered_params
+                )
         
-        # Output in same format as original
-        result = {"silences": silences}
-        print(json.dumps(result))
+        if checkpoint is not None and checkpoint.resumed_from is not None:
+            report['resumedFrom'] = checkpoint.resumed_from
+        if confidence is not None:
+            report['confidenceFilter'] = confidence.report()
+        if control.stopped:
+            report['partial'] = True
+            report['reason'] = control.reason
+            report['processedUntil'] = report.get('processedUntil', 0.0) + start_point/1000.0
+        
+        return format_result(silences, jumpcut_params, report)
         
     except Exception as e:
         logging.error(f"Processing failed: {e}")
-        print(json.dumps({"error": str(e)}))
+        return {"error": str(e)}
     
     finally:
         # Clean up temporary audio file
@@ -308,5 +770,225 @@ def main():
             except:
                 pass
 
+def format_result(silences, jumpcut_params, report=None):
+    """
+    Engine output for silences in seconds from the in point: timeline times, cut
+    budget and the clip start flag
+    """
+    report = report or {}
+    start_point = int(jumpcut_params.get('start') or 0)
+    
+    # Apply start offset (same as original)
+    silences = [[s[0] + start_point/1000.0, s[1] + start_point/1000.0] for s in silences]
+    
+    # Keep only the cuts worth making if a budget was set
+    max_cuts = jumpcut_params.get('maxCuts')
+    min_saved = jumpcut_params.get('minSavedSeconds')
+    if max_cuts is not None or min_saved is not None:
+        silences, report['cutBudget'] = cut_budget.select_cuts(silences, max_cuts, min_saved)
+    
+    # Add flag for clip start alignment (same as original logic)
+    if silences and len(silences) > 0:
+        if silences[0][0] == start_point/1000.0:
+            silences.append(1)
+        else:
+            silences.append(0)
+    else:
+        silences.append(0)
+    
+    # Output in same format as original
+    result = {"silences": silences}
+    result.update(report)
+    return result
+
+def plan_memory(file_path, budget_mb, detection_method, model_size, in_point=0, out_point=0, control=None):
+    """memory_budget.plan_run() for a media file, reading its format from the header or ffprobe"""
+    duration, frame_rate, channels, compressed = None, 48000, 2, True
+    if pcm_reader.is_pcm_file(file_path):
+        try:
+            source = pcm_reader.open_pcm(file_path)
+            duration, frame_rate, channels, compressed = len(source) / 1000.0, source.frame_rate, source.channels, False
+        except ValueError:
+            pass
+    if duration is None:
+        duration = probe_duration(file_path, control)
+    duration = window_duration(duration, in_point, out_point)
+    return memory_budget.plan_run(budget_mb, detection_method, model_size, duration, frame_rate, channels, compressed)
+
+def follow_recording(file_path, jumpcut_params, output_path=None, idle_seconds=10.0, control=None):
+    """Tail mode: analyze a recording while it grows (see tail_mode.py); returns the final result"""
+    import tail_mode
+    
+    control = control or RunControl()
+    method = jumpcut_params.get('method')
+    if method == 'whisper':
+        detector = tail_mode.WhisperTail(jumpcut_params.get('model'), jumpcut_params.get('language'),
+                                         jumpcut_params['removeOver'] / 1000.0, jumpcut_params['padding'] / 1000.0,
+                                         control)
+    elif method == 'loudness' and jumpcut_params['silenceCutoff'] != 'auto':
+        # Same detection as detect_silences_loudness()
+        detector = tail_mode.LoudnessTail(jumpcut_params['removeOver'], jumpcut_params['silenceCutoff'])
+    else:
+        return {"error": f"Tail mode supports the whisper method and loudness with a fixed cutoff, not {method}"}
+    
+    try:
+        return tail_mode.follow(file_path, detector, output_path or file_path + '.silences.json',
+                                (jumpcut_params.get('start') or 0) / 1000.0, idle_seconds=idle_seconds,
+                                control=control)
+    except Exception as e:
+        logging.error(f"Tail mode failed: {e}")
+        return {"error": str(e)}
+
+def render_result(file_path, output_path, result, jumpcut_params, mode, control):
+    """Render the ranges analyze() kept to output_path; returns render.render()'s report or an error"""
+    import render
+    
+    if result.get('partial'):
+        return {"error": f"Analysis stopped early ({result.get('reason')}), nothing rendered"}
+    in_point = (jumpcut_params.get('in') or 0) / 1000.0
+    start = (jumpcut_params.get('start') or 0) / 1000.0
+    out_point = (jumpcut_params.get('out') or 0) / 1000.0 or probe_duration(file_path, control)
+    
+    try:
+        with control.stage('render'):
+            ranges = render.kept_ranges(result['silences'], in_point, out_point, start)
+            return render.render(file_path, output_path, ranges, mode, control)
+    except Exception as e:
+        logging.error(f"Render failed: {e}")
+        return {"error": str(e)}
+
+def main():
+    parser = argparse.ArgumentParser(description='Whisper-based jumpcut silence detection')
+    parser.add_argument("path", nargs='?', help="Path to audio/video file")
+    parser.add_argument("jumpcutparams", nargs='?', help="JSON string with jumpcut parameters")
+    parser.add_argument("--method", default="whisper", choices=["whisper", "vad", "loudness"], 
+                       help="Detection method")
+    parser.add_argument("--model", default="base", 
+                       choices=["tiny", "base", "small", "medium", "large"],
+                       help="Whisper model size")
+    parser.add_argument("--language", default=None, help="Language code (auto-detect if None)")
+    parser.add_argument("--pipeline", action="store_true",
+                       help="Overlap decoding and transcription (Whisper method) instead of extracting audio first")
+    parser.add_argument("--processes", type=int, default=1,
+                       help="Worker processes for the VAD method on long clips (they share the decoded audio)")
+    parser.add_argument("--preview", default=None, choices=["loudness", "tiny"],
+                       help="Print a quick loudness or tiny-model preview first, then only the silences that change")
+    parser.add_argument("--preview-latency", type=float, default=None, metavar="SECONDS",
+                       help="Time the preview may take (default 3)")
+    parser.add_argument("--confidence-filter", action="store_true",
+                       help="Treat low-confidence Whisper segments as silence (thresholds via the JSON parameters)")
+    parser.add_argument("--deadline", type=float, default=None,
+                       help="Stop after this many seconds and return the silences found so far")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                       help="Fit decoding, chunk size and model to this much memory and report peak RSS")
+    parser.add_argument("--serve", action="store_true",
+                       help="Run as an HTTP analysis service instead of analyzing one file")
+    parser.add_argument("--host", default="127.0.0.1",
+                       help="Service address (0.0.0.0 to serve the local network)")
+    parser.add_argument("--port", type=int, default=8765, help="Service port")
+    parser.add_argument("--workers", type=int, default=2, help="Analyses the service runs at the same time")
+    parser.add_argument("--path-map", action="append", default=[], metavar="CLIENT_PREFIX=SERVER_PREFIX",
+                       help="Rewrite media paths sent by workstations that mount shared storage elsewhere")
+    parser.add_argument("--media-root", action="append", default=[],
+                       help="Only serve media below these folders")
+    parser.add_argument("--token", default=None,
+                       help="Shared token panels must send (default: OPENJUMPCUT_SERVICE_TOKEN)")
+    parser.add_argument("--allow-origin", action="append", default=[], metavar="ORIGIN",
+                       help="Browser origin allowed to call the service (repeatable; none by default)")
+    parser.add_argument("--render", default=None, metavar="OUTPUT",
+                       help="Write the jump-cut media with ffmpeg instead of only printing the silences")
+    parser.add_argument("--render-mode", default="auto", choices=["auto", "copy", "encode"],
+                       help="Stream copy, re-encode, or copy when every kept range starts on a keyframe")
+    parser.add_argument("--tail", action="store_true",
+                       help="Follow a WAV/AIFF file that is still being recorded and keep its silence list up to date")
+    parser.add_argument("--tail-output", default=None,
+                       help="Silence list kept up to date in tail mode (default: <media>.silences.json)")
+    parser.add_argument("--idle", type=float, default=10.0,
+                       help="Tail mode ends once the file has not grown for this many seconds")
+    parser.add_argument("--waveform", type=int, default=None, metavar="PIXELS",
+                       help="Print waveform columns for the in/out range instead of analyzing")
+    parser.add_argument("--profile", action="store_true",
+                       help="Profile the run (cProfile, per-stage tracemalloc snapshots) into a zip next to the log")
+    
+    args = parser.parse_args()
+    
+    if args.serve:
+        import analysis_service
+        try:
+            analysis_service.serve(args.host, args.port, args.workers, args.path_map, args.media_root,
+                                   args.token or analysis_service.DEFAULT_TOKEN, args.allow_origin)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+    if not args.path:
+        parser.error("path is required unless --serve is given")
+    
+    # SIGTERM/SIGINT (e.g. the panel cancelling) and the deadline end the run cooperatively
+    memory = memory_budget.MemoryTracker(args.memory_budget) if args.memory_budget else None
+    profiler = None
+    if args.profile:
+        import profiling
+        profiler = profiling.Profiler(LOG_FILE)
+        profiler.start()
+    control = RunControl(deadline=args.deadline, memory=memory, profiler=profiler)
+    control.install_signal_handlers()
+    
+    try:
+        result = run_cli(args, control)
+    finally:
+        if profiler is not None:
+            archive = profiler.finish()
+    if profiler is not None:
+        result['profile'] = archive
+    print(json.dumps(result))
+
+def run_cli(args, control):
+    """The single-file command line run; returns the JSON output"""
+    try:
+        # Parse input parameters
+        input_params = json.loads(args.jumpcutparams) if args.jumpcutparams else None
+        jumpcut_params = parse_jumpcut_params(input_params)
+        
+        # Command line options apply unless the JSON parameters choose otherwise
+        for key, value in (('method', args.method), ('model', args.model), ('language', args.language),
+                           ('pipeline', args.pipeline), ('processes', args.processes),
+                           ('preview', args.preview), ('previewLatency', args.preview_latency),
+                           ('confidenceFilter', args.confidence_filter)):
+            if key not in (input_params or {}):
+                jumpcut_params[key] = value
+    
+    except json.JSONDecodeError as e:
+        logging.error(f"Invalid JSON parameters: {e}")
+        return {"error": "Invalid parameters"}
+    
+    if args.tail:
+        return follow_recording(args.path, jumpcut_params, args.tail_output, args.idle, control)
+    
+    if args.waveform:
+        import waveform
+        # in/out were converted to ms; a missing out point means the end of the clip
+        start = (jumpcut_params.get('in') or 0) / 1000.0
+        end = jumpcut_params['out'] / 1000.0 if jumpcut_params.get('out') else float('inf')
+        try:
+            return waveform.envelope(args.path, start, end, args.waveform)
+        except Exception as e:
+            logging.error(f"Waveform failed: {e}")
+            return {"error": str(e)}
+    
+    if jumpcut_params.get('preview'):
+        import quick_preview
+        # The preview is printed as soon as it is ready; the result only lists what changed
+        result, silences = quick_preview.two_phase(args.path, jumpcut_params, control, jumpcut_params['preview'],
+                                                   jumpcut_params.get('previewLatency') or quick_preview.PREVIEW_LATENCY)
+    else:
+        result = analyze(args.path, jumpcut_params, control)
+        silences = result.get('silences')
+    if args.render and 'error' not in result:
+        result['render'] = render_result(args.path, args.render, dict(result, silences=silences), jumpcut_params,
+                                         args.render_mode, control)
+    if control.memory is not None:
+        result['memory'] = control.memory.report()
+    return result
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()